@@ -0,0 +1,191 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.core.paginator import InvalidPage
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views import View
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+
+from api.catalog import get_snapshot
+from api.filters import RecipeFilter
+from api.ingredient_search import (
+    DEFAULT_LIMIT,
+    MAX_LIMIT,
+    get_ingredient_index
+)
+from api.pagination import KeysetPagination, RecipePagination
+from api.recipe_cache import aget_cached_recipe, apersonalize
+from api.recipe_rows import (
+    RECIPE_FIELDS,
+    FastJSONRenderer,
+    aserialize_recipes
+)
+from api.short_links import aresolve
+from api.utils import aload_subscribed_author_ids
+from api.views import (
+    IngredientViewSet,
+    RecipeViewSet,
+    TagViewSet,
+    short_link_response
+)
+from recipes.models import Recipe
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def delegate(viewset, actions):
+    """Синхронный DRF-view, которому передаются запись и все случаи,
+    не покрытые асинхронным путем: ошибки авторизации и фильтров,
+    курсорная пагинация, browsable API, промах кеша."""
+    view = sync_to_async(viewset.as_view(actions))
+    methods = set(actions) | {'options'}
+    if 'get' in actions:
+        methods.add('head')
+    allow = ', '.join(
+        method.upper() for method in View.http_method_names
+        if method in methods
+    )
+    return view, allow
+
+
+RECIPE_LIST = delegate(RecipeViewSet, {'get': 'list', 'post': 'create'})
+RECIPE_DETAIL = delegate(RecipeViewSet, {
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+})
+TAG_LIST = delegate(TagViewSet, {'get': 'list'})
+INGREDIENT_LIST = delegate(IngredientViewSet, {'get': 'list'})
+
+
+async def authenticate(request):
+    """
+    Проверяет токен асинхронным ORM так же, как TokenAuthentication.
+    Возвращает DRF Request с пользователем или None, если запрос нужно
+    отдать синхронному view: некорректный заголовок, неизвестный
+    токен, неактивный пользователь или запрос HTML-страницы.
+    """
+    if request.method not in SAFE_METHODS:
+        return None
+    if 'text/html' in request.headers.get('Accept', ''):
+        return None
+    drf_request = Request(request, authenticators=())
+    header = request.headers.get('Authorization', '').split()
+    if not header or header[0].lower() != 'token':
+        drf_request.user = AnonymousUser()
+        return drf_request
+    if len(header) != 2:
+        return None
+    token = await Token.objects.select_related('user').filter(
+        key=header[1]
+    ).afirst()
+    if token is None or not token.user.is_active:
+        return None
+    drf_request.user = token.user
+    return drf_request
+
+
+def json_response(data, allow, response=None):
+    """Отдает данные теми же байтами и заголовками, что и DRF."""
+    if response is None:
+        response = HttpResponse(
+            FastJSONRenderer().render(data),
+            content_type='application/json'
+        )
+    patch_vary_headers(response, ('Accept',))
+    response['Allow'] = allow
+    return response
+
+
+def csrf_exempt(view):
+    # Декоратор csrf_exempt в Django 4.2 делает async-view синхронным.
+    view.csrf_exempt = True
+    return view
+
+
+@csrf_exempt
+async def recipe_list(request):
+    """Список рецептов с фильтрами и постраничной пагинацией.
+    Число рецептов, строки страницы, теги, ингредиенты и подписки
+    читаются асинхронным ORM."""
+    view, allow = RECIPE_LIST
+    drf_request = await authenticate(request)
+    if (
+        drf_request is None
+        or KeysetPagination.cursor_query_param in request.GET
+    ):
+        return await view(request)
+    queryset = Recipe.objects.with_user_flags(drf_request.user)
+    filterset = RecipeFilter(
+        request.GET, queryset=queryset, request=drf_request
+    )
+    if not await sync_to_async(filterset.is_valid)():
+        return await view(request)
+    queryset = filterset.qs.values(*RECIPE_FIELDS)
+
+    pagination = RecipePagination()
+    paginator = pagination.django_paginator_class(
+        queryset, pagination.get_page_size(drf_request)
+    )
+    paginator.count = await queryset.acount()
+    try:
+        page = paginator.page(
+            pagination.get_page_number(drf_request, paginator)
+        )
+    except InvalidPage:
+        return await view(request)
+    page.object_list = [row async for row in page.object_list]
+    if drf_request.user.is_authenticated:
+        await aload_subscribed_author_ids(drf_request)
+    pagination.keyset = None
+    pagination.page = page
+    pagination.request = drf_request
+    data = await aserialize_recipes(page.object_list, drf_request)
+    return json_response(
+        pagination.get_paginated_response(data).data, allow
+    )
+
+
+@csrf_exempt
+async def recipe_detail(request, pk):
+    """Рецепт из кеша с признаками текущего пользователя."""
+    view, allow = RECIPE_DETAIL
+    drf_request = await authenticate(request)
+    data = None
+    if drf_request is not None:
+        data = await aget_cached_recipe(pk)
+    if data is None:
+        return await view(request, pk=str(pk))
+    return json_response(await apersonalize(data, drf_request), allow)
+
+
+@csrf_exempt
+async def tag_list(request):
+    view, allow = TAG_LIST
+    drf_request = await authenticate(request)
+    if drf_request is None or request.GET.get('name'):
+        return await view(request)
+    snapshot = await sync_to_async(get_snapshot)('tags')
+    return json_response(None, allow, snapshot.as_response(request))
+
+
+@csrf_exempt
+async def ingredient_list(request):
+    view, allow = INGREDIENT_LIST
+    drf_request = await authenticate(request)
+    if drf_request is None:
+        return await view(request)
+    name = request.GET.get('name')
+    if not name:
+        snapshot = await sync_to_async(get_snapshot)('ingredients')
+        return json_response(None, allow, snapshot.as_response(request))
+    limit = request.GET.get('limit', '')
+    limit = min(int(limit), MAX_LIMIT) if limit.isdigit() else DEFAULT_LIMIT
+    index = await sync_to_async(get_ingredient_index)()
+    return json_response(index.search(name, limit), allow)
+
+
+async def short_link_redirect(request, code):
+    return short_link_response(await aresolve(code))
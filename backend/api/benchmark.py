@@ -0,0 +1,269 @@
+import base64
+import csv
+import random
+import statistics
+import time
+import tracemalloc
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api.counters import reconcile_counters
+from api.pantry import invalidate_pantry_index
+from api.search import update_search_index
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    ShoppingCart,
+    Subscription,
+    Tag
+)
+from users.models import CustomUser
+
+BATCH_SIZE = 1000
+WORDS = (
+    'суп', 'пирог', 'салат', 'рагу', 'каша', 'запеканка', 'паста', 'омлет',
+    'домашний', 'быстрый', 'летний', 'острый', 'сырный', 'овощной',
+)
+TAGS = (('Завтрак', 'breakfast'), ('Обед', 'lunch'), ('Ужин', 'dinner'))
+
+
+def make_image():
+    buffer = BytesIO()
+    Image.new('RGB', (64, 64), 'orange').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def seed(scale, ingredients_path, rng):
+    """
+    Заполняет пустую базу синтетическими данными заданного размера.
+    Данные вставляются через bulk_create, поэтому счетчики
+    и поисковый индекс пересчитываются в конце.
+    """
+    with open(ingredients_path, encoding='utf-8') as file:
+        rows = list(csv.reader(file))
+    if scale['ingredients']:
+        rows = rows[:scale['ingredients']]
+    ingredients = Ingredient.objects.bulk_create(
+        [Ingredient(name=name, measurement_unit=unit) for name, unit in rows],
+        batch_size=BATCH_SIZE
+    )
+    tags = Tag.objects.bulk_create(
+        [Tag(name=name, slug=slug) for name, slug in TAGS]
+    )
+    users = CustomUser.objects.bulk_create(
+        [
+            CustomUser(
+                username=f'user{number}',
+                email=f'user{number}@example.com',
+                first_name='Имя',
+                last_name='Фамилия',
+            )
+            for number in range(scale['users'])
+        ],
+        batch_size=BATCH_SIZE
+    )
+    image = default_storage.save(
+        'recipes/images/benchmark.png', ContentFile(make_image())
+    )
+    recipes = Recipe.objects.bulk_create(
+        [
+            Recipe(
+                name=' '.join(rng.sample(WORDS, 2)).capitalize(),
+                text=' '.join(rng.choices(WORDS, k=30)),
+                author=rng.choice(users),
+                cooking_time=rng.randint(5, 180),
+                image=image,
+            )
+            for _ in range(scale['recipes'])
+        ],
+        batch_size=BATCH_SIZE
+    )
+    Recipe.tags.through.objects.bulk_create(
+        [
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+            for recipe in recipes
+            for tag in rng.sample(tags, rng.randint(1, len(tags)))
+        ],
+        batch_size=BATCH_SIZE
+    )
+    IngredientRecipe.objects.bulk_create(
+        [
+            IngredientRecipe(
+                recipe=recipe, ingredient=ingredient,
+                amount=rng.randint(1, 500)
+            )
+            for recipe in recipes
+            for ingredient in rng.sample(ingredients, rng.randint(3, 12))
+        ],
+        batch_size=BATCH_SIZE
+    )
+    for model, field, targets, per_user in (
+        (Favorite, 'recipe', recipes, scale['favorites']),
+        (ShoppingCart, 'recipe', recipes, scale['cart']),
+        (Subscription, 'author', users, scale['subscriptions']),
+    ):
+        model.objects.bulk_create(
+            [
+                model(user=user, **{field: target})
+                for user in users
+                for target in rng.sample(
+                    targets, min(per_user, len(targets))
+                )
+                if target != user
+            ],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True
+        )
+    reconcile_counters()
+    update_search_index([recipe.id for recipe in recipes])
+    invalidate_pantry_index()
+    return users, recipes, ingredients, tags
+
+
+def recipe_body(rng, ingredients, tags):
+    image = base64.b64encode(make_image()).decode()
+    return {
+        'name': 'Тестовый рецепт',
+        'text': ' '.join(rng.choices(WORDS, k=20)),
+        'cooking_time': rng.randint(5, 60),
+        'tags': [tag.id for tag in rng.sample(tags, 2)],
+        'image': f'data:image/png;base64,{image}',
+        'ingredients': [
+            {'id': ingredient.id, 'amount': rng.randint(1, 500)}
+            for ingredient in rng.sample(ingredients, 5)
+        ],
+    }
+
+
+def build_scenarios(users, recipes, ingredients, tags, rng):
+    """Возвращает сценарии: имя, метод и функцию,
+    которая строит адрес и тело очередного запроса."""
+    user = CustomUser.objects.annotate(
+        subscriptions=Count('subscriber')
+    ).order_by('-subscriptions').first()
+    own_recipe = Recipe.objects.filter(author=user).first() or recipes[0]
+    return [
+        ('recipes_list', 'get', lambda: ('/api/recipes/?limit=10', None)),
+        ('recipes_list_filtered', 'get', lambda: (
+            f'/api/recipes/?limit=10&is_favorited=1&tags={tags[0].slug}',
+            None
+        )),
+        ('recipes_list_cursor', 'get', lambda: (
+            '/api/recipes/?limit=10&cursor=', None
+        )),
+        ('recipes_search', 'get', lambda: (
+            f'/api/recipes/?limit=10&search={rng.choice(WORDS)}', None
+        )),
+        ('recipe_detail', 'get', lambda: (
+            f'/api/recipes/{rng.choice(recipes).id}/', None
+        )),
+        ('subscriptions', 'get', lambda: (
+            '/api/users/subscriptions/?limit=6&recipes_limit=3', None
+        )),
+        ('ingredient_search', 'get', lambda: (
+            f'/api/ingredients/?name={rng.choice(ingredients).name[:3]}',
+            None
+        )),
+        ('download_shopping_cart', 'get', lambda: (
+            '/api/recipes/download_shopping_cart/', None
+        )),
+        ('recipe_create', 'post', lambda: (
+            '/api/recipes/', recipe_body(rng, ingredients, tags)
+        )),
+        ('recipe_update', 'patch', lambda: (
+            f'/api/recipes/{own_recipe.id}/',
+            recipe_body(rng, ingredients, tags)
+        )),
+    ], user
+
+
+def send(client, method, url, body):
+    response = getattr(client, method)(url, body, format='json')
+    if response.status_code >= 400:
+        raise RuntimeError(f'{method.upper()} {url}: {response.status_code}')
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def measure(client, method, request, iterations, warmup):
+    """
+    Прогоняет сценарий и возвращает p50/p95 времени ответа, число
+    SQL-запросов и пик выделенной памяти. Память и запросы снимаются
+    отдельным прогоном, чтобы трассировка не искажала время.
+    """
+    for _ in range(warmup):
+        send(client, method, *request())
+    timings = []
+    for _ in range(iterations):
+        url, body = request()
+        started = time.perf_counter()
+        send(client, method, url, body)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+
+    url, body = request()
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            send(client, method, url, body)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'p50_ms': round(statistics.median(timings), 3),
+        'p95_ms': round(timings[int(len(timings) * 0.95)], 3),
+        'queries': len(queries),
+        'memory_kb': round(peak / 1024, 1),
+    }
+
+
+def run(scale, ingredients_path, iterations, warmup, seed_value, only=None):
+    rng = random.Random(seed_value)
+    started = time.perf_counter()
+    users, recipes, ingredients, tags = seed(scale, ingredients_path, rng)
+    seed_seconds = time.perf_counter() - started
+    scenarios, user = build_scenarios(users, recipes, ingredients, tags, rng)
+    client = APIClient()
+    client.force_authenticate(user)
+    results = {}
+    for name, method, request in scenarios:
+        if only and name not in only:
+            continue
+        results[name] = measure(client, method, request, iterations, warmup)
+    return {
+        'scale': scale,
+        'iterations': iterations,
+        'seed': seed_value,
+        'seed_seconds': round(seed_seconds, 2),
+        'database': connection.vendor,
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Возвращает список регрессий относительно сохраненного прогона:
+    рост p95 больше чем в threshold раз или рост числа запросов."""
+    regressions = []
+    for name, before in baseline['results'].items():
+        after = current['results'].get(name)
+        if after is None:
+            continue
+        if after['p95_ms'] > before['p95_ms'] * threshold:
+            regressions.append(
+                f'{name}: p95 {before["p95_ms"]} -> {after["p95_ms"]} мс'
+            )
+        if after['queries'] > before['queries']:
+            regressions.append(
+                f'{name}: запросов {before["queries"]} -> {after["queries"]}'
+            )
+    return regressions
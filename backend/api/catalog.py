@@ -0,0 +1,128 @@
+import gzip
+import hashlib
+import threading
+import time
+
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from rest_framework.renderers import JSONRenderer
+
+from api.db_router import read_from_primary
+from api.serializers import IngredientSerializer, TagSerializer
+from api.utils import bump_version, get_version
+from recipes.models import Ingredient, Tag
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+VERSION_CHECK_INTERVAL = 5
+CATALOGS = {
+    'tags': (Tag, TagSerializer),
+    'ingredients': (Ingredient, IngredientSerializer),
+}
+
+
+class Snapshot:
+    """
+    Сериализованный справочник: готовые байты ответа, их сжатые варианты
+    и ETag, вычисленный по содержимому.
+    """
+
+    def __init__(self, content, version=0):
+        self.version = version
+        self.etag = hashlib.sha256(content).hexdigest()[:32]
+        self.variants = {'identity': content, 'gzip': gzip.compress(content)}
+        if brotli is not None:
+            self.variants['br'] = brotli.compress(content)
+
+    @classmethod
+    @read_from_primary()
+    def from_database(cls, name, version=0):
+        model, serializer_class = CATALOGS[name]
+        data = serializer_class(model.objects.all(), many=True).data
+        return cls(JSONRenderer().render(data), version)
+
+    def etags(self):
+        return {self.get_etag(encoding) for encoding in self.variants}
+
+    def get_etag(self, encoding):
+        if encoding == 'identity':
+            return f'"{self.etag}"'
+        return f'"{self.etag}-{encoding}"'
+
+    def choose_encoding(self, accept_encoding):
+        accepted = {
+            token.split(';')[0].strip()
+            for token in accept_encoding.lower().split(',')
+        }
+        for encoding in ('br', 'gzip'):
+            if encoding in accepted and encoding in self.variants:
+                return encoding
+        return 'identity'
+
+    def as_response(self, request):
+        """Отдает подходящий вариант или 304, если ETag совпал."""
+        encoding = self.choose_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+        requested = {
+            tag.strip().removeprefix('W/') for tag in if_none_match.split(',')
+        }
+        if '*' in requested or requested & self.etags():
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(
+                self.variants[encoding], content_type='application/json'
+            )
+            if encoding != 'identity':
+                response['Content-Encoding'] = encoding
+        response['ETag'] = self.get_etag(encoding)
+        response['Cache-Control'] = 'no-cache'
+        response['Vary'] = 'Accept-Encoding'
+        return response
+
+
+_snapshots = {}
+_checked_at = {}
+_lock = threading.Lock()
+
+
+def version_key(name):
+    return f'catalog_version:{name}'
+
+
+def get_snapshot(name):
+    """
+    Возвращает снимок справочника текущего процесса. Снимок строится
+    один раз и перестраивается только после смены версии в общем кеше.
+    """
+    now = time.monotonic()
+    snapshot = _snapshots.get(name)
+    if (
+        snapshot is not None
+        and now - _checked_at.get(name, 0) < VERSION_CHECK_INTERVAL
+    ):
+        return snapshot
+    with _lock:
+        version = get_version(version_key(name))
+        snapshot = _snapshots.get(name)
+        if snapshot is None or snapshot.version != version:
+            snapshot = Snapshot.from_database(name, version)
+            _snapshots[name] = snapshot
+        _checked_at[name] = now
+        return snapshot
+
+
+def drop_snapshot(name):
+    bump_version(version_key(name))
+    with _lock:
+        _snapshots.pop(name, None)
+
+
+def invalidate_catalog(name):
+    """Сбрасывает снимок справочника во всех процессах после фиксации
+    транзакции, чтобы снимок не собрали заново из старых данных."""
+    transaction.on_commit(lambda: drop_snapshot(name))
@@ -0,0 +1,113 @@
+import threading
+from contextlib import contextmanager
+
+from django.apps import apps as global_apps
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+# Счетчик, модель связи и поле, по которому связь ссылается на владельца.
+COUNTERS = (
+    ('recipes.Recipe', 'favorites_count', 'recipes.Favorite', 'recipe'),
+    ('recipes.Recipe', 'in_cart_count', 'recipes.ShoppingCart', 'recipe'),
+    (
+        'recipes.Recipe', 'ingredients_count',
+        'recipes.IngredientRecipe', 'recipe'
+    ),
+    ('users.CustomUser', 'recipes_count', 'recipes.Recipe', 'author'),
+    (
+        'users.CustomUser', 'subscribers_count',
+        'recipes.Subscription', 'author'
+    ),
+)
+
+_state = threading.local()
+
+
+def get_counters(model):
+    """Возвращает счетчики, которые меняются вместе с объектами модели."""
+    label = model._meta.label
+    return [
+        (global_apps.get_model(owner), field, foreign_key)
+        for owner, field, related, foreign_key in COUNTERS
+        if related == label
+    ]
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно изменяет счетчик на delta, не опуская его ниже нуля."""
+    if delta:
+        model.objects.filter(pk=pk).update(
+            **{field: Greatest(F(field) + delta, Value(0))}
+        )
+
+
+def actual_count(related_model, foreign_key):
+    return Coalesce(Subquery(
+        related_model.objects.filter(
+            **{foreign_key: OuterRef('pk')}
+        ).order_by().values(foreign_key).annotate(
+            total=Count('pk')
+        ).values('total')
+    ), 0)
+
+
+def refresh_counters(related_model, owner_ids):
+    """Пересчитывает по таблице связей счетчики указанных владельцев.
+    Нужен после массовых операций, которые не отправляют сигналы."""
+    owner_ids = set(owner_ids)
+    if not owner_ids:
+        return
+    for model, field, foreign_key in get_counters(related_model):
+        model.objects.filter(pk__in=owner_ids).update(
+            **{field: actual_count(related_model, foreign_key)}
+        )
+
+
+@contextmanager
+def deferred_counters():
+    """Отключает построчное обновление счетчиков из сигналов:
+    после массовой операции они пересчитываются через refresh_counters."""
+    _state.deferred = True
+    try:
+        yield
+    finally:
+        _state.deferred = False
+
+
+def counters_deferred():
+    return getattr(_state, 'deferred', False)
+
+
+def owner_deleted(model, pk, origin):
+    """Запоминает владельца счетчиков, удаляемого операцией origin.
+    Сигналы pre_delete приходят для всех удаляемых объектов раньше
+    post_delete их связей, поэтому каскад может пропустить обновление
+    счетчиков на строке, которая сейчас тоже будет удалена."""
+    if getattr(_state, 'origin', None) is not origin:
+        _state.origin = origin
+        _state.deleted = set()
+    _state.deleted.add((model, pk))
+
+
+def owner_being_deleted(model, pk, origin):
+    return (
+        origin is not None
+        and getattr(_state, 'origin', None) is origin
+        and (model, pk) in _state.deleted
+    )
+
+
+def reconcile_counters():
+    """
+    Пересчитывает все счетчики по таблицам связей и исправляет
+    только разошедшиеся строки. Возвращает число исправленных строк
+    для каждого счетчика.
+    """
+    fixed = {}
+    for owner, field, related, foreign_key in COUNTERS:
+        model = global_apps.get_model(owner)
+        actual = actual_count(global_apps.get_model(related), foreign_key)
+        fixed[f'{owner}.{field}'] = model.objects.exclude(
+            **{field: actual}
+        ).update(**{field: actual})
+    return fixed
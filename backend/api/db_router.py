@@ -0,0 +1,160 @@
+import hashlib
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework.permissions import SAFE_METHODS
+
+# Запросы, которым можно читать с реплик. Вне HTTP-запроса (команды,
+# миграции, фоновые потоки) все идет в основную базу.
+_replica_reads = ContextVar('replica_reads', default=False)
+_down_until = {}
+
+# Токен нужен сразу после входа, когда реплика его еще может не видеть.
+PRIMARY_ONLY_APPS = {'authtoken', 'sessions', 'admin', 'contenttypes'}
+
+
+@contextmanager
+def read_from_primary():
+    """Читает из основной базы. Нужен там, где прочитанное попадает
+    в общий кеш: отставшая реплика закрепила бы в нем старые данные."""
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def sticky_key(request):
+    """Ключ клиента для окна read-your-writes: токен или сессия."""
+    credentials = request.headers.get('Authorization') or request.COOKIES.get(
+        settings.SESSION_COOKIE_NAME
+    )
+    if not credentials:
+        return None
+    digest = hashlib.sha256(credentials.encode()).hexdigest()[:32]
+    return f'replica_sticky:{digest}'
+
+
+def is_down(alias):
+    return _down_until.get(alias, 0) > time.monotonic()
+
+
+def is_available(alias):
+    """Проверяет соединение с репликой. Недоступная реплика
+    исключается на REPLICA_RETRY_SECONDS."""
+    if is_down(alias):
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        _down_until[alias] = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+        return False
+    return True
+
+
+class ReplicaRouter:
+    """
+    Отправляет чтение безопасных запросов на случайную доступную
+    реплику из DATABASE_REPLICAS, запись и все остальное — в основную
+    базу. Реплики — копии основной базы, поэтому связи между объектами
+    разрешены, а миграции применяются только к основной базе.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            not settings.DATABASE_REPLICAS
+            or not _replica_reads.get()
+            or model._meta.app_label in PRIMARY_ONLY_APPS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        replicas = list(settings.DATABASE_REPLICAS)
+        random.shuffle(replicas)
+        for alias in replicas:
+            if is_available(alias):
+                return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    """
+    Разрешает чтение с реплик для GET, HEAD и OPTIONS. После успешного
+    изменяющего запроса клиент на REPLICA_STICKY_SECONDS закрепляется
+    за основной базой, чтобы сразу увидеть свои изменения.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        key = sticky_key(request)
+        token = _replica_reads.set(self.use_replicas(request, key))
+        try:
+            response = self.get_response(request)
+        finally:
+            _replica_reads.reset(token)
+        self.remember_write(request, response, key)
+        return response
+
+    async def __acall__(self, request):
+        key = sticky_key(request)
+        token = _replica_reads.set(await self.ause_replicas(request, key))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _replica_reads.reset(token)
+        await self.aremember_write(request, response, key)
+        return response
+
+    def can_use_replicas(self, request):
+        return bool(settings.DATABASE_REPLICAS) and (
+            request.method in SAFE_METHODS
+        )
+
+    def use_replicas(self, request, key):
+        if not self.can_use_replicas(request):
+            return False
+        return key is None or not cache.get(key)
+
+    async def ause_replicas(self, request, key):
+        if not self.can_use_replicas(request):
+            return False
+        return key is None or not await cache.aget(key)
+
+    def is_write(self, request, response, key):
+        return (
+            key is not None
+            and bool(settings.DATABASE_REPLICAS)
+            and request.method not in SAFE_METHODS
+            and response.status_code < 400
+        )
+
+    def remember_write(self, request, response, key):
+        if self.is_write(request, response, key):
+            cache.set(key, True, settings.REPLICA_STICKY_SECONDS)
+
+    async def aremember_write(self, request, response, key):
+        if self.is_write(request, response, key):
+            await cache.aset(key, True, settings.REPLICA_STICKY_SECONDS)
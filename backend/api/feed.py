@@ -0,0 +1,173 @@
+"""
+Лента подписок.
+
+У каждого подписчика есть таблица последних FEED_LENGTH рецептов его
+авторов (FeedEntry), поэтому лента читается по одному индексу без
+соединения подписок с рецептами. Новый рецепт рассылается в ленты
+подписчиков при создании. Рецепты авторов, у которых подписчиков
+больше FEED_FANOUT_LIMIT, не рассылаются, а подмешиваются при чтении.
+"""
+import heapq
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+
+from recipes.models import FeedEntry, Recipe, Subscription
+from users.models import CustomUser
+
+BATCH_SIZE = 500
+
+_pending = threading.local()
+
+
+def chunks(items, size=BATCH_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def trim_feeds(user_ids):
+    """Удаляет из лент пользователей записи старше FEED_LENGTH последних.
+    Нумеруются записи только тех лент, что длиннее FEED_LENGTH."""
+    entries = FeedEntry.objects
+    length = settings.FEED_LENGTH
+    for chunk in chunks(user_ids):
+        overflowing = list(entries.filter(user_id__in=chunk).values(
+            'user_id'
+        ).annotate(total=Count('id')).filter(
+            total__gt=length
+        ).order_by().values_list('user_id', flat=True))
+        if not overflowing:
+            continue
+        stale = list(entries.filter(user_id__in=overflowing).annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=F('user_id'),
+                order_by=(F('pub_date').desc(), F('recipe_id').desc()),
+            )
+        ).filter(
+            position__gt=length
+        ).order_by().values_list('id', flat=True))
+        entries.filter(id__in=stale).delete()
+
+
+def fan_out(recipe_id, author_id, pub_date):
+    """Добавляет новый рецепт в ленты всех подписчиков автора."""
+    subscribers_count = CustomUser.objects.filter(pk=author_id).values_list(
+        'subscribers_count', flat=True
+    ).first()
+    if not subscribers_count or (
+        subscribers_count > settings.FEED_FANOUT_LIMIT
+    ):
+        return
+    subscriber_ids = Subscription.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    for chunk in chunks(subscriber_ids):
+        FeedEntry.objects.bulk_create(
+            [
+                FeedEntry(user_id=user_id, recipe_id=recipe_id,
+                          pub_date=pub_date)
+                for user_id in chunk
+            ],
+            ignore_conflicts=True
+        )
+        trim_feeds(chunk)
+
+
+def schedule_fan_out(recipe):
+    """Рассылает рецепт после фиксации транзакции, в которой он создан."""
+    args = (recipe.id, recipe.author_id, recipe.pub_date)
+    transaction.on_commit(lambda: fan_out(*args))
+
+
+def add_authors(user_id, author_ids):
+    """Добавляет в ленту пользователя последние рецепты новых авторов."""
+    recipes = Recipe.objects.filter(
+        author_id__in=author_ids,
+        author__subscribers_count__lte=settings.FEED_FANOUT_LIMIT,
+    ).order_by('-pub_date', '-id').values_list(
+        'id', 'pub_date'
+    )[:settings.FEED_LENGTH]
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(user_id=user_id, recipe_id=recipe_id, pub_date=pub_date)
+            for recipe_id, pub_date in recipes
+        ],
+        ignore_conflicts=True
+    )
+    trim_feeds([user_id])
+
+
+def rebuild_feeds(user_ids=None):
+    """
+    Собирает ленты заново по подпискам: после отписки, смены
+    FEED_LENGTH или FEED_FANOUT_LIMIT. Без user_ids перестраивает ленты
+    всех, у кого есть подписки. Возвращает число лент.
+    Каждая лента заменяется в своей транзакции: читатели видят
+    либо старую, либо новую ленту, но не пустую.
+    """
+    if user_ids is None:
+        user_ids = Subscription.objects.order_by('user_id').values_list(
+            'user_id', flat=True
+        ).distinct()
+    user_ids = list(user_ids)
+    for user_id in user_ids:
+        latest = Recipe.objects.filter(
+            author__subscribing__user_id=user_id,
+            author__subscribers_count__lte=settings.FEED_FANOUT_LIMIT,
+        ).order_by('-pub_date', '-id').values_list(
+            'id', 'pub_date'
+        )[:settings.FEED_LENGTH]
+        # Внутри внешней транзакции (массовая отписка) точка сохранения
+        # не нужна: при ошибке откатится вся транзакция.
+        with transaction.atomic(savepoint=False):
+            FeedEntry.objects.filter(user_id=user_id).delete()
+            FeedEntry.objects.bulk_create([
+                FeedEntry(
+                    user_id=user_id, recipe_id=recipe_id, pub_date=pub_date
+                )
+                for recipe_id, pub_date in latest
+            ])
+    return len(user_ids)
+
+
+def flush_feed_rebuilds():
+    user_ids = _pending.__dict__.pop('user_ids', set())
+    if user_ids:
+        rebuild_feeds(sorted(user_ids))
+
+
+def schedule_feed_rebuild(user_ids):
+    """Перестраивает ленты после фиксации транзакции, каждую один раз,
+    сколько бы подписок в ней ни удалили."""
+    _pending.__dict__.setdefault('user_ids', set()).update(user_ids)
+    transaction.on_commit(flush_feed_rebuilds)
+
+
+def feed_recipe_ids(user):
+    """
+    Id рецептов ленты от новых к старым: записи ленты пользователя
+    и последние рецепты авторов, которые в ленты не рассылаются.
+    Без таких авторов возвращает queryset, который пагинатор режет в SQL.
+    """
+    timeline = FeedEntry.objects.filter(user=user)
+    popular = list(Subscription.objects.filter(
+        user=user,
+        author__subscribers_count__gt=settings.FEED_FANOUT_LIMIT,
+    ).values_list('author_id', flat=True))
+    if not popular:
+        return timeline.values_list('recipe_id', flat=True)
+    length = settings.FEED_LENGTH
+    merged = heapq.merge(
+        timeline.values_list('pub_date', 'recipe_id')[:length],
+        Recipe.objects.filter(author_id__in=popular).order_by(
+            '-pub_date', '-id'
+        ).values_list('pub_date', 'id')[:length],
+        reverse=True
+    )
+    # Автор мог стать популярным после рассылки его рецептов.
+    return list(dict.fromkeys(recipe_id for _, recipe_id in merged))[:length]
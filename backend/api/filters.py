@@ -1,5 +1,6 @@
 from django_filters import rest_framework as filters
 
+from api.search import search_recipes
 from recipes.models import Recipe, Tag
 
 
@@ -28,6 +29,10 @@ class RecipeFilter(filters.FilterSet):
         lookup_expr='icontains',
         label='Фильтр по имени ингредиента'
     )
+    search = filters.CharFilter(
+        method='filter_search',
+        label='Полнотекстовый поиск'
+    )
 
     class Meta:
         model = Recipe
@@ -37,6 +42,7 @@ class RecipeFilter(filters.FilterSet):
             'is_favorited',
             'is_in_shopping_cart',
             'ingredients',
+            'search',
         ]
 
     def filter_is_favorited(self, queryset, name, value):
@@ -50,3 +56,9 @@ class RecipeFilter(filters.FilterSet):
         if value and self.request.user.is_authenticated:
             return queryset.filter(cart__user=self.request.user)
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        """Поиск по названию, описанию, тегам и ингредиентам."""
+        if not value.strip():
+            return queryset
+        return search_recipes(queryset, value)
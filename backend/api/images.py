@@ -0,0 +1,202 @@
+import base64
+import binascii
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+MAX_PIXELS = 40_000_000
+IMAGE_SIZES = {
+    'card': (480, 480),
+    'detail': (1200, 1200),
+    'avatar': (160, 160),
+}
+OUTPUT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+IMAGE_WORKERS = 2
+
+_executor = ThreadPoolExecutor(
+    max_workers=IMAGE_WORKERS, thread_name_prefix='image-variants'
+)
+
+
+def decode_image(data):
+    """
+    Декодирует изображение из data URI и проверяет его через Pillow:
+    допустимый формат, размер в пикселях и целостность файла.
+    """
+    try:
+        _, encoded = data.split(';base64,')
+        content = base64.b64decode(encoded, validate=True)
+    except (ValueError, binascii.Error):
+        raise serializers.ValidationError('Некорректная строка base64.')
+    try:
+        with Image.open(BytesIO(content)) as image:
+            image_format = image.format
+            width, height = image.size
+            image.verify()
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        raise serializers.ValidationError('Файл не является изображением.')
+    if image_format not in ALLOWED_FORMATS:
+        raise serializers.ValidationError(
+            'Допустимые форматы: JPEG, PNG, GIF, WEBP.'
+        )
+    if width * height > MAX_PIXELS:
+        raise serializers.ValidationError('Слишком большое изображение.')
+    return ContentFile(
+        content, name=f'{uuid4().hex}.{ALLOWED_FORMATS[image_format]}'
+    )
+
+
+def variant_name(source, size, extension):
+    path = PurePosixPath(source)
+    return str(path.parent / 'variants' / f'{path.stem}_{size}.{extension}')
+
+
+def render_variant(image, size, extension):
+    picture = image.copy()
+    picture.thumbnail(IMAGE_SIZES[size], Image.LANCZOS)
+    image_format, options = OUTPUT_FORMATS[extension]
+    if image_format == 'JPEG' and picture.mode != 'RGB':
+        background = Image.new('RGB', picture.size, 'white')
+        background.paste(picture, mask=picture.getchannel('A'))
+        picture = background
+    buffer = BytesIO()
+    picture.save(buffer, image_format, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def build_variants(model, pk, field_name, sizes):
+    """
+    Создает уменьшенные копии изображения в WebP и JPEG
+    и сохраняет их пути в поле `<field_name>_variants`.
+    Старые копии удаляются.
+    """
+    variants_field = f'{field_name}_variants'
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return None
+    image = getattr(instance, field_name)
+    old_variants = getattr(instance, variants_field)
+    if not image or old_variants.get('source') == image.name:
+        return None
+
+    with image.open('rb'):
+        with Image.open(image) as original:
+            original = ImageOps.exif_transpose(original)
+            has_alpha = (
+                'A' in original.getbands()
+                or 'transparency' in original.info
+            )
+            original = original.convert('RGBA' if has_alpha else 'RGB')
+    result = {}
+    for size in sizes:
+        result[size] = {
+            extension: image.storage.save(
+                variant_name(image.name, size, extension),
+                render_variant(original, size, extension)
+            )
+            for extension in OUTPUT_FORMATS
+        }
+    variants = {'source': image.name, 'sizes': result}
+    updated = model.objects.filter(pk=pk, **{field_name: image.name}).update(
+        **{variants_field: variants}
+    )
+    for path in variant_paths(old_variants):
+        image.storage.delete(path)
+    return variants if updated else None
+
+
+def variant_paths(variants):
+    return [
+        path
+        for formats in variants.get('sizes', {}).values()
+        for path in formats.values()
+    ]
+
+
+def drop_variants(instance, field_name):
+    """Очищает поле `<field_name>_variants`, а файлы копий удаляет
+    после фиксации транзакции. Сохранить объект должен вызывающий код."""
+    variants_field = f'{field_name}_variants'
+    storage = getattr(instance, field_name).storage
+    paths = variant_paths(getattr(instance, variants_field))
+    setattr(instance, variants_field, {})
+    transaction.on_commit(lambda: [storage.delete(path) for path in paths])
+
+
+def process_variants(model, pk, field_name, sizes, on_done=None):
+    if build_variants(model, pk, field_name, sizes) and on_done is not None:
+        on_done()
+
+
+def run_in_background(*args):
+    try:
+        process_variants(*args)
+    except Exception:
+        logger.exception('Не удалось создать копии изображения: %s', args)
+    finally:
+        connection.close()
+
+
+def schedule_variants(instance, field_name, sizes, on_done=None):
+    """Ставит создание копий в фоновый пул после фиксации транзакции,
+    если изображение изменилось с прошлой обработки.
+    При IMAGE_VARIANTS_ASYNC = False копии создаются сразу после фиксации.
+    """
+    image = getattr(instance, field_name)
+    variants = getattr(instance, f'{field_name}_variants')
+    if not image or variants.get('source') == image.name:
+        return
+    args = (type(instance), instance.pk, field_name, sizes, on_done)
+    if settings.IMAGE_VARIANTS_ASYNC:
+        transaction.on_commit(
+            lambda: _executor.submit(run_in_background, *args)
+        )
+    else:
+        transaction.on_commit(lambda: process_variants(*args))
+
+
+def variant_urls(storage, name, variants):
+    """URL готовых копий изображения name или None, если копии
+    построены для другого файла или еще не готовы. От storage
+    нужен только метод url()."""
+    if not name or variants.get('source') != name:
+        return None
+    return {
+        size: {
+            extension: storage.url(path)
+            for extension, path in formats.items()
+        }
+        for size, formats in variants['sizes'].items()
+    }
+
+
+class ImageVariantsField(serializers.Field):
+    """URL уменьшенных копий изображения по размерам и форматам.
+    Пока копии не готовы, возвращает None."""
+
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        image = getattr(instance, self.image_field)
+        return variant_urls(
+            image.storage, image.name,
+            getattr(instance, f'{self.image_field}_variants')
+        )
@@ -0,0 +1,181 @@
+import threading
+import time
+from bisect import bisect_left
+
+from api.db_router import read_from_primary
+from api.utils import bump_version, get_version
+from recipes.models import Ingredient
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+SIMILARITY_THRESHOLD = 0.3
+VERSION_CHECK_INTERVAL = 5
+VERSION_CACHE_KEY = 'ingredient_search_version'
+
+
+def normalize(text):
+    """Приводит строку к виду для поиска: регистр, ё и лишние пробелы."""
+    return ' '.join(text.casefold().replace('ё', 'е').split())
+
+
+def trigrams(text):
+    """Триграммы слов с дополнением пробелами, как в pg_trgm."""
+    result = set()
+    for word in text.split():
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def inner_trigrams(text):
+    """Триграммы, целиком лежащие внутри слов строки."""
+    result = set()
+    for word in text.split():
+        result.update(word[i:i + 3] for i in range(len(word) - 2))
+    return result
+
+
+class IngredientIndex:
+    """
+    Индекс ингредиентов в памяти процесса.
+    Отсортированный массив нормализованных названий отвечает на поиск
+    по началу строки, триграммы — на поиск по подстроке и с опечатками.
+    """
+
+    def __init__(self, rows, version=0):
+        self.version = version
+        rows = sorted(
+            rows, key=lambda row: (normalize(row['name']), row['id'])
+        )
+        self.items = [
+            {
+                'id': row['id'],
+                'name': row['name'],
+                'measurement_unit': row['measurement_unit'],
+            }
+            for row in rows
+        ]
+        self.keys = [normalize(row['name']) for row in rows]
+        self.trigram_counts = []
+        self.postings = {}
+        for position, key in enumerate(self.keys):
+            key_trigrams = trigrams(key)
+            self.trigram_counts.append(len(key_trigrams))
+            for trigram in key_trigrams:
+                self.postings.setdefault(trigram, []).append(position)
+
+    @classmethod
+    @read_from_primary()
+    def from_database(cls, version=0):
+        return cls(
+            Ingredient.objects.values('id', 'name', 'measurement_unit'),
+            version,
+        )
+
+    def __len__(self):
+        return len(self.keys)
+
+    def prefix_matches(self, query, limit):
+        start = bisect_left(self.keys, query)
+        matches = []
+        for position in range(start, len(self.keys)):
+            if len(matches) >= limit or not self.keys[position].startswith(
+                query
+            ):
+                break
+            matches.append(position)
+        return matches
+
+    def substring_matches(self, query, exclude, limit):
+        query_trigrams = inner_trigrams(query)
+        if query_trigrams:
+            postings = sorted(
+                (self.postings.get(trigram, ()) for trigram in query_trigrams),
+                key=len,
+            )
+            candidates = set(postings[0]).intersection(*postings[1:])
+        else:
+            candidates = range(len(self.keys))
+        matches = []
+        for position in candidates:
+            if position in exclude:
+                continue
+            key = self.keys[position]
+            offset = key.find(query)
+            if offset < 0:
+                continue
+            word_start = offset == 0 or key[offset - 1] == ' '
+            matches.append((not word_start, offset, key, position))
+        matches.sort()
+        return [match[-1] for match in matches[:limit]]
+
+    def fuzzy_matches(self, query, exclude, limit):
+        query_trigrams = trigrams(query)
+        shared = {}
+        for trigram in query_trigrams:
+            for position in self.postings.get(trigram, ()):
+                shared[position] = shared.get(position, 0) + 1
+        scored = []
+        for position, count in shared.items():
+            if position in exclude:
+                continue
+            similarity = count / (
+                len(query_trigrams) + self.trigram_counts[position] - count
+            )
+            if similarity >= SIMILARITY_THRESHOLD:
+                scored.append((-similarity, self.keys[position], position))
+        scored.sort()
+        return [match[-1] for match in scored[:limit]]
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """
+        Возвращает до `limit` ингредиентов в порядке релевантности:
+        совпадения по началу названия, затем по началу слова
+        и подстроке, затем похожие по триграммам.
+        """
+        query = normalize(query)
+        if not query or limit <= 0:
+            return []
+        positions = self.prefix_matches(query, limit)
+        if len(positions) < limit:
+            positions += self.substring_matches(
+                query, set(positions), limit - len(positions)
+            )
+        if len(positions) < limit:
+            positions += self.fuzzy_matches(
+                query, set(positions), limit - len(positions)
+            )
+        return [self.items[position] for position in positions]
+
+
+_index = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def get_ingredient_index():
+    """
+    Возвращает индекс текущего процесса, перестраивая его,
+    если версия в общем кеше изменилась. Версия проверяется
+    не чаще раза в VERSION_CHECK_INTERVAL секунд.
+    """
+    global _index, _checked_at
+    now = time.monotonic()
+    index = _index
+    if index is not None and now - _checked_at < VERSION_CHECK_INTERVAL:
+        return index
+    with _lock:
+        version = get_version(VERSION_CACHE_KEY)
+        if _index is None or _index.version != version:
+            _index = IngredientIndex.from_database(version)
+        _checked_at = now
+        return _index
+
+
+def invalidate_ingredient_index():
+    """Сбрасывает индекс во всех процессах через версию в общем кеше."""
+    global _index
+    version = bump_version(VERSION_CACHE_KEY)
+    with _lock:
+        _index = None
+    return version
@@ -0,0 +1,271 @@
+import json
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from api.metrics import observe_exception, observe_request
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    """
+    Статистика одного запроса. Обертка track_query передает экземпляру
+    каждый SQL-запрос, выполненный в контексте этого запроса.
+    """
+
+    def __init__(self, sample):
+        self.sample = sample
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.render_time = 0.0
+        self.serializing = False
+        self.render_started = None
+        self.signatures = Counter()
+        self.log = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.queries += 1
+            self.db_time += duration
+            # Параметры уже отделены от SQL, поэтому одинаковый текст
+            # означает один и тот же запрос, повторенный в цикле.
+            self.signatures[sql] += 1
+            if self.sample:
+                self.log.append({
+                    'sql': sql,
+                    'ms': round(duration * 1000, 3),
+                    'alias': context['connection'].alias,
+                })
+
+    def duplicates(self):
+        threshold = settings.QUERY_DUPLICATE_THRESHOLD
+        return [
+            {'sql': sql, 'count': count}
+            for sql, count in self.signatures.most_common()
+            if count >= threshold
+        ]
+
+    def start_render(self, response):
+        self.render_started = time.perf_counter()
+        response.add_post_render_callback(self.finish_render)
+
+    def finish_render(self, response):
+        self.render_time += time.perf_counter() - self.render_started
+
+
+@contextmanager
+def serialization():
+    """Относит время блока к сериализации. Вложенные блоки
+    не считаются повторно, SQL внутри блока вычитается."""
+    stats = _current.get()
+    if stats is None or stats.serializing:
+        yield
+        return
+    stats.serializing = True
+    db_time = stats.db_time
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serializing = False
+        stats.serialize_time += (
+            time.perf_counter() - started - (stats.db_time - db_time)
+        )
+
+
+class TimedSerializerMixin:
+    """Примесь к сериализаторам DRF: время to_representation
+    попадает в serialize из Server-Timing для любого view."""
+
+    def to_representation(self, instance):
+        with serialization():
+            return super().to_representation(instance)
+
+
+def track_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+def install_query_tracking(connection, **kwargs):
+    """Подключает track_query к соединению один раз на все время жизни.
+    Соединения привязаны к потоку, а асинхронный ORM ходит в базу
+    из потоков sync_to_async, поэтому статистика запроса ищется через
+    ContextVar, который копируется в эти потоки."""
+    if track_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(track_query)
+
+
+def milliseconds(seconds):
+    return round(seconds * 1000, 2)
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Считает для каждого запроса число и время SQL-запросов, повторы
+    одного запроса (признак N+1), время сериализации и рендеринга.
+    Итог отдается в заголовке Server-Timing и пишется в лог JSON-строкой;
+    для доли QUERY_LOG_SAMPLE_RATE — вместе с полным списком SQL.
+    Потоковые ответы учитываются до конца чтения тела, но в заголовок
+    попадает только время до начала отдачи.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+        connection_created.connect(install_query_tracking)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = self.start()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        for connection in connections.all(initialized_only=True):
+            install_query_tracking(connection)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats, started)
+
+    async def __acall__(self, request):
+        stats = self.start()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats, started)
+
+    def start(self):
+        return RequestStats(
+            sample=random.random() < settings.QUERY_LOG_SAMPLE_RATE
+        )
+
+    def finish(self, request, response, stats, started):
+        self.add_server_timing(
+            response, stats, time.perf_counter() - started
+        )
+
+        def done():
+            total = time.perf_counter() - started
+            self.report(request, response, stats, total)
+            observe_request(
+                request, response, stats.queries, stats.db_time, total
+            )
+
+        if not response.streaming:
+            done()
+        elif response.is_async:
+            response.streaming_content = self.atrack_stream(
+                response.streaming_content, stats, done
+            )
+        else:
+            response.streaming_content = self.track_stream(
+                response.streaming_content, stats, done
+            )
+        return response
+
+    @staticmethod
+    def track_stream(content, stats, done):
+        """Отдает тело потокового ответа, оставляя статистику запроса
+        текущей на время получения каждой части."""
+        iterator = iter(content)
+        try:
+            while True:
+                token = _current.set(stats)
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    _current.reset(token)
+                yield chunk
+        finally:
+            done()
+
+    @staticmethod
+    async def atrack_stream(content, stats, done):
+        iterator = content.__aiter__()
+        try:
+            while True:
+                token = _current.set(stats)
+                try:
+                    chunk = await iterator.__anext__()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    _current.reset(token)
+                yield chunk
+        finally:
+            done()
+
+    def process_exception(self, request, exception):
+        observe_exception(request, exception)
+
+    def process_template_response(self, request, response):
+        stats = _current.get()
+        if stats is not None:
+            stats.start_render(response)
+        return response
+
+    def add_server_timing(self, response, stats, total):
+        if not settings.SERVER_TIMING:
+            return
+        app_time = max(
+            total - stats.db_time - stats.serialize_time
+            - stats.render_time, 0
+        )
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={milliseconds(stats.db_time)};'
+            f'desc="{stats.queries} queries"',
+            f'serialize;dur={milliseconds(stats.serialize_time)}',
+            f'app;dur={milliseconds(app_time)}',
+            f'render;dur={milliseconds(stats.render_time)}',
+            f'total;dur={milliseconds(total)}',
+        ))
+
+    def report(self, request, response, stats, total):
+        duplicates = stats.duplicates()
+        level = logging.WARNING if duplicates else logging.INFO
+        if not logger.isEnabledFor(level):
+            return
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': milliseconds(total),
+            'db_ms': milliseconds(stats.db_time),
+            'queries': stats.queries,
+            'serialize_ms': milliseconds(stats.serialize_time),
+            'render_ms': milliseconds(stats.render_time),
+            'duplicates': duplicates,
+        }
+        if stats.sample:
+            record['query_log'] = stats.log
+        logger.log(level, json.dumps(record, ensure_ascii=False))
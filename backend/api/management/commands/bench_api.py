@@ -0,0 +1,105 @@
+import json
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment
+)
+
+from api.benchmark import compare, run
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет основные эндпоинты API на синтетических данных '
+        'во временной тестовой базе: p50/p95, число запросов и память.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument(
+            '--ingredients', type=int, default=0,
+            help='Сколько ингредиентов взять из CSV, 0 — все.'
+        )
+        parser.add_argument('--favorites', type=int, default=20)
+        parser.add_argument('--cart', type=int, default=10)
+        parser.add_argument('--subscriptions', type=int, default=10)
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--only', nargs='*', help='Запустить только эти сценарии.'
+        )
+        parser.add_argument(
+            '--path',
+            default=settings.BASE_DIR.parent / 'data' / 'ingredients.csv',
+            help='CSV-файл с ингредиентами: название, единица измерения.'
+        )
+        parser.add_argument('--output', help='Сохранить результат в JSON.')
+        parser.add_argument(
+            '--baseline', help='JSON прошлого прогона для сравнения.'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=1.25,
+            help='Допустимый рост p95 относительно baseline.'
+        )
+
+    def handle(self, *args, **options):
+        scale = {
+            name: options[name] for name in (
+                'users', 'recipes', 'ingredients',
+                'favorites', 'cart', 'subscriptions'
+            )
+        }
+        isolated = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+        }})
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True
+        )
+        try:
+            with tempfile.TemporaryDirectory() as media_root, isolated:
+                # Варианты изображений строятся синхронно: фоновые задачи
+                # не должны пережить временную базу и каталог.
+                with override_settings(
+                    MEDIA_ROOT=media_root, IMAGE_VARIANTS_ASYNC=False
+                ):
+                    report = run(
+                        scale, options['path'], options['iterations'],
+                        options['warmup'], options['seed'], options['only']
+                    )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f'Данные созданы за {report["seed_seconds"]} с')
+        self.stdout.write(
+            f'{"сценарий":<24}{"p50, мс":>10}{"p95, мс":>10}'
+            f'{"запросов":>10}{"память, КБ":>12}'
+        )
+        for name, result in report['results'].items():
+            self.stdout.write(
+                f'{name:<24}{result["p50_ms"]:>10.2f}'
+                f'{result["p95_ms"]:>10.2f}{result["queries"]:>10}'
+                f'{result["memory_kb"]:>12.1f}'
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                regressions = compare(
+                    report, json.load(file), options['threshold']
+                )
+            if regressions:
+                raise CommandError(
+                    'Регрессии производительности:\n'
+                    + '\n'.join(regressions)
+                )
+            self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
@@ -0,0 +1,69 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def fetch(url, headers):
+    started = time.perf_counter()
+    try:
+        with urlopen(Request(url, headers=headers)) as response:
+            response.read()
+            status = response.status
+    except HTTPError as error:
+        status = error.code
+    return time.perf_counter() - started, status
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагружает запущенные серверы параллельными GET-запросами и '
+        'сравнивает пропускную способность, например WSGI и ASGI.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url', action='append', required=True,
+            help='Адрес сервера, можно указать несколько раз.'
+        )
+        parser.add_argument(
+            '--path', action='append',
+            help='Путь запроса, по умолчанию список рецептов.'
+        )
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--token', help='Токен для Authorization.')
+
+    def handle(self, *args, **options):
+        paths = options['path'] or ['/api/recipes/?limit=10']
+        headers = {'Accept': 'application/json'}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        self.stdout.write(
+            f'{"адрес":<48}{"зап./с":>10}{"p50, мс":>10}'
+            f'{"p95, мс":>10}{"ошибок":>8}'
+        )
+        for base in options['url']:
+            for path in paths:
+                url = base.rstrip('/') + path
+                fetch(url, headers)
+                started = time.perf_counter()
+                with ThreadPoolExecutor(options['concurrency']) as pool:
+                    results = list(pool.map(
+                        lambda _: fetch(url, headers),
+                        range(options['requests'])
+                    ))
+                elapsed = time.perf_counter() - started
+                timings = sorted(duration * 1000 for duration, _ in results)
+                errors = sum(status >= 400 for _, status in results)
+                if errors == len(results):
+                    raise CommandError(f'{url}: все запросы с ошибкой')
+                self.stdout.write(
+                    f'{url:<48}{len(results) / elapsed:>10.1f}'
+                    f'{statistics.median(timings):>10.2f}'
+                    f'{timings[int(len(timings) * 0.95)]:>10.2f}'
+                    f'{errors:>8}'
+                )
@@ -0,0 +1,59 @@
+import csv
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.ingredient_search import DEFAULT_LIMIT, IngredientIndex
+
+QUERIES = (
+    'а', 'мо', 'мол', 'молоко', 'сах', 'сахар', 'сыр', 'кур', 'куриное филе',
+    'масло', 'сливочное', 'перец', 'томат', 'яйц', 'мука', 'картфель',
+    'памидор', 'чеснок', 'зелень', 'шоколат', 'ваниль', 'соус', 'рис',
+)
+
+
+class Command(BaseCommand):
+    help = 'Замеряет скорость поиска ингредиентов по индексу в памяти.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=settings.BASE_DIR.parent / 'data' / 'ingredients.csv',
+            help='CSV-файл с ингредиентами: название, единица измерения.'
+        )
+        parser.add_argument('--repeat', type=int, default=200)
+        parser.add_argument('--limit', type=int, default=DEFAULT_LIMIT)
+
+    def handle(self, *args, **options):
+        with open(options['path'], encoding='utf-8') as file:
+            rows = [
+                {'id': number, 'name': name, 'measurement_unit': unit}
+                for number, (name, unit) in enumerate(csv.reader(file), 1)
+            ]
+
+        started = time.perf_counter()
+        index = IngredientIndex(rows)
+        build_ms = (time.perf_counter() - started) * 1000
+        self.stdout.write(
+            f'Индекс: {len(index)} ингредиентов, '
+            f'построение {build_ms:.1f} мс'
+        )
+
+        timings = []
+        for query in QUERIES:
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                index.search(query, options['limit'])
+                timings.append((time.perf_counter() - started) * 1e6)
+            top = [item['name'] for item in index.search(query, 3)]
+            self.stdout.write(f'  {query!r}: {", ".join(top)}')
+
+        timings.sort()
+        self.stdout.write(self.style.SUCCESS(
+            f'Запросов: {len(timings)}, '
+            f'p50 {statistics.median(timings):.1f} мкс, '
+            f'p95 {timings[int(len(timings) * 0.95)]:.1f} мкс, '
+            f'max {timings[-1]:.1f} мкс'
+        ))
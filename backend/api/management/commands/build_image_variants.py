@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from api.images import build_variants
+from api.recipe_cache import invalidate_recipes
+from recipes.models import Recipe
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает недостающие уменьшенные копии изображений рецептов '
+        'и аватаров, например для загруженных до появления копий.'
+    )
+
+    def build(self, model, field_name, sizes):
+        built = []
+        queryset = model.objects.exclude(**{field_name: ''}).exclude(
+            **{f'{field_name}__isnull': True}
+        ).values_list('pk', flat=True)
+        for pk in queryset.iterator():
+            if build_variants(model, pk, field_name, sizes):
+                built.append(pk)
+        self.stdout.write(self.style.SUCCESS(
+            f'{model._meta.verbose_name_plural}: создано копий {len(built)}.'
+        ))
+        return built
+
+    def handle(self, *args, **options):
+        recipe_ids = self.build(Recipe, 'image', ('card', 'detail'))
+        author_ids = self.build(CustomUser, 'avatar', ('avatar',))
+        invalidate_recipes(recipe_ids)
+        invalidate_recipes(Recipe.objects.filter(
+            author_id__in=author_ids
+        ).values_list('id', flat=True))
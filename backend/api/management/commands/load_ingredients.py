@@ -0,0 +1,178 @@
+import csv
+import io
+import json
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from api.catalog import invalidate_catalog
+from api.ingredient_search import invalidate_ingredient_index
+from recipes.models import Ingredient
+
+BATCH_SIZE = 5000
+JSON_CHUNK_SIZE = 64 * 1024
+STAGING_TABLE = 'ingredient_staging'
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def read_json(file):
+    """Читает JSON-массив объектов по частям, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    opened = False
+    while True:
+        chunk = file.read(JSON_CHUNK_SIZE)
+        buffer += chunk
+        while True:
+            buffer = buffer.lstrip(' \t\r\n,')
+            if not opened:
+                if not buffer:
+                    break
+                if not buffer.startswith('['):
+                    raise CommandError('Ожидается JSON-массив ингредиентов.')
+                buffer = buffer[1:]
+                opened = True
+                continue
+            if buffer.startswith(']'):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                break
+            buffer = buffer[end:]
+            yield item['name'], item['measurement_unit']
+        if not chunk:
+            if opened or buffer.strip():
+                raise CommandError('Файл JSON поврежден или обрезан.')
+            return
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает ингредиенты из CSV или JSON файла. '
+        'Повторная загрузка не создает дубликатов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=settings.BASE_DIR.parent / 'data' / 'ingredients.csv',
+            help='Путь к файлу .csv (название, единица) или .json.'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Не использовать COPY даже на PostgreSQL.'
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if path.suffix not in ('.csv', '.json'):
+            raise CommandError('Поддерживаются только файлы .csv и .json.')
+        reader = read_json if path.suffix == '.json' else read_csv
+        self.read = self.skipped = 0
+        use_copy = (
+            connection.vendor == 'postgresql' and not options['no_copy']
+        )
+
+        started = time.perf_counter()
+        before = Ingredient.objects.count()
+        with open(path, encoding='utf-8') as file:
+            rows = self.clean(reader(file))
+            with transaction.atomic():
+                if use_copy:
+                    self.load_with_copy(rows, options['batch_size'])
+                else:
+                    self.load_with_bulk_create(rows, options['batch_size'])
+        created = Ingredient.objects.count() - before
+        elapsed = time.perf_counter() - started
+        if created:
+            invalidate_ingredient_index()
+            invalidate_catalog('ingredients')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано {self.read}, пропущено {self.skipped}, '
+            f'добавлено {created} за {elapsed:.2f} с '
+            f'({self.read / elapsed:.0f} строк/с, '
+            f'{"COPY" if use_copy else "bulk_create"}).'
+        ))
+
+    def clean(self, rows):
+        """Нормализует строки, отбрасывает пустые, слишком длинные
+        и повторяющиеся пары (название, единица измерения)."""
+        max_name = Ingredient._meta.get_field('name').max_length
+        max_unit = Ingredient._meta.get_field('measurement_unit').max_length
+        seen = set()
+        for name, measurement_unit in rows:
+            self.read += 1
+            key = (name.strip(), measurement_unit.strip())
+            if (
+                not all(key)
+                or len(key[0]) > max_name
+                or len(key[1]) > max_unit
+                or key in seen
+            ):
+                self.skipped += 1
+                continue
+            seen.add(key)
+            yield key
+
+    def load_with_bulk_create(self, rows, batch_size):
+        for batch in batched(rows, batch_size):
+            Ingredient.objects.bulk_create(
+                [
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in batch
+                ],
+                ignore_conflicts=True,
+            )
+
+    def load_with_copy(self, rows, batch_size):
+        """Копирует строки во временную таблицу через COPY
+        и переносит новые одним INSERT ... ON CONFLICT DO NOTHING."""
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE {STAGING_TABLE} '
+                '(name text, measurement_unit text) ON COMMIT DROP'
+            )
+            copy_sql = (
+                f'COPY {STAGING_TABLE} (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)'
+            )
+            for batch in batched(rows, batch_size):
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(batch)
+                buffer.seek(0)
+                raw_cursor = cursor.cursor
+                if hasattr(raw_cursor, 'copy_expert'):
+                    raw_cursor.copy_expert(copy_sql, buffer)
+                else:
+                    with raw_cursor.copy(copy_sql) as copy:
+                        copy.write(buffer.getvalue())
+            cursor.execute(
+                f'INSERT INTO {quote(Ingredient._meta.db_table)} '
+                '(name, measurement_unit) '
+                f'SELECT name, measurement_unit FROM {STAGING_TABLE} '
+                'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from api.feed import rebuild_feeds
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает ленты подписок по текущим подпискам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'user_ids', nargs='*', type=int,
+            help='id пользователей; по умолчанию все подписчики'
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_feeds(options['user_ids'] or None)
+        self.stdout.write(f'Перестроено лент: {count}')
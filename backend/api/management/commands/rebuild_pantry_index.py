@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.pantry import invalidate_pantry_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Сбрасывает индекс подбора рецептов по ингредиентам во всех '
+        'процессах, например после загрузки IngredientRecipe без сигналов'
+    )
+
+    def handle(self, *args, **options):
+        version = invalidate_pantry_index()
+        self.stdout.write(f'Версия индекса: {version}')
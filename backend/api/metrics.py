@@ -0,0 +1,125 @@
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest
+)
+from prometheus_client import multiprocess
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1, 2.5, 5, 10
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+
+REQUESTS = Counter(
+    'foodgram_http_requests_total',
+    'Число HTTP-запросов.',
+    ('view', 'method', 'status')
+)
+LATENCY = Histogram(
+    'foodgram_http_request_duration_seconds',
+    'Время обработки запроса.',
+    ('view', 'method'),
+    buckets=LATENCY_BUCKETS
+)
+QUERIES = Histogram(
+    'foodgram_db_queries_per_request',
+    'Число SQL-запросов на HTTP-запрос.',
+    ('view',),
+    buckets=QUERY_BUCKETS
+)
+DB_TIME = Histogram(
+    'foodgram_db_duration_seconds',
+    'Суммарное время SQL-запросов за HTTP-запрос.',
+    ('view',),
+    buckets=LATENCY_BUCKETS
+)
+EXCEPTIONS = Counter(
+    'foodgram_http_exceptions_total',
+    'Необработанные исключения во view.',
+    ('view', 'exception')
+)
+POOL_CONNECTIONS = Gauge(
+    'foodgram_db_pool_connections',
+    'Соединения в пулах воркеров: opened, idle, checked_out.',
+    ('alias', 'state'),
+    multiprocess_mode='livesum'
+)
+POOL_WAITS = Gauge(
+    'foodgram_db_pool_waits',
+    'Сколько раз запрос ждал свободное соединение с запуска воркеров.',
+    ('alias',),
+    multiprocess_mode='livesum'
+)
+POOL_WAIT_TIME = Gauge(
+    'foodgram_db_pool_wait_seconds',
+    'Суммарное время ожидания соединения с запуска воркеров.',
+    ('alias',),
+    multiprocess_mode='livesum'
+)
+POOL_TIMEOUTS = Gauge(
+    'foodgram_db_pool_timeouts',
+    'Сколько раз соединение не удалось получить за TIMEOUT.',
+    ('alias',),
+    multiprocess_mode='livesum'
+)
+
+
+def view_label(request):
+    """
+    Имя view для метки: для DRF-viewset — класс и действие
+    (RecipeViewSet.favorite), для остальных — имя маршрута.
+    Запросы без маршрута сводятся в одну метку, чтобы случайные
+    адреса не плодили временные ряды.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    view_class = getattr(match.func, 'cls', None)
+    actions = getattr(match.func, 'actions', None)
+    if view_class is not None and actions:
+        action = actions.get(request.method.lower(), request.method.lower())
+        return f'{view_class.__name__}.{action}'
+    return match.view_name or match.func.__name__
+
+
+def observe_request(request, response, queries, db_time, duration):
+    view = view_label(request)
+    REQUESTS.labels(view, request.method, response.status_code).inc()
+    LATENCY.labels(view, request.method).observe(duration)
+    QUERIES.labels(view).observe(queries)
+    DB_TIME.labels(view).observe(db_time)
+
+
+def observe_exception(request, exception):
+    EXCEPTIONS.labels(view_label(request), type(exception).__name__).inc()
+
+
+def observe_pool(alias, stats):
+    """Публикует снимок статистики пула процесса. Пулов на алиас
+    может быть несколько, если менялись параметры соединения, —
+    в метрики попадает последний затронутый."""
+    for state in ('opened', 'idle', 'checked_out'):
+        POOL_CONNECTIONS.labels(alias, state).set(stats[state])
+    POOL_WAITS.labels(alias).set(stats['waits'])
+    POOL_WAIT_TIME.labels(alias).set(stats['wait_time'])
+    POOL_TIMEOUTS.labels(alias).set(stats['timeouts'])
+
+
+def render_metrics():
+    """
+    Возвращает метрики в текстовом формате Prometheus.
+    Если задан PROMETHEUS_MULTIPROC_DIR, значения собираются из файлов
+    всех воркеров gunicorn, иначе отдаются метрики текущего процесса.
+    """
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
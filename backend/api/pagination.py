@@ -1,5 +1,104 @@
-from rest_framework.pagination import PageNumberPagination
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Курсорная пагинация по ключу сортировки без OFFSET и COUNT(*).
+    В курсоре хранятся значения всех полей сортировки, а не только
+    первого, поэтому записи с одинаковой датой не пропускаются и не
+    повторяются. Пустой параметр `cursor` означает первую страницу.
+    """
+    page_size_query_param = 'limit'
+    position_separator = '|'
+
+    def read_cursor(self, request):
+        if not request.query_params.get(self.cursor_query_param):
+            return None
+        cursor = super().decode_cursor(request)
+        if cursor.position is not None and len(
+            cursor.position.split(self.position_separator)
+        ) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def decode_cursor(self, request):
+        # Позицию применяет paginate_queryset: CursorPagination
+        # фильтрует только по первому полю сортировки.
+        cursor = self.read_cursor(request)
+        return cursor and cursor._replace(position=None)
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            field_name = order.lstrip('-')
+            if isinstance(instance, dict):
+                values.append(instance[field_name])
+            else:
+                values.append(getattr(instance, field_name))
+        return self.position_separator.join(map(str, values))
+
+    def position_filter(self, position, reverse):
+        """Условие «после позиции» по всем полям сортировки:
+        (a < x) OR (a = x AND b < y) для убывающих полей."""
+        values = position.split(self.position_separator)
+        condition = Q()
+        equal = Q()
+        for order, value in zip(self.ordering, values):
+            field_name = order.lstrip('-')
+            lookup = 'lt' if reverse != order.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{field_name}__{lookup}': value})
+            equal &= Q(**{field_name: value})
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.ordering = self.get_ordering(request, queryset, view)
+        cursor = self.read_cursor(request)
+        position = cursor and cursor.position
+        if position is not None:
+            queryset = queryset.filter(
+                self.position_filter(position, cursor.reverse)
+            )
+        page = super().paginate_queryset(queryset, request, view)
+        if position is not None and cursor.reverse:
+            self.has_next = True
+            self.next_position = position
+        elif position is not None:
+            self.has_previous = True
+            self.previous_position = position
+        return page
 
 
 class PageLimitPagination(PageNumberPagination):
+    """Постраничная пагинация с параметром `limit`.
+    Если задан `cursor_ordering` и в запросе передан параметр `cursor`,
+    переключается на курсорную пагинацию по этому ключу."""
     page_size_query_param = 'limit'
+    cursor_ordering = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if (
+            self.cursor_ordering
+            and KeysetPagination.cursor_query_param in request.query_params
+        ):
+            self.keyset = KeysetPagination()
+            self.keyset.ordering = self.cursor_ordering
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class RecipePagination(PageLimitPagination):
+    """Пагинация рецептов: курсор по дате публикации и id."""
+    cursor_ordering = ('-pub_date', '-id')
+
+
+class SubscriptionPagination(PageLimitPagination):
+    """Пагинация подписок: курсор по id подписки."""
+    cursor_ordering = ('-subscription_id',)
@@ -0,0 +1,357 @@
+"""
+Подбор рецептов по имеющимся ингредиентам.
+
+Обратный индекс ингредиент → рецепты хранится в памяти процесса.
+Номер бита — id рецепта. Частые ингредиенты хранятся битовыми
+множествами (int), редкие — отсортированными массивами id: так индекс
+занимает не больше четырех байт на строку IngredientRecipe. Число
+совпавших ингредиентов для всех рецептов сразу считается побитовым
+сложением множеств.
+
+Изменения рецептов не перестраивают индекс: номер версии и список
+измененных рецептов записываются в общий кеш, и каждый процесс
+применяет их к своей копии. Если часть списка уже вытеснена из кеша,
+индекс собирается заново.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+
+from api.db_router import read_from_primary
+from api.utils import bump_version, get_version
+from recipes.models import IngredientRecipe
+
+MODES = ('all', 'any', 'missing')
+MAX_INGREDIENTS = 50
+MAX_MISSING = 10
+MAX_REPLAY_RECIPES = 1000
+BITS_CACHE_SIZE = 256
+VERSION_CHECK_INTERVAL = 5
+VERSION_CACHE_KEY = 'pantry_index_version'
+CHANGES_CACHE_KEY = 'pantry_index_changes:{}'
+CHANGES_TIMEOUT = 60 * 60
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def popcount(bits):
+        return bin(bits).count('1')
+
+
+def to_bits(positions):
+    """Битовое множество из отсортированного массива номеров."""
+    if not positions:
+        return 0
+    buffer = bytearray(positions[-1] // 8 + 1)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, 'little')
+
+
+def add_bitsets(bitsets):
+    """
+    Складывает битовые множества поразрядно: бит рецепта в слое n
+    равен n-му разряду числа множеств, в которых он есть.
+    """
+    layers = []
+    for bits in bitsets:
+        carry = bits
+        for level, layer in enumerate(layers):
+            if not carry:
+                break
+            layers[level] = layer ^ carry
+            carry &= layer
+        if carry:
+            layers.append(carry)
+    return layers
+
+
+def count_equals(layers, value, universe):
+    """Рецепты из universe, у которых сумма в слоях равна value."""
+    if value >> len(layers):
+        return 0
+    result = universe
+    for level, layer in enumerate(layers):
+        result &= layer if value >> level & 1 else ~layer
+    return result
+
+
+class Matches:
+    """
+    Найденные рецепты в порядке ранжирования: группы с одинаковым
+    числом совпавших и всех ингредиентов, внутри группы — от новых
+    к старым. Поддерживает len() и срезы для пагинатора.
+    """
+
+    def __init__(self, groups):
+        self.groups = [
+            (matched, size, bits, popcount(bits))
+            for matched, size, bits in groups
+            if bits
+        ]
+        self.count = sum(group[-1] for group in self.groups)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, key):
+        """Срез вида (id рецепта, совпало, всего ингредиентов)."""
+        skip, stop, _ = key.indices(self.count)
+        wanted = stop - skip
+        result = []
+        for matched, size, bits, count in self.groups:
+            if wanted <= 0:
+                break
+            if skip >= count:
+                skip -= count
+                continue
+            while bits and wanted > 0:
+                position = bits.bit_length() - 1
+                bits ^= 1 << position
+                if skip:
+                    skip -= 1
+                    continue
+                result.append((position, matched, size))
+                wanted -= 1
+        return result
+
+
+class PantryIndex:
+    """
+    Индекс ингредиентов рецептов. Отвечает на запросы «все из»,
+    «любой из» и «не хватает не больше K» с ранжированием по доле
+    ингредиентов рецепта, которые есть у пользователя.
+    """
+
+    def __init__(self, rows, version=0):
+        self.version = version
+        self.dense = {}
+        self.sparse = {}
+        self.sizes = array('H')
+        self.size_bits = {}
+        self.bits_cache = {}
+        postings = defaultdict(list)
+        for recipe_id, ingredient_id in rows:
+            postings[ingredient_id].append(recipe_id)
+        for ingredient_id, recipe_ids in postings.items():
+            recipe_ids.sort()
+            self.grow(recipe_ids[-1])
+            for recipe_id in recipe_ids:
+                self.sizes[recipe_id] += 1
+            self.sparse[ingredient_id] = array('I', recipe_ids)
+        for ingredient_id in list(self.sparse):
+            self.compact(ingredient_id)
+        by_size = defaultdict(list)
+        for recipe_id, size in enumerate(self.sizes):
+            if size:
+                by_size[size].append(recipe_id)
+        self.size_bits = {
+            size: to_bits(recipe_ids) for size, recipe_ids in by_size.items()
+        }
+
+    @classmethod
+    @read_from_primary()
+    def from_database(cls, version=0):
+        return cls(
+            IngredientRecipe.objects.order_by().values_list(
+                'recipe_id', 'ingredient_id'
+            ).iterator(chunk_size=10_000),
+            version,
+        )
+
+    def __len__(self):
+        return sum(map(popcount, self.size_bits.values()))
+
+    def grow(self, recipe_id):
+        if recipe_id >= len(self.sizes):
+            self.sizes.extend([0] * (recipe_id + 1 - len(self.sizes)))
+
+    def compact(self, ingredient_id):
+        """Переводит массив в битовое множество, когда оно меньше."""
+        recipe_ids = self.sparse[ingredient_id]
+        if len(recipe_ids) * 32 >= len(self.sizes):
+            self.dense[ingredient_id] = to_bits(recipe_ids)
+            del self.sparse[ingredient_id]
+
+    def bits(self, ingredient_id):
+        """Битовое множество рецептов с ингредиентом. Множества из
+        массивов запоминаются: их сборка — самая долгая часть запроса."""
+        bits_cache = self.bits_cache
+        bits = self.dense.get(ingredient_id)
+        if bits is None:
+            bits = bits_cache.get(ingredient_id)
+        if bits is None:
+            if len(bits_cache) >= BITS_CACHE_SIZE:
+                bits_cache.clear()
+            bits = bits_cache[ingredient_id] = to_bits(
+                self.sparse.get(ingredient_id)
+            )
+        return bits
+
+    def apply(self, recipes):
+        """Заменяет ингредиенты рецептов: recipes — словарь
+        id рецепта → множество id ингредиентов (пустое для удаленных)."""
+        changed = sorted(recipes)
+        if not changed:
+            return
+        self.grow(changed[-1])
+        keep = ~sum(1 << recipe_id for recipe_id in changed)
+        for ingredient_id, bits in list(self.dense.items()):
+            self.dense[ingredient_id] = bits & keep
+        for recipe_ids in list(self.sparse.values()):
+            for recipe_id in changed:
+                position = bisect_left(recipe_ids, recipe_id)
+                if (
+                    position < len(recipe_ids)
+                    and recipe_ids[position] == recipe_id
+                ):
+                    del recipe_ids[position]
+        for size in {self.sizes[recipe_id] for recipe_id in changed} - {0}:
+            self.size_bits[size] &= keep
+        for recipe_id in changed:
+            size = self.sizes[recipe_id] = len(recipes[recipe_id])
+            if size:
+                self.size_bits[size] = (
+                    self.size_bits.get(size, 0) | 1 << recipe_id
+                )
+            for ingredient_id in recipes[recipe_id]:
+                if ingredient_id in self.dense:
+                    self.dense[ingredient_id] |= 1 << recipe_id
+                else:
+                    insort(
+                        self.sparse.setdefault(ingredient_id, array('I')),
+                        recipe_id
+                    )
+                    self.compact(ingredient_id)
+        # Запросы, начатые во время обновления, пишут в старый кеш.
+        self.bits_cache = {}
+
+    def search(self, ingredient_ids, mode='missing', missing=0):
+        """
+        Рецепты для набора ингредиентов:
+        all — в рецепте есть все перечисленные ингредиенты;
+        any — есть хотя бы один из них;
+        missing — хотя бы один есть, а не хватает не больше `missing`.
+        """
+        ingredient_ids = set(ingredient_ids)
+        if not ingredient_ids:
+            return Matches([])
+        bitsets = [self.bits(pk) for pk in ingredient_ids]
+        if mode == 'all':
+            found = bitsets[0]
+            for bits in bitsets[1:]:
+                found &= bits
+            counts = {len(bitsets): found}
+        else:
+            layers = add_bitsets(bits for bits in bitsets if bits)
+            universe = 0
+            for layer in layers:
+                universe |= layer
+            counts = {
+                matched: count_equals(layers, matched, universe)
+                for matched in range(1, len(bitsets) + 1)
+            }
+        groups = [
+            (matched, size, bits & found)
+            for size, bits in list(self.size_bits.items())
+            for matched, found in counts.items()
+            if matched <= size and (
+                mode != 'missing' or size - matched <= missing
+            )
+        ]
+        groups.sort(key=lambda group: (
+            -group[0] / group[1], group[1] - group[0], -group[0]
+        ))
+        return Matches(groups)
+
+
+_index = None
+_checked_at = 0.0
+_lock = threading.Lock()
+_pending = threading.local()
+
+
+def changed_recipes(recipe_ids):
+    """Текущие ингредиенты рецептов из основной базы."""
+    recipes = {recipe_id: set() for recipe_id in recipe_ids}
+    with read_from_primary():
+        for recipe_id, ingredient_id in IngredientRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by().values_list('recipe_id', 'ingredient_id'):
+            recipes[recipe_id].add(ingredient_id)
+    return recipes
+
+
+def catch_up(index, version):
+    """Применяет к индексу изменения из общего кеша.
+    Возвращает False, если индекс нужно собрать заново."""
+    if index is None or index.version > version:
+        return False
+    keys = [
+        CHANGES_CACHE_KEY.format(number)
+        for number in range(index.version + 1, version + 1)
+    ]
+    changes = cache.get_many(keys)
+    if len(changes) != len(keys):
+        return False
+    recipe_ids = set().union(*changes.values())
+    if len(recipe_ids) > MAX_REPLAY_RECIPES:
+        return False
+    index.apply(changed_recipes(recipe_ids))
+    index.version = version
+    return True
+
+
+def get_pantry_index():
+    """
+    Возвращает индекс текущего процесса, догоняя изменения из общего
+    кеша. Версия проверяется не чаще раза в VERSION_CHECK_INTERVAL
+    секунд, кроме процесса, который сам изменил рецепты.
+    """
+    global _index, _checked_at
+    now = time.monotonic()
+    index = _index
+    if index is not None and now - _checked_at < VERSION_CHECK_INTERVAL:
+        return index
+    with _lock:
+        version = get_version(VERSION_CACHE_KEY)
+        if not catch_up(_index, version):
+            _index = PantryIndex.from_database(version)
+        _checked_at = now
+        return _index
+
+
+def flush_pantry_updates():
+    global _checked_at
+    recipe_ids = _pending.__dict__.pop('recipe_ids', set())
+    if not recipe_ids:
+        return
+    version = bump_version(VERSION_CACHE_KEY)
+    cache.set(
+        CHANGES_CACHE_KEY.format(version), recipe_ids, CHANGES_TIMEOUT
+    )
+    _checked_at = 0.0
+
+
+def schedule_pantry_update(recipe_ids):
+    """Записывает измененные рецепты в общий кеш после фиксации
+    транзакции, одним номером версии на транзакцию."""
+    recipe_ids = set(recipe_ids)
+    if not recipe_ids:
+        return
+    _pending.__dict__.setdefault('recipe_ids', set()).update(recipe_ids)
+    transaction.on_commit(flush_pantry_updates)
+
+
+def invalidate_pantry_index():
+    """Собирает индекс заново во всех процессах."""
+    global _index
+    version = bump_version(VERSION_CACHE_KEY)
+    with _lock:
+        _index = None
+    return version
@@ -0,0 +1,75 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from recipes.models import Recipe, Subscription
+
+RECIPE_CACHE_TIMEOUT = 60 * 60
+ANONYMOUS_FLAGS = {
+    'is_favorited': False,
+    'is_in_shopping_cart': False,
+    'is_subscribed': False,
+}
+
+
+def recipe_key(recipe_id):
+    return f'recipe_detail:{recipe_id}'
+
+
+def get_cached_recipe(recipe_id):
+    return cache.get(recipe_key(recipe_id))
+
+
+async def aget_cached_recipe(recipe_id):
+    return await cache.aget(recipe_key(recipe_id))
+
+
+def cache_recipe(data):
+    """Сохраняет представление рецепта. Поля, зависящие от пользователя,
+    перезаписываются при каждом чтении в personalize()."""
+    cache.set(recipe_key(data['id']), data, RECIPE_CACHE_TIMEOUT)
+
+
+def flags_queryset(recipe_id, user):
+    return Recipe.objects.filter(pk=recipe_id).with_user_flags(
+        user
+    ).annotate(
+        is_subscribed=Exists(Subscription.objects.filter(
+            user=user, author=OuterRef('author')
+        ))
+    ).values('is_favorited', 'is_in_shopping_cart', 'is_subscribed')
+
+
+def apply_flags(data, flags):
+    if flags is not None:
+        data['is_favorited'] = flags['is_favorited']
+        data['is_in_shopping_cart'] = flags['is_in_shopping_cart']
+        data['author']['is_subscribed'] = flags['is_subscribed']
+    return data
+
+
+def personalize(data, request):
+    """Подставляет в закешированный рецепт признаки текущего пользователя:
+    избранное, корзину и подписку на автора — одним запросом."""
+    if request.user.is_anonymous:
+        return apply_flags(data, ANONYMOUS_FLAGS)
+    return apply_flags(
+        data, flags_queryset(data['id'], request.user).first()
+    )
+
+
+async def apersonalize(data, request):
+    """Асинхронный вариант personalize()."""
+    if request.user.is_anonymous:
+        return apply_flags(data, ANONYMOUS_FLAGS)
+    return apply_flags(
+        data, await flags_queryset(data['id'], request.user).afirst()
+    )
+
+
+def invalidate_recipes(recipe_ids):
+    """Удаляет рецепты из кеша после фиксации транзакции,
+    чтобы параллельный запрос не закешировал старые данные."""
+    keys = [recipe_key(recipe_id) for recipe_id in recipe_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,209 @@
+"""
+Быстрое чтение списка рецептов.
+
+Страница выбирается через values() без создания моделей, а JSON
+собирается из строк обычными словарями в том же виде, что отдает
+RecipeGetSerializer. Совпадение с сериализатором проверяют тесты
+api/tests/test_recipe_rows.py: при изменении RecipeGetSerializer,
+ProfileSerializer, TagSerializer или IngredientRecipeGetSerializer
+нужно поменять и этот модуль.
+"""
+from collections import defaultdict
+
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+
+from api.images import variant_urls
+from api.instrumentation import serialization
+from api.utils import get_subscribed_author_ids
+from recipes.models import IngredientRecipe, Recipe
+from users.models import CustomUser
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+RECIPE_FIELDS = (
+    'id', 'name', 'image', 'image_variants', 'text', 'cooking_time',
+    'pub_date', 'is_favorited', 'is_in_shopping_cart', 'author_id',
+    'author__username', 'author__first_name', 'author__last_name',
+    'author__email', 'author__avatar', 'author__avatar_variants',
+)
+URL_CACHE_SIZE = 100_000
+
+
+class CachedURLs:
+    """URL файлов хранилища с кешем в памяти процесса: имена файлов
+    уникальны и не меняются, а storage.url() занимает большую часть
+    времени сборки страницы."""
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.urls = {}
+
+    def url(self, name):
+        url = self.urls.get(name)
+        if url is None:
+            if len(self.urls) >= URL_CACHE_SIZE:
+                self.urls.clear()
+            url = self.urls[name] = self.storage.url(name)
+        return url
+
+
+RECIPE_IMAGES = CachedURLs(Recipe._meta.get_field('image').storage)
+AVATARS = CachedURLs(CustomUser._meta.get_field('avatar').storage)
+
+
+def ingredients_prefetch():
+    """Ингредиенты рецепта в порядке добавления вместе с названиями."""
+    return Prefetch(
+        'amount_ingredients',
+        queryset=IngredientRecipe.objects.select_related(
+            'ingredient'
+        ).order_by('id')
+    )
+
+
+def tags_queryset(recipe_ids):
+    return Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('tag__name').values_list(
+        'recipe_id', 'tag_id', 'tag__name', 'tag__slug'
+    )
+
+
+def ingredients_queryset(recipe_ids):
+    return IngredientRecipe.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('id').values_list(
+        'recipe_id', 'ingredient_id', 'ingredient__name',
+        'ingredient__measurement_unit', 'amount'
+    )
+
+
+def group_tags(rows):
+    tags = defaultdict(list)
+    for recipe_id, tag_id, name, slug in rows:
+        tags[recipe_id].append({'id': tag_id, 'name': name, 'slug': slug})
+    return tags
+
+
+def group_ingredients(rows):
+    ingredients = defaultdict(list)
+    for recipe_id, ingredient_id, name, unit, amount in rows:
+        ingredients[recipe_id].append({
+            'id': ingredient_id,
+            'name': name,
+            'measurement_unit': unit,
+            'amount': amount,
+        })
+    return ingredients
+
+
+def build_recipes(rows, tags, ingredients, request):
+    """Собирает представления рецептов из строк RECIPE_FIELDS."""
+    user = request.user
+    subscribed = (
+        get_subscribed_author_ids(request) if user.is_authenticated
+        else ()
+    )
+    absolute_uri = request.build_absolute_uri
+    recipes = []
+    with serialization():
+        for row in rows:
+            recipe_id = row['id']
+            image = row['image']
+            avatar = row['author__avatar']
+            recipes.append({
+                'id': recipe_id,
+                'tags': tags.get(recipe_id, []),
+                'author': {
+                    'id': row['author_id'],
+                    'username': row['author__username'],
+                    'first_name': row['author__first_name'],
+                    'last_name': row['author__last_name'],
+                    'email': row['author__email'],
+                    'is_subscribed': row['author_id'] in subscribed,
+                    'avatar': (
+                        absolute_uri(AVATARS.url(avatar)) if avatar
+                        else None
+                    ),
+                    'avatar_variants': variant_urls(
+                        AVATARS, avatar, row['author__avatar_variants']
+                    ),
+                },
+                'ingredients': ingredients.get(recipe_id, []),
+                'is_favorited': row['is_favorited'],
+                'is_in_shopping_cart': row['is_in_shopping_cart'],
+                'name': row['name'],
+                'image': RECIPE_IMAGES.url(image) if image else None,
+                'image_variants': variant_urls(
+                    RECIPE_IMAGES, image, row['image_variants']
+                ),
+                'text': row['text'],
+                'cooking_time': row['cooking_time'],
+            })
+    return recipes
+
+
+def serialize_recipes(rows, request):
+    """Представления рецептов страницы: теги и ингредиенты
+    загружаются двумя запросами на всю страницу."""
+    recipe_ids = [row['id'] for row in rows]
+    if not recipe_ids:
+        return []
+    return build_recipes(
+        rows,
+        group_tags(tags_queryset(recipe_ids)),
+        group_ingredients(ingredients_queryset(recipe_ids)),
+        request
+    )
+
+
+async def aserialize_recipes(rows, request):
+    """Асинхронный вариант serialize_recipes(). Подписки должны быть
+    загружены заранее через aload_subscribed_author_ids()."""
+    recipe_ids = [row['id'] for row in rows]
+    if not recipe_ids:
+        return []
+    return build_recipes(
+        rows,
+        group_tags([row async for row in tags_queryset(recipe_ids)]),
+        group_ingredients(
+            [row async for row in ingredients_queryset(recipe_ids)]
+        ),
+        request
+    )
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson: те же байты, что у DRF, для данных из
+    строк, словарей и чисел. Отступы по запросу клиента и окружение
+    без orjson обслуживает обычный JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        try:
+            # Ошибки валидации списков приходят с числовыми ключами.
+            content = orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # Типы, которых orjson не знает: ленивые строки, Decimal.
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        # DRF экранирует разделители строк, чтобы JSON был валидным JS.
+        if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+            content = content.replace(
+                b'\xe2\x80\xa8', b'\\u2028'
+            ).replace(b'\xe2\x80\xa9', b'\\u2029')
+        return content
@@ -0,0 +1,130 @@
+import threading
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'recipes_recipe_fts'
+FTS_WEIGHTS = '10.0, 1.0, 4.0, 4.0'
+
+_pending = threading.local()
+
+POSTGRES_UPDATE_SQL = f"""
+    UPDATE recipes_recipe AS recipe SET search_vector =
+        setweight(to_tsvector('{SEARCH_CONFIG}', recipe.name), 'A')
+        || setweight(to_tsvector('{SEARCH_CONFIG}', concat_ws(' ',
+            (SELECT string_agg(tag.name, ' ')
+             FROM recipes_recipe_tags AS recipe_tag
+             JOIN recipes_tag AS tag ON tag.id = recipe_tag.tag_id
+             WHERE recipe_tag.recipe_id = recipe.id),
+            (SELECT string_agg(ingredient.name, ' ')
+             FROM recipes_ingredientrecipe AS amount
+             JOIN recipes_ingredient AS ingredient
+                 ON ingredient.id = amount.ingredient_id
+             WHERE amount.recipe_id = recipe.id)
+        )), 'B')
+        || setweight(to_tsvector('{SEARCH_CONFIG}', recipe.text), 'C')
+    WHERE recipe.id = ANY(%s)
+"""
+
+SQLITE_DELETE_SQL = f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({{}})'
+SQLITE_INSERT_SQL = f"""
+    INSERT INTO {FTS_TABLE} (rowid, name, text, tags, ingredients)
+    SELECT recipe.id, recipe.name, recipe.text,
+        (SELECT group_concat(tag.name, ' ')
+         FROM recipes_recipe_tags AS recipe_tag
+         JOIN recipes_tag AS tag ON tag.id = recipe_tag.tag_id
+         WHERE recipe_tag.recipe_id = recipe.id),
+        (SELECT group_concat(ingredient.name, ' ')
+         FROM recipes_ingredientrecipe AS amount
+         JOIN recipes_ingredient AS ingredient
+             ON ingredient.id = amount.ingredient_id
+         WHERE amount.recipe_id = recipe.id)
+    FROM recipes_recipe AS recipe
+    WHERE recipe.id IN ({{}})
+"""
+
+
+def update_search_index(recipe_ids):
+    """
+    Пересчитывает поисковый индекс для рецептов одним запросом:
+    tsvector в PostgreSQL или строки таблицы FTS5 в SQLite.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(POSTGRES_UPDATE_SQL, [recipe_ids])
+        elif connection.vendor == 'sqlite':
+            placeholders = ', '.join(['%s'] * len(recipe_ids))
+            cursor.execute(
+                SQLITE_DELETE_SQL.format(placeholders), recipe_ids
+            )
+            cursor.execute(
+                SQLITE_INSERT_SQL.format(placeholders), recipe_ids
+            )
+
+
+def flush_search_updates():
+    recipe_ids = _pending.__dict__.pop('recipe_ids', set())
+    update_search_index(recipe_ids)
+
+
+def schedule_search_update(recipe_ids):
+    """
+    Обновляет индекс после фиксации транзакции, когда теги и ингредиенты
+    рецепта уже сохранены. Изменения одной транзакции собираются вместе,
+    и индекс пересчитывается одним запросом.
+    """
+    recipe_ids = set(recipe_ids)
+    if not recipe_ids:
+        return
+    pending = _pending.__dict__.setdefault('recipe_ids', set())
+    pending.update(recipe_ids)
+    transaction.on_commit(flush_search_updates)
+
+
+def remove_from_search_index(recipe_id):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(SQLITE_DELETE_SQL.format('%s'), [recipe_id])
+
+
+def fts5_query(text):
+    """Экранирует слова запроса для FTS5 и ищет их по началу."""
+    words = [word.replace('"', '') for word in text.split()]
+    return ' '.join(f'"{word}"*' for word in words if word)
+
+
+def search_recipes(queryset, text):
+    """
+    Фильтрует рецепты по запросу и сортирует по релевантности.
+    В PostgreSQL используется русская морфология, в SQLite — FTS5,
+    в остальных СУБД — поиск по подстроке без ранжирования.
+    """
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(
+            text, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', '-pub_date')
+    if connection.vendor == 'sqlite':
+        query = fts5_query(text)
+        if not query:
+            return queryset.none()
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [query]
+        )).annotate(search_rank=RawSQL(
+            f'SELECT bm25({FTS_TABLE}, {FTS_WEIGHTS}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s '
+            f'AND rowid = recipes_recipe.id',
+            [query]
+        )).order_by('search_rank', '-pub_date')
+    return queryset.filter(
+        Q(name__icontains=text) | Q(text__icontains=text)
+    )
@@ -1,10 +1,20 @@
-import base64
-from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 from djoser.serializers import UserSerializer
-from django.conf import settings
 
+from api.counters import change_counter, deferred_counters
+from api.images import ImageVariantsField, decode_image
+from api.instrumentation import TimedSerializerMixin
+from api.recipe_rows import ingredients_prefetch
+from api.pantry import (
+    MAX_INGREDIENTS,
+    MAX_MISSING,
+    MODES,
+    schedule_pantry_update
+)
+from api.utils import get_recipes_limit, get_subscribed_author_ids
 from users.models import CustomUser
 from recipes.models import (
     Tag,
@@ -20,15 +30,19 @@ AMOUNT_MIN = 1
 AMOUNT_MAX = 32000
 COOKING_TIME_MIN = 1
 COOKING_TIME_MAX = 32000
+MAX_BATCH_SIZE = 100
+
+
+class TimedModelSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """ModelSerializer с учетом времени сериализации в Server-Timing."""
 
 
 class Base64ImageField(serializers.Field):
-    """Кастомное поле для обработки изображений в формате Base64."""
+    """Кастомное поле для обработки изображений в формате Base64.
+    Изображение проверяется через Pillow и получает уникальное имя."""
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = decode_image(data)
         return data
 
     def to_representation(self, value):
@@ -37,7 +51,7 @@ class Base64ImageField(serializers.Field):
         return value.url
 
 
-class AvatarSerializer(serializers.ModelSerializer):
+class AvatarSerializer(TimedModelSerializer):
     avatar = Base64ImageField(required=True)
 
     class Meta:
@@ -45,9 +59,10 @@ class AvatarSerializer(serializers.ModelSerializer):
         fields = ['avatar']
 
 
-class ProfileSerializer(UserSerializer):
+class ProfileSerializer(TimedSerializerMixin, UserSerializer):
     """Сериализатор для модели пользователя с полем is_subscribed."""
     is_subscribed = serializers.SerializerMethodField()
+    avatar_variants = ImageVariantsField('avatar')
 
     class Meta:
         model = CustomUser
@@ -59,13 +74,14 @@ class ProfileSerializer(UserSerializer):
             'email',
             'is_subscribed',
             'avatar',
+            'avatar_variants',
         )
 
     def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        if user.is_anonymous:
+        request = self.context['request']
+        if request.user.is_anonymous:
             return False
-        return obj.subscribing.filter(user=user).exists()
+        return obj.id in get_subscribed_author_ids(request)
 
     def validate_email(self, value):
         if not value:
@@ -78,7 +94,7 @@ class ProfileSerializer(UserSerializer):
         return value
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedModelSerializer):
     """Сериализатор для модели Ingredient."""
 
     class Meta:
@@ -116,7 +132,7 @@ class IngredientRecipeSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedModelSerializer):
     """Сериализатор для Tag."""
 
     class Meta:
@@ -124,7 +140,23 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'slug')
 
 
-class RecipeGetSerializer(serializers.ModelSerializer):
+class TagListField(serializers.ListField):
+    """Список id тегов. Все теги загружаются одним запросом,
+    а не отдельным запросом на каждый id."""
+    child = serializers.IntegerField(min_value=1)
+
+    def to_internal_value(self, data):
+        tag_ids = super().to_internal_value(data)
+        tags = Tag.objects.in_bulk(tag_ids)
+        for tag_id in tag_ids:
+            if tag_id not in tags:
+                raise serializers.ValidationError(
+                    f'Тег с id {tag_id} не существует.'
+                )
+        return [tags[tag_id] for tag_id in tag_ids]
+
+
+class RecipeGetSerializer(TimedModelSerializer):
     """Сериализатор для отображения рецептов (GET запросы)."""
     tags = TagSerializer(many=True, read_only=True)
     author = ProfileSerializer(read_only=True)
@@ -133,33 +165,36 @@ class RecipeGetSerializer(serializers.ModelSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     image = Base64ImageField(required=False, allow_null=True)
+    image_variants = ImageVariantsField('image')
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time',
+            'is_in_shopping_cart', 'name', 'image', 'image_variants', 'text',
+            'cooking_time',
         )
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context['request'].user
         return user.is_authenticated and obj.favorites.filter(user=user
                                                               ).exists()
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context['request'].user
         return user.is_authenticated and obj.cart.filter(user=user
                                                          ).exists()
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(TimedModelSerializer):
     """
     Сериализатор для создания и обновления рецептов.
     """
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(),
-        many=True
-    )
+    tags = TagListField()
     author = ProfileSerializer(read_only=True)
     ingredients = IngredientRecipeSerializer(many=True)
     image = Base64ImageField(required=True)
@@ -198,12 +233,14 @@ class RecipeSerializer(serializers.ModelSerializer):
                 {'ingredients': 'Необходимо указать хотя бы один ингредиент.'}
             )
 
-        for ingredient in ingredients:
-            try:
-                Ingredient.objects.get(id=ingredient['id'])
-            except Ingredient.DoesNotExist:
+        ingredient_ids = [ingredient['id'] for ingredient in ingredients]
+        existing_ids = set(Ingredient.objects.filter(
+            id__in=ingredient_ids
+        ).values_list('id', flat=True))
+        for ingredient_id in ingredient_ids:
+            if ingredient_id not in existing_ids:
                 raise serializers.ValidationError(
-                    {f'Ингредиент с id {ingredient["id"]} не существует.'}
+                    {f'Ингредиент с id {ingredient_id} не существует.'}
                 )
 
         tags = data.get('tags')
@@ -237,45 +274,100 @@ class RecipeSerializer(serializers.ModelSerializer):
         return data
 
     def create_ingredients(self, ingredients, recipe):
-        IngredientRecipe.objects.bulk_create([
+        """Создает строки одним запросом и возвращает их число.
+        bulk_create не отправляет сигналы, поэтому индекс подбора
+        рецептов обновляется здесь, а счетчик — в create() и update()."""
+        created = IngredientRecipe.objects.bulk_create([
             IngredientRecipe(
                 recipe=recipe,
                 ingredient_id=ingredient['id'],
                 amount=ingredient['amount'],
             ) for ingredient in ingredients
         ])
+        if created:
+            schedule_pantry_update([recipe.id])
+        return len(created)
+
+    def update_ingredients(self, ingredients, recipe):
+        """Приводит ингредиенты рецепта к переданному списку,
+        затрагивая только добавленные, удаленные и измененные строки.
+        Счетчик ингредиентов меняется одним запросом на всю разницу."""
+        amounts = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        current = {
+            row.ingredient_id: row
+            for row in IngredientRecipe.objects.filter(
+                recipe=recipe
+            ).order_by()
+        }
+        removed = [
+            row.pk for ingredient_id, row in current.items()
+            if ingredient_id not in amounts
+        ]
+        if removed:
+            with deferred_counters():
+                IngredientRecipe.objects.filter(pk__in=removed).delete()
+        changed = []
+        for ingredient_id, row in current.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and row.amount != amount:
+                row.amount = amount
+                changed.append(row)
+        if changed:
+            IngredientRecipe.objects.bulk_update(changed, ['amount'])
+        created = self.create_ingredients(
+            [
+                ingredient for ingredient in ingredients
+                if ingredient['id'] not in current
+            ],
+            recipe
+        )
+        change_counter(
+            Recipe, recipe.id, 'ingredients_count', created - len(removed)
+        )
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
-        recipe = Recipe.objects.create(**validated_data)
+        recipe = Recipe.objects.create(
+            **validated_data, ingredients_count=len(ingredients)
+        )
         recipe.tags.set(tags)
         self.create_ingredients(ingredients, recipe)
+        # Новый рецепт еще не может быть в избранном или в корзине.
+        recipe.is_favorited = recipe.is_in_shopping_cart = False
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         instance.tags.set(tags)
-        instance.amount_ingredients.all().delete()
-        self.create_ingredients(ingredients, instance)
+        self.update_ingredients(ingredients, instance)
         super().update(instance, validated_data)
         return instance
 
     def to_representation(self, instance):
+        """Ингредиенты и теги загружаются двумя запросами,
+        а не отдельным запросом на каждый ингредиент."""
+        prefetch_related_objects([instance], ingredients_prefetch(), 'tags')
         context = {'request': self.context.get('request')}
         return RecipeGetSerializer(instance, context=context).data
 
 
-class RecipeFavoriteSerializer(serializers.ModelSerializer):
+class RecipeFavoriteSerializer(TimedModelSerializer):
     """Сериализатор для избранного и корзины."""
+    image_variants = ImageVariantsField('image')
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
+class FavoriteSerializer(TimedModelSerializer):
     """Сериализатор для избранного."""
 
     class Meta:
@@ -290,7 +382,7 @@ class FavoriteSerializer(serializers.ModelSerializer):
         ]
 
 
-class ShoppingCartSerializer(serializers.ModelSerializer):
+class ShoppingCartSerializer(TimedModelSerializer):
     """Сериализатор для корзины покупок."""
 
     class Meta:
@@ -305,7 +397,7 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
         ]
 
 
-class SubscriptionSerializer(serializers.ModelSerializer):
+class SubscriptionSerializer(TimedModelSerializer):
     """Сериализатор для подписок на авторов."""
 
     class Meta:
@@ -328,6 +420,28 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         return attrs
 
 
+class BatchSerializer(serializers.Serializer):
+    """Список id рецептов или авторов для массовых операций."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BATCH_SIZE
+    )
+
+
+class PantrySerializer(serializers.Serializer):
+    """Параметры подбора рецептов по имеющимся ингредиентам."""
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_INGREDIENTS
+    )
+    mode = serializers.ChoiceField(choices=MODES, default='missing')
+    missing = serializers.IntegerField(
+        min_value=0, max_value=MAX_MISSING, default=0
+    )
+
+
 class SubscriptionReadSerializer(ProfileSerializer):
     """
     Сериализатор для отображения подписок
@@ -345,13 +459,13 @@ class SubscriptionReadSerializer(ProfileSerializer):
         Возвращает рецепты автора с учетом параметра `recipes_limit`.
         """
         request = self.context.get('request')
-        recipes_limit = request.query_params.get(
-            'recipes_limit', settings.REST_FRAMEWORK['PAGE_SIZE']
-        )
-
-        recipes = obj.recipes.all()
-        if recipes_limit and recipes_limit.isdigit():
-            recipes = recipes[:int(recipes_limit)]
+        if hasattr(obj, 'limited_recipes'):
+            recipes = obj.limited_recipes
+        else:
+            recipes = obj.recipes.all()
+            recipes_limit = get_recipes_limit(request)
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
 
         return RecipeFavoriteSerializer(
             recipes,
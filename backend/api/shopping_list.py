@@ -0,0 +1,75 @@
+import csv
+import json
+
+from django.db.models import Sum
+
+from recipes.models import IngredientRecipe
+
+CHUNK_SIZE = 500
+
+
+class Echo:
+    """Псевдобуфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def get_shopping_list(user):
+    """
+    Возвращает суммарное количество каждого ингредиента
+    из рецептов в корзине пользователя.
+    Группировка и сортировка выполняются в базе данных одним запросом.
+    """
+    return IngredientRecipe.objects.filter(
+        recipe__cart__user=user
+    ).values(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+    ).annotate(
+        total_amount=Sum('amount')
+    ).order_by(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+
+def render_txt(ingredients):
+    yield 'Список покупок:\n'
+    for ingredient in ingredients:
+        yield '{} ({}) - {}\n'.format(
+            ingredient['ingredient__name'],
+            ingredient['ingredient__measurement_unit'],
+            ingredient['total_amount'],
+        )
+
+
+def render_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(['Ингредиент', 'Единица измерения', 'Количество'])
+    for ingredient in ingredients:
+        yield writer.writerow([
+            ingredient['ingredient__name'],
+            ingredient['ingredient__measurement_unit'],
+            ingredient['total_amount'],
+        ])
+
+
+def render_json(ingredients):
+    yield '['
+    separator = ''
+    for ingredient in ingredients:
+        yield separator + json.dumps({
+            'name': ingredient['ingredient__name'],
+            'measurement_unit': ingredient['ingredient__measurement_unit'],
+            'amount': ingredient['total_amount'],
+        }, ensure_ascii=False)
+        separator = ','
+    yield ']'
+
+
+RENDERERS = {
+    'txt': (render_txt, 'text/plain; charset=utf-8'),
+    'csv': (render_csv, 'text/csv; charset=utf-8'),
+    'json': (render_json, 'application/json; charset=utf-8'),
+}
@@ -0,0 +1,121 @@
+import string
+import threading
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import transaction
+
+from api.db_router import read_from_primary
+from recipes.models import Recipe
+
+ALPHABET = string.digits + string.ascii_letters
+BASE = len(ALPHABET)
+MAX_CODE_LENGTH = 11
+SHORT_LINK_CACHE_TIMEOUT = 60 * 60 * 24
+MISSING_CACHE_TIMEOUT = 60
+LOCAL_CACHE_SIZE = 10_000
+
+# Найденные рецепты процесса в порядке последнего обращения. Код
+# существующего рецепта всегда ведет на него же, поэтому положительный
+# результат можно держать локально, а отрицательный — только в общем кеше.
+_resolved = OrderedDict()
+_lock = threading.Lock()
+
+
+def encode(recipe_id):
+    """Переводит id рецепта в короткий код в base62."""
+    code = ''
+    while True:
+        recipe_id, remainder = divmod(recipe_id, BASE)
+        code = ALPHABET[remainder] + code
+        if not recipe_id:
+            return code
+
+
+def decode(code):
+    """Возвращает id рецепта по коду или None для некорректного кода."""
+    if not code or len(code) > MAX_CODE_LENGTH:
+        return None
+    recipe_id = 0
+    for char in code:
+        position = ALPHABET.find(char)
+        if position < 0:
+            return None
+        recipe_id = recipe_id * BASE + position
+    return recipe_id
+
+
+def short_link_key(recipe_id):
+    return f'short_link:{recipe_id}'
+
+
+def remember(recipe_id):
+    with _lock:
+        _resolved[recipe_id] = True
+        _resolved.move_to_end(recipe_id)
+        if len(_resolved) > LOCAL_CACHE_SIZE:
+            _resolved.popitem(last=False)
+    return recipe_id
+
+
+def is_resolved(recipe_id):
+    with _lock:
+        if recipe_id not in _resolved:
+            return False
+        _resolved.move_to_end(recipe_id)
+        return True
+
+
+def cache_timeout(exists):
+    return SHORT_LINK_CACHE_TIMEOUT if exists else MISSING_CACHE_TIMEOUT
+
+
+def resolve(code):
+    """
+    Возвращает id рецепта по короткому коду или None.
+    Существование рецепта проверяется в базе только один раз:
+    дальше найденные рецепты берутся из памяти процесса, а остальные
+    ответы — из общего кеша, который видят все процессы.
+    """
+    recipe_id = decode(code)
+    if recipe_id is None:
+        return None
+    if is_resolved(recipe_id):
+        return recipe_id
+    exists = cache.get(short_link_key(recipe_id))
+    if exists is None:
+        with read_from_primary():
+            exists = Recipe.objects.filter(id=recipe_id).exists()
+        cache.set(short_link_key(recipe_id), exists, cache_timeout(exists))
+    return remember(recipe_id) if exists else None
+
+
+async def aresolve(code):
+    """Асинхронный вариант resolve()."""
+    recipe_id = decode(code)
+    if recipe_id is None:
+        return None
+    if is_resolved(recipe_id):
+        return recipe_id
+    exists = await cache.aget(short_link_key(recipe_id))
+    if exists is None:
+        with read_from_primary():
+            exists = await Recipe.objects.filter(id=recipe_id).aexists()
+        await cache.aset(
+            short_link_key(recipe_id), exists, cache_timeout(exists)
+        )
+    return remember(recipe_id) if exists else None
+
+
+def discard(recipe_id):
+    with _lock:
+        _resolved.pop(recipe_id, None)
+    cache.delete(short_link_key(recipe_id))
+
+
+def forget(recipe_id):
+    """Сбрасывает закешированный результат для рецепта после коммита,
+    чтобы параллельный запрос не успел закешировать старое значение.
+    Другие процессы могут еще какое-то время вести на удаленный рецепт:
+    тогда страница рецепта ответит 404."""
+    transaction.on_commit(lambda: discard(recipe_id))
@@ -0,0 +1,191 @@
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete
+)
+from django.dispatch import receiver
+
+from api.catalog import invalidate_catalog
+from api.counters import (
+    change_counter,
+    counters_deferred,
+    get_counters,
+    owner_being_deleted,
+    owner_deleted
+)
+from api.feed import add_authors, schedule_fan_out, schedule_feed_rebuild
+from api.images import schedule_variants
+from api.ingredient_search import invalidate_ingredient_index
+from api.pantry import schedule_pantry_update
+from api.recipe_cache import invalidate_recipes
+from api.search import remove_from_search_index, schedule_search_update
+from api.short_links import forget
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    ShoppingCart,
+    Subscription,
+    Tag
+)
+from users.models import CustomUser
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    """Перестраивает поисковый индекс и справочник ингредиентов."""
+    invalidate_ingredient_index()
+    invalidate_catalog('ingredients')
+    recipe_ids = list(IngredientRecipe.objects.filter(
+        ingredient=kwargs['instance']
+    ).values_list('recipe_id', flat=True))
+    invalidate_recipes(recipe_ids)
+    if kwargs['signal'] is post_save:
+        schedule_search_update(recipe_ids)
+
+
+@receiver([post_save, pre_delete], sender=Tag)
+def tag_changed(sender, **kwargs):
+    """Перестраивает справочник тегов и сбрасывает рецепты с тегом.
+    При удалении срабатывает до удаления связей с рецептами."""
+    invalidate_catalog('tags')
+    recipe_ids = list(kwargs['instance'].recipes.values_list('id', flat=True))
+    invalidate_recipes(recipe_ids)
+    schedule_search_update(recipe_ids)
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    invalidate_recipes([instance.id])
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    """Сбрасывает отрицательный результат для короткой ссылки."""
+    if created:
+        forget(instance.id)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    forget(instance.id)
+    remove_from_search_index(instance.id)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_text_changed(sender, instance, **kwargs):
+    schedule_search_update([instance.id])
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_changed(sender, instance, **kwargs):
+    """Создает уменьшенные копии нового изображения рецепта в фоне."""
+    recipe_id = instance.id
+    schedule_variants(
+        instance, 'image', ('card', 'detail'),
+        on_done=lambda: invalidate_recipes([recipe_id])
+    )
+
+
+@receiver([post_save, post_delete], sender=IngredientRecipe)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    invalidate_recipes([instance.recipe_id])
+    schedule_search_update([instance.recipe_id])
+    schedule_pantry_update([instance.recipe_id])
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def recipe_pantry_changed(sender, instance, created=True, **kwargs):
+    """Индекс меняется только при создании и удалении рецепта.
+    Ингредиенты существующего рецепта учитывают сигналы IngredientRecipe
+    и update_ingredients()."""
+    if created:
+        schedule_pantry_update([instance.id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        recipe_ids = [instance.id]
+    elif pk_set:
+        recipe_ids = pk_set
+    else:
+        recipe_ids = list(instance.recipes.values_list('id', flat=True))
+    invalidate_recipes(recipe_ids)
+    schedule_search_update(recipe_ids)
+
+
+@receiver(post_save, sender=CustomUser)
+def author_changed(sender, instance, created, update_fields, **kwargs):
+    """Профиль автора входит в кеш его рецептов.
+    Обновление только даты входа кеш не затрагивает."""
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    if not created:
+        invalidate_recipes(instance.recipes.values_list('id', flat=True))
+    schedule_variants(
+        instance, 'avatar', ('avatar',),
+        on_done=lambda: invalidate_recipes(
+            Recipe.objects.filter(author_id=instance.id).values_list(
+                'id', flat=True
+            )
+        )
+    )
+
+
+def update_counters(sender, instance, signal, created=True, origin=None,
+                    **kwargs):
+    """Меняет счетчики владельцев связи при ее создании и удалении.
+    Массовые операции без сигналов учитываются там, где вызываются,
+    а владельцев, удаляемых тем же каскадом, обновлять незачем."""
+    if not created or counters_deferred():
+        return
+    delta = 1 if signal is post_save else -1
+    for model, field, foreign_key in get_counters(sender):
+        pk = getattr(instance, f'{foreign_key}_id')
+        if not owner_being_deleted(model, pk, origin):
+            change_counter(model, pk, field, delta)
+
+
+def counters_owner_deleted(sender, instance, origin=None, **kwargs):
+    owner_deleted(sender, instance.pk, origin)
+
+
+for model in (Favorite, ShoppingCart, IngredientRecipe, Recipe, Subscription):
+    post_save.connect(update_counters, sender=model)
+    post_delete.connect(update_counters, sender=model)
+
+for model in (Recipe, CustomUser):
+    pre_delete.connect(counters_owner_deleted, sender=model)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, **kwargs):
+    if created:
+        schedule_fan_out(instance)
+
+
+@receiver(post_save, sender=Subscription)
+def subscription_created(sender, instance, created, **kwargs):
+    """Добавляет рецепты автора в ленту нового подписчика."""
+    if created:
+        add_authors(instance.user_id, [instance.author_id])
+
+
+@receiver(post_delete, sender=Subscription)
+def subscription_deleted(sender, instance, origin=None, **kwargs):
+    """
+    Собирает ленту без рецептов автора. Массовые отписки перестраивают
+    ленту один раз в delete_objects(). При удалении пользователя подписки
+    удаляются каскадом, а записи лент — вместе с его рецептами или с ним.
+    """
+    if counters_deferred():
+        return
+    if isinstance(origin, Subscription) or (
+        getattr(origin, 'model', None) is Subscription
+    ):
+        schedule_feed_rebuild([instance.user_id])
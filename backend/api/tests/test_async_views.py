@@ -0,0 +1,96 @@
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.test import AsyncClient, Client, TestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from api.short_links import encode
+from api.tests.utils import create_recipe, create_user
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientRecipe,
+    ShoppingCart,
+    Subscription,
+    Tag
+)
+
+
+class AsyncViewsParityTests(TestCase):
+    """Асинхронные view из foodgram.urls_async должны отдавать те же
+    байты, что и синхронные маршруты foodgram.urls."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader, cls.author = map(create_user, ('reader', 'author'))
+        cls.token = Token.objects.create(user=cls.reader).key
+        tags = Tag.objects.bulk_create([
+            Tag(name=name, slug=slug)
+            for name, slug in (('Ужин', 'dinner'), ('Завтрак', 'breakfast'))
+        ])
+        ingredients = Ingredient.objects.bulk_create([
+            Ingredient(name=name, measurement_unit='г')
+            for name in ('мука', 'молоко', 'масло', 'мед')
+        ])
+        cls.recipes = []
+        for number in range(3):
+            recipe = create_recipe(
+                cls.author, f'Рецепт {number}', cooking_time=5 + number
+            )
+            recipe.tags.set(tags[:number + 1])
+            IngredientRecipe.objects.bulk_create([
+                IngredientRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=number + 1
+                )
+                for ingredient in ingredients[number:]
+            ])
+            cls.recipes.append(recipe)
+        Favorite.objects.create(user=cls.reader, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.reader, recipe=cls.recipes[1])
+        Subscription.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def paths(self):
+        recipe_id = self.recipes[0].id
+        return [
+            '/api/recipes/',
+            '/api/recipes/?limit=2&page=2',
+            '/api/recipes/?tags=dinner&is_favorited=1',
+            '/api/recipes/?author=0',
+            '/api/recipes/?page=100',
+            f'/api/recipes/{recipe_id}/',
+            '/api/recipes/0/',
+            '/api/tags/',
+            '/api/ingredients/',
+            '/api/ingredients/?name=м',
+            '/api/ingredients/?name=мо&limit=1',
+            f'/s/{encode(recipe_id)}',
+            '/s/zzzzzz',
+        ]
+
+    async def compare(self, headers):
+        for path in self.paths():
+            with self.subTest(path=path, headers=headers):
+                expected = await self.sync_get(path, headers)
+                with override_settings(ROOT_URLCONF='foodgram.urls_async'):
+                    response = await AsyncClient().get(
+                        path, headers=headers
+                    )
+                self.assertEqual(
+                    response.status_code, expected.status_code
+                )
+                self.assertEqual(response.content, expected.content)
+                for header in ('Content-Type', 'Location', 'Allow'):
+                    self.assertEqual(
+                        response.get(header), expected.get(header), header
+                    )
+
+    async def sync_get(self, path, headers):
+        return await sync_to_async(Client().get)(path, headers=headers)
+
+    async def test_anonymous(self):
+        await self.compare({})
+
+    async def test_authenticated(self):
+        await self.compare({'Authorization': f'Token {self.token}'})
@@ -0,0 +1,125 @@
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.counters import reconcile_counters
+from api.serializers import MAX_BATCH_SIZE
+from api.tests.utils import create_recipe, create_user
+from recipes.models import Favorite, ShoppingCart, Subscription
+
+
+class BatchEndpointTests(TestCase):
+    """Массовые операции возвращают статус для каждого id
+    в порядке запроса и не ломают счетчики."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.first_author, cls.second_author = map(
+            create_user, ('user', 'first', 'second')
+        )
+        cls.recipes = [
+            create_recipe(cls.first_author, f'Рецепт {number}')
+            for number in range(3)
+        ]
+        cls.missing = max(recipe.id for recipe in cls.recipes) + 1
+        Favorite.objects.create(user=cls.user, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipes[0])
+        Subscription.objects.create(user=cls.user, author=cls.first_author)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def batch(self, method, url, ids):
+        response = getattr(self.client, method)(
+            url, {'ids': ids}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return [
+            (result['id'], result['status'])
+            for result in response.json()['results']
+        ]
+
+    def assert_counters_consistent(self):
+        self.assertEqual(set(reconcile_counters().values()), {0})
+
+    def test_recipe_relations(self):
+        first, second, third = (recipe.id for recipe in self.recipes)
+        for url, model in (
+            ('/api/recipes/favorite/batch/', Favorite),
+            ('/api/recipes/shopping_cart/batch/', ShoppingCart),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.batch(
+                        'post', url, [second, first, self.missing, second]
+                    ),
+                    [
+                        (second, 'added'),
+                        (first, 'exists'),
+                        (self.missing, 'not_found'),
+                    ]
+                )
+                self.assertEqual(
+                    set(model.objects.filter(user=self.user).values_list(
+                        'recipe_id', flat=True
+                    )),
+                    {first, second}
+                )
+                self.assert_counters_consistent()
+                self.assertEqual(
+                    self.batch('delete', url, [first, third]),
+                    [(first, 'removed'), (third, 'absent')]
+                )
+                self.assertEqual(
+                    list(model.objects.filter(user=self.user).values_list(
+                        'recipe_id', flat=True
+                    )),
+                    [second]
+                )
+                self.assert_counters_consistent()
+
+    def test_subscriptions(self):
+        url = '/api/users/subscribe/batch/'
+        self.assertEqual(
+            self.batch('post', url, [
+                self.user.id, self.first_author.id, self.second_author.id
+            ]),
+            [
+                (self.user.id, 'invalid'),
+                (self.first_author.id, 'exists'),
+                (self.second_author.id, 'added'),
+            ]
+        )
+        self.second_author.refresh_from_db()
+        self.assertEqual(self.second_author.subscribers_count, 1)
+        self.assertEqual(
+            self.batch('delete', url, [self.first_author.id, self.user.id]),
+            [(self.first_author.id, 'removed'), (self.user.id, 'absent')]
+        )
+        self.assertEqual(
+            list(Subscription.objects.filter(user=self.user).values_list(
+                'author_id', flat=True
+            )),
+            [self.second_author.id]
+        )
+        self.assert_counters_consistent()
+
+    def test_invalid_payloads(self):
+        url = '/api/recipes/favorite/batch/'
+        for data in (
+            {},
+            {'ids': []},
+            {'ids': [0]},
+            {'ids': ['abc']},
+            {'ids': list(range(1, MAX_BATCH_SIZE + 2))},
+        ):
+            with self.subTest(data=data):
+                response = self.client.post(url, data, format='json')
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(Favorite.objects.count(), 1)
+
+    def test_anonymous(self):
+        response = APIClient().post(
+            '/api/recipes/favorite/batch/', {'ids': [1]}, format='json'
+        )
+        self.assertEqual(response.status_code, 401)
@@ -0,0 +1,122 @@
+import gzip
+import json
+from unittest import skipIf
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from api.catalog import (
+    CATALOGS,
+    brotli,
+    drop_snapshot,
+    get_snapshot,
+    version_key
+)
+from api.utils import get_version
+from recipes.models import Ingredient, Tag
+
+URL = '/api/tags/'
+
+
+class CatalogInvalidationTests(TestCase):
+    """Снимок справочника сбрасывается только после фиксации транзакции."""
+
+    def test_version_is_bumped_on_commit(self):
+        before = get_snapshot('tags')
+        version = get_version(version_key('tags'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Ужин', slug='dinner')
+            self.assertEqual(get_version(version_key('tags')), version)
+        self.assertGreater(get_version(version_key('tags')), version)
+        after = get_snapshot('tags')
+        self.assertNotEqual(after.etag, before.etag)
+        self.assertIn('dinner'.encode(), after.variants['identity'])
+
+
+class CatalogResponseTests(TestCase):
+    """Условные запросы и выбор сжатия для справочников."""
+
+    @classmethod
+    def setUpTestData(cls):
+        Tag.objects.create(name='Ужин', slug='dinner')
+        Ingredient.objects.create(name='мука', measurement_unit='г')
+
+    def setUp(self):
+        cache.clear()
+        for name in CATALOGS:
+            drop_snapshot(name)
+
+    def assert_varies(self, response):
+        self.assertIn(
+            'Accept-Encoding',
+            [header.strip() for header in response['Vary'].split(',')]
+        )
+
+    def get(self, url=URL, **headers):
+        return self.client.get(url, headers=headers)
+
+    def test_identity(self):
+        for url in (URL, '/api/ingredients/'):
+            with self.subTest(url=url):
+                response = self.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn('Content-Encoding', response)
+                self.assert_varies(response)
+                self.assertEqual(response['Cache-Control'], 'no-cache')
+                self.assertTrue(response.json())
+        self.assertEqual(
+            self.get().json(),
+            [{'id': Tag.objects.get().id, 'name': 'Ужин', 'slug': 'dinner'}]
+        )
+
+    def test_gzip(self):
+        identity = self.get()
+        response = self.get(accept_encoding='deflate, gzip;q=0.8')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assert_varies(response)
+        self.assertEqual(
+            gzip.decompress(response.content), identity.content
+        )
+        self.assertNotEqual(response['ETag'], identity['ETag'])
+
+    @skipIf(brotli is None, 'brotli не установлен')
+    def test_brotli_is_preferred(self):
+        identity = self.get()
+        response = self.get(accept_encoding='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(
+            brotli.decompress(response.content), identity.content
+        )
+
+    @skipIf(brotli is not None, 'brotli установлен')
+    def test_br_without_brotli_falls_back_to_gzip(self):
+        response = self.get(accept_encoding='br, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_if_none_match(self):
+        for encoding in ('', 'gzip'):
+            with self.subTest(encoding=encoding):
+                etag = self.get(accept_encoding=encoding)['ETag']
+                response = self.get(
+                    accept_encoding=encoding, if_none_match=etag
+                )
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+                self.assertEqual(response['ETag'], etag)
+                self.assert_varies(response)
+        etag = self.get()['ETag']
+        for value in (f'W/{etag}', f'"other", {etag}', '*'):
+            with self.subTest(value=value):
+                self.assertEqual(
+                    self.get(if_none_match=value).status_code, 304
+                )
+        self.assertEqual(self.get(if_none_match='"other"').status_code, 200)
+
+    def test_etag_changes_after_write(self):
+        etag = self.get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(name='Завтрак', slug='breakfast')
+        response = self.get(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(json.loads(response.content)), 2)
@@ -0,0 +1,173 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.counters import reconcile_counters
+from api.tests.utils import (
+    MediaTestCase,
+    create_recipe,
+    create_user,
+    image_data
+)
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    ShoppingCart,
+    Subscription,
+    Tag
+)
+from users.models import CustomUser
+
+
+class CounterSaveTests(MediaTestCase):
+    """Полное сохранение рецепта или пользователя не должно
+    затирать счетчики, измененные в базе после загрузки объекта."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.reader = create_user('reader')
+        cls.tag = Tag.objects.create(name='Ужин', slug='dinner')
+        cls.ingredients = Ingredient.objects.bulk_create([
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(6)
+        ])
+        cls.recipe = create_recipe(cls.author)
+        cls.recipe.tags.set([cls.tag])
+        IngredientRecipe.objects.create(
+            recipe=cls.recipe, ingredient=cls.ingredients[0], amount=1
+        )
+        Favorite.objects.create(user=cls.reader, recipe=cls.recipe)
+        Subscription.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def assert_counters_consistent(self):
+        self.assertEqual(
+            set(reconcile_counters().values()), {0}, 'Счетчики разошлись'
+        )
+
+    def test_recipe_update_keeps_ingredients_count(self):
+        response = self.client.patch(
+            f'/api/recipes/{self.recipe.id}/',
+            {
+                'name': 'Новое название',
+                'text': 'Описание',
+                'cooking_time': 10,
+                'tags': [self.tag.id],
+                'image': image_data(),
+                'ingredients': [
+                    {'id': ingredient.id, 'amount': 2}
+                    for ingredient in self.ingredients[:5]
+                ],
+            },
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.ingredients_count, 5)
+        self.assertEqual(self.recipe.favorites_count, 1)
+        self.assert_counters_consistent()
+
+    def test_full_save_keeps_search_vector(self):
+        """Вектор пересчитывается после коммита запросом UPDATE,
+        поэтому объект в памяти может хранить старое значение."""
+        stale = Recipe.objects.get(pk=self.recipe.pk)
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            search_vector="'рецепт':1A"
+        )
+        stale.save()
+        self.assertEqual(
+            Recipe.objects.values_list('search_vector', flat=True).get(
+                pk=self.recipe.pk
+            ),
+            "'рецепт':1A"
+        )
+
+    def test_user_saves_keep_counters(self):
+        """Объект пользователя в запросе загружен до появления его
+        рецептов, как при параллельных запросах."""
+        stale = CustomUser.objects.get(pk=self.author.pk)
+        create_recipe(self.author, 'Еще рецепт')
+        self.client.force_authenticate(stale)
+        for method, data in (
+            ('put', {'avatar': image_data()}), ('delete', None)
+        ):
+            response = getattr(self.client, method)(
+                '/api/users/me/avatar/', data, format='json'
+            )
+            self.assertLess(response.status_code, 400, response.content)
+        response = self.client.patch(
+            f'/api/users/{stale.id}/', {'first_name': 'Анна'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.first_name, 'Анна')
+        self.assertEqual(self.author.recipes_count, 2)
+        self.assertEqual(self.author.subscribers_count, 1)
+        self.assert_counters_consistent()
+
+
+class CascadeCounterTests(TestCase):
+    """Каскадное удаление не обновляет счетчики строк,
+    которые удаляются вместе с владельцем."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author, cls.reader = map(create_user, ('author', 'reader'))
+        ingredients = Ingredient.objects.bulk_create([
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(3)
+        ])
+        cls.recipes = []
+        for author in (cls.author, cls.reader):
+            recipe = create_recipe(author)
+            for ingredient in ingredients:
+                IngredientRecipe.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=1
+                )
+            cls.recipes.append(recipe)
+        Favorite.objects.create(user=cls.reader, recipe=cls.recipes[0])
+        ShoppingCart.objects.create(user=cls.reader, recipe=cls.recipes[0])
+        Subscription.objects.create(user=cls.reader, author=cls.author)
+
+    def counter_updates(self, queries, table):
+        return [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith(f'UPDATE "{table}"')
+        ]
+
+    def test_recipe_delete(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.recipes[0].delete()
+        self.assertEqual(
+            self.counter_updates(queries, 'recipes_recipe'), []
+        )
+        self.assertEqual(
+            len(self.counter_updates(queries, 'users_customuser')), 1
+        )
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.recipes_count, 0)
+        self.assertEqual(set(reconcile_counters().values()), {0})
+
+    def test_user_delete(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.reader.delete()
+        self.assertEqual(
+            len(self.counter_updates(queries, 'recipes_recipe')), 2
+        )
+        self.assertEqual(
+            len(self.counter_updates(queries, 'users_customuser')), 1
+        )
+        recipe = Recipe.objects.get(pk=self.recipes[0].pk)
+        self.assertEqual(
+            (recipe.favorites_count, recipe.in_cart_count), (0, 0)
+        )
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.subscribers_count, 0)
+        self.assertEqual(set(reconcile_counters().values()), {0})
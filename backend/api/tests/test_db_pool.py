@@ -0,0 +1,155 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.db import OperationalError
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase
+
+from foodgram.db.pool import ConnectionPool, PoolTimeout
+
+
+def ping(connection):
+    connection.execute('SELECT 1')
+
+
+def make_pool(path, **options):
+    options = {
+        'size': 2, 'max_overflow': 1, 'timeout': 0.2, 'recycle': 0,
+        **options
+    }
+    return ConnectionPool(
+        lambda: sqlite3.connect(path, check_same_thread=False),
+        ping,
+        **options
+    )
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """Пул на соединениях sqlite3 к временному файлу."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'pool.sqlite3')
+
+    def test_released_connection_is_reused(self):
+        pool = make_pool(self.path)
+        first = pool.acquire()
+        pool.release(first)
+        self.assertIs(pool.acquire(), first)
+        self.assertEqual(pool.stats()['created'], 1)
+
+    def test_overflow_is_closed_on_release(self):
+        pool = make_pool(self.path)
+        connections = [pool.acquire() for _ in range(3)]
+        self.assertEqual(pool.stats()['checked_out'], 3)
+        for connection in connections:
+            pool.release(connection)
+        stats = pool.stats()
+        self.assertEqual((stats['opened'], stats['idle']), (2, 2))
+        self.assertEqual(stats['discarded'], 1)
+
+    def test_exhausted_pool_times_out(self):
+        pool = make_pool(self.path)
+        for _ in range(3):
+            pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        stats = pool.stats()
+        self.assertEqual((stats['waits'], stats['timeouts']), (1, 1))
+        self.assertGreaterEqual(stats['wait_time'], 0.2)
+
+    def test_waiter_gets_released_connection(self):
+        pool = make_pool(self.path, timeout=5)
+        connections = [pool.acquire() for _ in range(3)]
+        timer = threading.Timer(0.1, pool.release, (connections[0],))
+        timer.start()
+        self.assertIs(pool.acquire(), connections[0])
+        timer.join()
+        self.assertEqual(pool.stats()['waits'], 1)
+
+    def test_broken_connection_is_replaced(self):
+        pool = make_pool(self.path)
+        connection = pool.acquire()
+        pool.release(connection)
+        connection.close()
+        replacement = pool.acquire()
+        self.assertIsNot(replacement, connection)
+        ping(replacement)
+        stats = pool.stats()
+        self.assertEqual((stats['opened'], stats['discarded']), (1, 1))
+
+    def test_released_as_broken_is_closed(self):
+        pool = make_pool(self.path)
+        connection = pool.acquire()
+        pool.release(connection, broken=True)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            ping(connection)
+        self.assertEqual(pool.stats()['opened'], 0)
+
+    def test_old_connection_is_recycled(self):
+        pool = make_pool(self.path, recycle=0.05)
+        connection = pool.acquire()
+        pool.release(connection)
+        time.sleep(0.1)
+        self.assertIsNot(pool.acquire(), connection)
+
+    def test_open_transaction_is_rolled_back(self):
+        pool = make_pool(self.path, size=1, max_overflow=0)
+        connection = pool.acquire()
+        connection.execute('CREATE TABLE item (id INTEGER)')
+        connection.commit()
+        connection.execute('INSERT INTO item VALUES (1)')
+        pool.release(connection)
+        connection = pool.acquire()
+        self.assertEqual(
+            connection.execute('SELECT COUNT(*) FROM item').fetchone(), (0,)
+        )
+
+
+class PooledBackendTests(SimpleTestCase):
+    """Бэкенд foodgram.db.sqlite3 как замена PostgreSQL."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # Отдельный ConnectionHandler не трогает соединения тестов,
+        # а пул по параметрам соединения у временной базы свой.
+        self.handler = ConnectionHandler({'default': {
+            'ENGINE': 'foodgram.db.sqlite3',
+            'NAME': os.path.join(directory.name, 'backend.sqlite3'),
+            'POOL': {'SIZE': 1, 'MAX_OVERFLOW': 0, 'TIMEOUT': 0.1},
+        }})
+        self.addCleanup(self.dispose)
+
+    def dispose(self):
+        connection = self.handler['default']
+        connection.close()
+        connection.pool.dispose()
+
+    def query(self, connection):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            return cursor.fetchone()
+
+    def test_close_returns_connection_to_pool(self):
+        connection = self.handler['default']
+        self.query(connection)
+        raw = connection.connection
+        connection.close()
+        self.assertEqual(connection.pool.stats()['idle'], 1)
+        self.assertEqual(self.query(connection), (1,))
+        self.assertIs(connection.connection, raw)
+
+    def test_exhausted_pool_raises_operational_error(self):
+        connection = self.handler['default']
+        self.query(connection)
+        other = ConnectionHandler(self.handler.settings)['default']
+        with self.assertRaises(OperationalError):
+            self.query(other)
+        connection.close()
+        self.assertEqual(self.query(other), (1,))
+        other.close()
@@ -0,0 +1,121 @@
+import os
+import tempfile
+
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from api import db_router
+from api.db_router import ReplicaMiddleware, ReplicaRouter, read_from_primary
+from recipes.models import Recipe
+
+REPLICA = 'replica_test'
+BROKEN_REPLICA = 'replica_broken'
+
+
+@override_settings(
+    DATABASE_REPLICAS=[REPLICA],
+    REPLICA_STICKY_SECONDS=60,
+    REPLICA_RETRY_SECONDS=60,
+)
+class ReplicaRouterTests(SimpleTestCase):
+    """Реплики — отдельные файлы sqlite, чтобы было видно, куда
+    роутер отправляет чтение."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.add_database(REPLICA, os.path.join(directory.name, 'r.sqlite3'))
+        self.add_database(
+            BROKEN_REPLICA,
+            os.path.join(directory.name, 'missing', 'r.sqlite3')
+        )
+        self.addCleanup(db_router._down_until.clear)
+        self.addCleanup(cache.clear)
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def add_database(self, alias, name):
+        connections.settings[alias] = {
+            **connections.settings['default'],
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': name,
+        }
+        self.addCleanup(connections.settings.pop, alias)
+        self.addCleanup(self.remove_connection, alias)
+
+    def remove_connection(self, alias):
+        connections[alias].close()
+        del connections[alias]
+
+    def read_alias(self, request, model=Recipe, status=200):
+        """Пропускает запрос через middleware и возвращает базу,
+        выбранную роутером для чтения внутри view."""
+        chosen = []
+
+        def view(request):
+            chosen.append(self.router.db_for_read(model))
+            return HttpResponse(status=status)
+
+        ReplicaMiddleware(view)(request)
+        return chosen[0]
+
+    def test_safe_request_reads_from_replica(self):
+        self.assertEqual(self.read_alias(self.factory.get('/')), REPLICA)
+
+    def test_write_request_uses_primary(self):
+        self.assertEqual(self.read_alias(self.factory.post('/')), 'default')
+        self.assertEqual(self.router.db_for_write(Recipe), 'default')
+
+    def test_client_sticks_to_primary_after_write(self):
+        own = {'HTTP_AUTHORIZATION': 'Token own'}
+        other = {'HTTP_AUTHORIZATION': 'Token other'}
+        self.read_alias(self.factory.post('/', **own), status=201)
+        self.assertEqual(self.read_alias(self.factory.get('/', **own)),
+                         'default')
+        self.assertEqual(self.read_alias(self.factory.get('/', **other)),
+                         REPLICA)
+
+    def test_failed_write_does_not_stick(self):
+        own = {'HTTP_AUTHORIZATION': 'Token own'}
+        self.read_alias(self.factory.post('/', **own), status=400)
+        self.assertEqual(self.read_alias(self.factory.get('/', **own)),
+                         REPLICA)
+
+    def test_tokens_are_read_from_primary(self):
+        self.assertEqual(
+            self.read_alias(self.factory.get('/'), model=Token), 'default'
+        )
+
+    def test_cache_fill_reads_from_primary(self):
+        chosen = []
+
+        def view(request):
+            with read_from_primary():
+                chosen.append(self.router.db_for_read(Recipe))
+            chosen.append(self.router.db_for_read(Recipe))
+            return HttpResponse()
+
+        ReplicaMiddleware(view)(self.factory.get('/'))
+        self.assertEqual(chosen, ['default', REPLICA])
+
+    def test_outside_request_uses_primary(self):
+        self.assertEqual(self.router.db_for_read(Recipe), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[BROKEN_REPLICA])
+    def test_unavailable_replica_falls_back_to_primary(self):
+        self.assertEqual(self.read_alias(self.factory.get('/')), 'default')
+        self.assertTrue(db_router.is_down(BROKEN_REPLICA))
+
+    @override_settings(DATABASE_REPLICAS=[BROKEN_REPLICA, REPLICA])
+    def test_unavailable_replica_is_skipped(self):
+        for _ in range(5):
+            self.assertEqual(
+                self.read_alias(self.factory.get('/')), REPLICA
+            )
+
+    def test_migrations_only_on_primary(self):
+        self.assertTrue(self.router.allow_migrate('default', 'recipes'))
+        self.assertFalse(self.router.allow_migrate(REPLICA, 'recipes'))
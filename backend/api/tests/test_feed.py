@@ -0,0 +1,145 @@
+from unittest import mock
+
+from django.db import DatabaseError
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.feed import flush_feed_rebuilds, rebuild_feeds
+from api.tests.utils import create_recipe, create_user
+from recipes.models import FeedEntry, Recipe, Subscription
+
+
+@override_settings(FEED_LENGTH=4, FEED_FANOUT_LIMIT=2)
+class FeedTests(TestCase):
+    """Лента читается из FeedEntry и должна совпадать с выборкой
+    рецептов по подпискам."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader, cls.other, cls.author, cls.second, cls.popular = map(
+            create_user, ('reader', 'other', 'author', 'second', 'popular')
+        )
+        for author in (cls.author, cls.second, cls.popular):
+            for number in range(3):
+                cls.publish(author, number)
+
+    @classmethod
+    def publish(cls, author, number=0):
+        return create_recipe(author, f'{author.username} {number}')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def feed_ids(self, query=''):
+        response = self.client.get(f'/api/recipes/feed/{query}')
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def expected_ids(self, user=None):
+        return list(Recipe.objects.filter(
+            author__subscribing__user=user or self.reader
+        ).order_by('-pub_date', '-id').values_list(
+            'id', flat=True
+        )[:4])
+
+    def subscribe(self, author, user=None):
+        Subscription.objects.create(user=user or self.reader, author=author)
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        response = self.client.get('/api/recipes/feed/')
+        self.assertEqual(response.status_code, 401)
+
+    def test_subscription_fills_feed(self):
+        self.subscribe(self.author)
+        self.subscribe(self.second)
+        self.assertEqual(self.feed_ids(), self.expected_ids())
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), 4
+        )
+
+    def test_new_recipe_is_fanned_out(self):
+        self.subscribe(self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = self.publish(self.author, 10)
+        self.assertEqual(self.feed_ids()[0], recipe.id)
+        self.assertFalse(FeedEntry.objects.filter(user=self.other).exists())
+
+    def test_timeline_is_trimmed(self):
+        self.subscribe(self.author)
+        self.subscribe(self.second)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.publish(self.second, 10)
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.reader).count(), 4
+        )
+        self.assertEqual(self.feed_ids(), self.expected_ids())
+
+    def test_unsubscribe_rebuilds_feed(self):
+        self.subscribe(self.author)
+        self.subscribe(self.second)
+        self.subscribe(self.popular)
+        with self.captureOnCommitCallbacks(execute=True):
+            Subscription.objects.filter(
+                user=self.reader, author__in=[self.second, self.popular]
+            ).delete()
+        self.assertEqual(self.feed_ids(), self.expected_ids())
+        self.assertEqual(len(self.feed_ids()), 3)
+
+    def test_deleted_author_is_not_rebuilt(self):
+        self.subscribe(self.second)
+        self.subscribe(self.second, self.other)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.second.delete()
+        self.assertNotIn(flush_feed_rebuilds, callbacks)
+        self.assertFalse(FeedEntry.objects.exists())
+
+    def test_popular_author_is_merged_on_read(self):
+        self.subscribe(self.popular)
+        self.subscribe(self.popular, self.other)
+        self.subscribe(self.popular, self.author)
+        self.subscribe(self.second)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = self.publish(self.popular, 10)
+        self.assertFalse(FeedEntry.objects.filter(recipe=recipe).exists())
+        self.assertEqual(self.feed_ids(), self.expected_ids())
+        self.assertEqual(self.feed_ids('?limit=3&page=2'),
+                         self.expected_ids()[3:])
+
+    def test_batch_subscribe_and_unsubscribe(self):
+        url = '/api/users/subscribe/batch/'
+        ids = {'ids': [self.author.id, self.second.id]}
+        self.client.post(url, ids, format='json')
+        self.assertEqual(self.feed_ids(), self.expected_ids())
+        self.client.delete(url, {'ids': [self.author.id]}, format='json')
+        self.assertEqual(self.feed_ids(), self.expected_ids())
+
+    def test_rebuild_matches_incremental_feed(self):
+        self.subscribe(self.author)
+        self.subscribe(self.second)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.publish(self.author, 10)
+        incremental = self.feed_ids()
+        FeedEntry.objects.all().delete()
+        self.assertEqual(rebuild_feeds(), 1)
+        self.assertEqual(self.feed_ids(), incremental)
+
+
+class FeedRebuildTransactionTests(TransactionTestCase):
+    """rebuild_feeds() вызывается после коммита, вне транзакции."""
+
+    def test_failed_rebuild_keeps_old_feed(self):
+        reader, author = map(create_user, ('reader', 'author'))
+        create_recipe(author)
+        Subscription.objects.create(user=reader, author=author)
+        before = list(FeedEntry.objects.values_list('recipe_id', flat=True))
+        self.assertEqual(len(before), 1)
+        with mock.patch.object(
+            FeedEntry.objects, 'bulk_create', side_effect=DatabaseError
+        ), self.assertRaises(DatabaseError):
+            rebuild_feeds([reader.id])
+        self.assertEqual(
+            list(FeedEntry.objects.values_list('recipe_id', flat=True)),
+            before
+        )
@@ -0,0 +1,77 @@
+from django.core.files.storage import default_storage
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.images import variant_paths
+from api.tests.utils import (
+    IMAGE,
+    MediaTestCase,
+    create_recipe,
+    create_user,
+    image_data
+)
+
+
+class AvatarVariantsTests(MediaTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(
+                '/api/users/me/avatar/', {'avatar': image_data(320)},
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        self.user.refresh_from_db()
+        return self.user.avatar.name, variant_paths(self.user.avatar_variants)
+
+    def test_delete_removes_variants(self):
+        source, paths = self.upload()
+        self.assertEqual(len(paths), 2)
+        for path in [source, *paths]:
+            self.assertTrue(default_storage.exists(path), path)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete('/api/users/me/avatar/')
+        self.assertEqual(response.status_code, 204)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.avatar)
+        self.assertEqual(self.user.avatar_variants, {})
+        for path in [source, *paths]:
+            self.assertFalse(default_storage.exists(path), path)
+        response = self.client.get('/api/users/me/')
+        self.assertIsNone(response.json()['avatar_variants'])
+
+    def test_new_avatar_replaces_variants(self):
+        _, old_paths = self.upload()
+        source, paths = self.upload()
+        self.assertEqual(self.user.avatar_variants['source'], source)
+        self.assertTrue(all(map(default_storage.exists, paths)))
+        self.assertFalse(any(map(default_storage.exists, old_paths)))
+
+
+class VariantsSaveTests(TestCase):
+    """Полное сохранение устаревшего объекта не затирает копии,
+    записанные фоновой задачей."""
+
+    def test_full_save_keeps_variants(self):
+        user = create_user('user', avatar='avatar/a.png')
+        recipe = create_recipe(user, image_variants={})
+        for instance, field, source in (
+            (user, 'avatar_variants', 'avatar/a.png'),
+            (recipe, 'image_variants', IMAGE),
+        ):
+            with self.subTest(field=field):
+                variants = {'source': source, 'sizes': {}}
+                type(instance).objects.filter(pk=instance.pk).update(
+                    **{field: variants}
+                )
+                instance.save()
+                instance.refresh_from_db()
+                self.assertEqual(getattr(instance, field), variants)
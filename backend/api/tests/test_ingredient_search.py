@@ -0,0 +1,97 @@
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from api.ingredient_search import IngredientIndex, normalize
+from recipes.models import Ingredient
+
+NAMES = (
+    'Мука пшеничная',
+    'Мука ржаная',
+    'Ёжевика',
+    'Молоко',
+    'Кокосовое молоко',
+    'Сгущенное молоко',
+    'Мускатный орех',
+    'Пшено',
+)
+
+
+def names(results):
+    return [item['name'] for item in results]
+
+
+class IngredientIndexTests(SimpleTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.index = IngredientIndex([
+            {'id': pk, 'name': name, 'measurement_unit': 'г'}
+            for pk, name in enumerate(NAMES, start=1)
+        ])
+
+    def test_normalize(self):
+        self.assertEqual(normalize('  Ёжевика   ЛЕСНАЯ '), 'ежевика лесная')
+
+    def test_prefix_matches_come_first(self):
+        self.assertEqual(
+            names(self.index.search('му')),
+            ['Мука пшеничная', 'Мука ржаная', 'Мускатный орех']
+        )
+
+    def test_word_start_before_substring(self):
+        self.assertEqual(
+            names(self.index.search('молоко')),
+            ['Молоко', 'Кокосовое молоко', 'Сгущенное молоко']
+        )
+        self.assertEqual(
+            names(self.index.search('шен')),
+            ['Пшено', 'Мука пшеничная']
+        )
+
+    def test_case_and_yo_are_ignored(self):
+        self.assertEqual(names(self.index.search('ЕЖЕ')), ['Ёжевика'])
+        self.assertEqual(names(self.index.search('ёж')), ['Ёжевика'])
+
+    def test_typos_use_trigrams(self):
+        self.assertEqual(names(self.index.search('малоко'))[0], 'Молоко')
+        self.assertEqual(self.index.search('абвгд'), [])
+
+    def test_limit(self):
+        self.assertEqual(len(self.index.search('м', limit=2)), 2)
+        self.assertEqual(self.index.search('м', limit=0), [])
+        self.assertEqual(self.index.search('   '), [])
+
+    def test_items_keep_original_fields(self):
+        self.assertEqual(
+            self.index.search('пшено'),
+            [{'id': 8, 'name': 'Пшено', 'measurement_unit': 'г'}]
+        )
+
+
+class IngredientSearchViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, query, **params):
+        response = self.client.get(
+            '/api/ingredients/', {'name': query, **params}
+        )
+        self.assertEqual(response.status_code, 200)
+        return names(response.json())
+
+    def test_index_follows_changes(self):
+        ingredient = Ingredient.objects.create(
+            name='Мед', measurement_unit='г'
+        )
+        self.assertEqual(self.search('ме'), ['Мед'])
+        Ingredient.objects.create(name='Меласса', measurement_unit='г')
+        self.assertEqual(self.search('ме'), ['Мед', 'Меласса'])
+        self.assertEqual(self.search('ме', limit=1), ['Мед'])
+        ingredient.delete()
+        self.assertEqual(self.search('ме'), ['Меласса'])
+
+    def test_invalid_limit_uses_default(self):
+        Ingredient.objects.create(name='Мед', measurement_unit='г')
+        self.assertEqual(self.search('мед', limit='много'), ['Мед'])
@@ -0,0 +1,80 @@
+import json
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.tests.utils import create_recipe, create_user
+from recipes.models import (
+    Ingredient,
+    IngredientRecipe,
+    ShoppingCart
+)
+
+LOGGER = 'api.instrumentation'
+
+
+def server_timing(response):
+    return {
+        part.split(';')[0]: float(part.split('dur=')[1].split(';')[0])
+        for part in response['Server-Timing'].split(', ')
+    }
+
+
+class QueryInstrumentationTests(TestCase):
+    """Строка лога пишется для каждого запроса, а сериализация
+    учитывается без разметки во view."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('user')
+        cls.recipe = create_recipe(cls.user)
+        IngredientRecipe.objects.create(
+            recipe=cls.recipe, amount=1,
+            ingredient=Ingredient.objects.create(
+                name='мука', measurement_unit='г'
+            )
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def records(self, logs):
+        return [json.loads(record.getMessage()) for record in logs.records]
+
+    def test_every_request_is_logged(self):
+        with self.assertLogs(LOGGER, 'INFO') as logs:
+            response = self.client.post(
+                f'/api/recipes/{self.recipe.id}/favorite/'
+            )
+        self.assertEqual(response.status_code, 201)
+        [record] = self.records(logs)
+        self.assertEqual(record['method'], 'POST')
+        self.assertEqual(record['status'], 201)
+        self.assertGreater(record['queries'], 0)
+        self.assertNotIn('query_log', record)
+
+    def test_serializers_are_timed_in_any_view(self):
+        for path in (
+            f'/api/recipes/{self.recipe.id}/',
+            '/api/users/me/',
+            f'/api/users/{self.user.id}/',
+        ):
+            with self.subTest(path=path), self.assertLogs(LOGGER, 'INFO'):
+                timing = server_timing(self.client.get(path))
+                self.assertGreater(timing['serialize'], 0)
+
+    def test_streaming_body_is_counted(self):
+        ShoppingCart.objects.create(user=self.user, recipe=self.recipe)
+        with self.assertLogs(LOGGER, 'INFO') as logs:
+            response = self.client.get(
+                '/api/recipes/download_shopping_cart/'
+            )
+            self.assertEqual(logs.records, [])
+            content = b''.join(response.streaming_content)
+        self.assertIn('мука'.encode(), content)
+        [record] = self.records(logs)
+        header_queries = int(
+            response['Server-Timing'].split('desc="')[1].split()[0]
+        )
+        self.assertEqual(record['queries'], header_queries + 1)
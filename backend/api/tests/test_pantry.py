@@ -0,0 +1,218 @@
+import random
+
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from api import pantry
+from api.pantry import PantryIndex, get_pantry_index, invalidate_pantry_index
+from api.serializers import RecipeSerializer
+from api.tests.utils import create_recipe, create_user
+from recipes.models import Ingredient, IngredientRecipe
+
+RECIPES = 300
+INGREDIENTS = 40
+
+
+def random_recipes(seed):
+    """Рецепты с частыми и редкими ингредиентами, с пропусками id."""
+    generator = random.Random(seed)
+    weights = [1 / (number + 1) for number in range(INGREDIENTS)]
+    recipes = {}
+    for recipe_id in generator.sample(range(1, RECIPES * 2), RECIPES):
+        size = generator.randint(1, 8)
+        recipes[recipe_id] = set(generator.choices(
+            range(1, INGREDIENTS + 1), weights, k=size
+        ))
+    return recipes
+
+
+def rows(recipes):
+    return [
+        (recipe_id, ingredient_id)
+        for recipe_id, ingredients in recipes.items()
+        for ingredient_id in ingredients
+    ]
+
+
+def expected(recipes, ingredient_ids, mode='missing', missing=0):
+    """Полный перебор с тем же порядком, что у индекса."""
+    ingredient_ids = set(ingredient_ids)
+    found = []
+    for recipe_id, ingredients in recipes.items():
+        matched, size = len(ingredients & ingredient_ids), len(ingredients)
+        if not matched or (
+            mode == 'all' and matched < len(ingredient_ids)
+        ) or (mode == 'missing' and size - matched > missing):
+            continue
+        found.append((recipe_id, matched, size))
+    found.sort(key=lambda match: (
+        -match[1] / match[2], match[2] - match[1], -match[1], -match[0]
+    ))
+    return found
+
+
+class PantryIndexTests(SimpleTestCase):
+    """Индекс сравнивается с полным перебором рецептов."""
+
+    def setUp(self):
+        self.recipes = random_recipes(seed=1)
+        self.index = PantryIndex(rows(self.recipes))
+        self.queries = [
+            random.Random(number).sample(
+                range(1, INGREDIENTS + 3), number % 7 + 1
+            )
+            for number in range(30)
+        ]
+
+    def assert_matches(self, index, recipes):
+        for ingredient_ids in self.queries:
+            for mode, missing in (
+                ('all', 0), ('any', 0), ('missing', 0), ('missing', 2)
+            ):
+                self.assertEqual(
+                    index.search(ingredient_ids, mode, missing)[:],
+                    expected(recipes, ingredient_ids, mode, missing),
+                    f'{mode} {missing} {ingredient_ids}'
+                )
+
+    def test_uses_bitsets_and_arrays(self):
+        self.assertTrue(self.index.dense)
+        self.assertTrue(self.index.sparse)
+        self.assertEqual(len(self.index), RECIPES)
+
+    def test_search_matches_brute_force(self):
+        self.assert_matches(self.index, self.recipes)
+
+    def test_slices_follow_ranking(self):
+        matches = self.index.search([1, 2, 3, 4], 'any')
+        everything = matches[:]
+        self.assertEqual(len(matches), len(everything))
+        self.assertEqual(
+            matches[5:17] + matches[17:40], everything[5:40]
+        )
+
+    def test_apply_matches_rebuilt_index(self):
+        changed = random_recipes(seed=2)
+        updates = {
+            recipe_id: changed.get(recipe_id, set())
+            for recipe_id in list(self.recipes)[:40] + [RECIPES * 3]
+        }
+        updates[RECIPES * 3] = {1, INGREDIENTS + 1}
+        self.index.apply(updates)
+        self.recipes.update(updates)
+        self.recipes = {
+            recipe_id: ingredients
+            for recipe_id, ingredients in self.recipes.items()
+            if ingredients
+        }
+        self.assert_matches(self.index, self.recipes)
+
+    def test_empty_query(self):
+        self.assertEqual(len(self.index.search([])), 0)
+
+
+class CookEndpointTests(TestCase):
+    """Подбор рецептов через API и обновление индекса после изменений."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.eggs, cls.flour, cls.milk, cls.salt = (
+            Ingredient.objects.bulk_create([
+                Ingredient(name=name, measurement_unit='г')
+                for name in ('яйца', 'мука', 'молоко', 'соль')
+            ])
+        )
+        cls.omelette = cls.publish('Омлет', cls.eggs, cls.milk, cls.salt)
+        cls.pancakes = cls.publish('Блины', cls.eggs, cls.flour, cls.milk)
+        cls.boiled = cls.publish('Вареные яйца', cls.eggs)
+
+    @classmethod
+    def publish(cls, name, *ingredients):
+        recipe = create_recipe(cls.author, name)
+        IngredientRecipe.objects.bulk_create([
+            IngredientRecipe(recipe=recipe, ingredient=ingredient, amount=1)
+            for ingredient in ingredients
+        ])
+        return recipe
+
+    def setUp(self):
+        invalidate_pantry_index()
+        self.client = APIClient()
+
+    def cook(self, *ingredients, **params):
+        query = '&'.join(
+            [f'ingredients={ingredient.id}' for ingredient in ingredients]
+            + [f'{key}={value}' for key, value in params.items()]
+        )
+        response = self.client.get(f'/api/recipes/cook/?{query}')
+        self.assertEqual(response.status_code, 200, response.content)
+        return [
+            (
+                recipe['name'],
+                recipe['matched_ingredients'],
+                recipe['missing_ingredients'],
+            )
+            for recipe in response.json()['results']
+        ]
+
+    def test_modes(self):
+        self.assertEqual(
+            self.cook(self.eggs, self.milk), [('Вареные яйца', 1, 0)]
+        )
+        self.assertEqual(
+            self.cook(self.eggs, self.milk, mode='missing', missing=1),
+            [('Вареные яйца', 1, 0), ('Блины', 2, 1), ('Омлет', 2, 1)]
+        )
+        self.assertEqual(
+            self.cook(self.eggs, self.milk, mode='all'),
+            [('Блины', 2, 1), ('Омлет', 2, 1)]
+        )
+        self.assertEqual(
+            self.cook(self.flour, mode='any'), [('Блины', 1, 2)]
+        )
+
+    def test_invalid_parameters(self):
+        for query in ('', 'ingredients=x', 'ingredients=1&mode=some',
+                      'ingredients=1&missing=100'):
+            response = self.client.get(f'/api/recipes/cook/?{query}')
+            self.assertEqual(response.status_code, 400, query)
+
+    def test_changes_are_applied_incrementally(self):
+        index = get_pantry_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            salted = self.publish('Соленые блины', self.flour, self.salt)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.omelette.delete()
+        self.assertEqual(
+            self.cook(self.flour, self.salt), [('Соленые блины', 2, 0)]
+        )
+        self.assertEqual(self.cook(self.salt, mode='any'),
+                         [('Соленые блины', 1, 1)])
+        self.assertIs(get_pantry_index(), index)
+        self.assertEqual(index.version, pantry.get_version(
+            pantry.VERSION_CACHE_KEY
+        ))
+        self.assertEqual(len(index), 3)
+        self.assertIn(
+            (salted.id, 1, 2), index.search([self.flour.id], 'any')[:]
+        )
+
+    def test_recipe_edits_update_index(self):
+        index = get_pantry_index()
+        version = index.version
+        self.pancakes.name = 'Тонкие блины'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pancakes.save()
+        self.assertEqual(
+            pantry.get_version(pantry.VERSION_CACHE_KEY), version
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeSerializer().update_ingredients(
+                [{'id': self.eggs.id, 'amount': 2},
+                 {'id': self.salt.id, 'amount': 1}],
+                self.boiled
+            )
+        self.assertEqual(self.cook(self.eggs, self.salt),
+                         [('Вареные яйца', 2, 0)])
+        self.assertIs(get_pantry_index(), index)
@@ -0,0 +1,369 @@
+import re
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.counters import reconcile_counters
+from api.feed import rebuild_feeds
+from api.pantry import invalidate_pantry_index
+from api.tests.utils import (
+    IMAGE,
+    MediaTestCase,
+    create_recipe,
+    create_user,
+    image_data
+)
+from api.urls import router
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    ShoppingCart,
+    Subscription,
+    Tag
+)
+from users.models import CustomUser
+
+SMALL_PAGE = 1
+LARGE_PAGE = 50
+AUTHORS = 60
+RECIPES_PER_AUTHOR = 2
+PASSWORD = 'Str0ng-password'
+
+# Маршруты djoser для писем и подтверждений не используются фронтендом
+# и не читают списков, поэтому бюджет для них не задается.
+SKIPPED_ROUTES = {
+    'users-activation',
+    'users-resend-activation',
+    'users-reset-password',
+    'users-reset-password-confirm',
+    'users-reset-username',
+    'users-reset-username-confirm',
+    'users-set-username',
+}
+
+
+def signature(sql):
+    """Убирает из SQL числа, строки и длину списков IN, чтобы одинаковые
+    запросы с разными параметрами считались одним."""
+    sql = re.sub(r"'[^']*'|\b\d+\b", '?', sql)
+    return re.sub(r'IN \(\?(, \?)*\)', 'IN (...)', sql)
+
+
+class QueryBudgetTests(MediaTestCase):
+    """
+    Проверяет, что число SQL-запросов каждого эндпоинта не превышает
+    бюджет, а для списков не зависит от размера страницы.
+    """
+    longMessage = False
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader', PASSWORD)
+        cls.authors = CustomUser.objects.bulk_create([
+            CustomUser(
+                username=f'author{number}',
+                email=f'author{number}@example.com',
+                first_name='Имя',
+                last_name='Фамилия',
+            )
+            for number in range(AUTHORS)
+        ])
+        cls.tags = Tag.objects.bulk_create([
+            Tag(name=f'Тег {number}', slug=f'tag{number}')
+            for number in range(3)
+        ])
+        cls.ingredients = Ingredient.objects.bulk_create([
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(10)
+        ])
+        cls.recipes = Recipe.objects.bulk_create([
+            Recipe(
+                name=f'Рецепт {number}',
+                text='Описание',
+                author=author,
+                cooking_time=10,
+                image=IMAGE,
+            )
+            for author in cls.authors
+            for number in range(RECIPES_PER_AUTHOR)
+        ])
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+            for recipe in cls.recipes
+            for tag in cls.tags[:2]
+        ])
+        IngredientRecipe.objects.bulk_create([
+            IngredientRecipe(recipe=recipe, ingredient=ingredient, amount=5)
+            for recipe in cls.recipes
+            for ingredient in cls.ingredients[:3]
+        ])
+        for model in (Favorite, ShoppingCart):
+            model.objects.bulk_create([
+                model(user=cls.user, recipe=recipe)
+                for recipe in cls.recipes[:LARGE_PAGE + 5]
+            ])
+        Subscription.objects.bulk_create([
+            Subscription(user=cls.user, author=author)
+            for author in cls.authors[:LARGE_PAGE + 5]
+        ])
+        reconcile_counters()
+        rebuild_feeds()
+        cls.own_recipe = create_recipe(cls.user, 'Свой рецепт')
+        cls.own_recipe.tags.set(cls.tags[:1])
+        IngredientRecipe.objects.create(
+            recipe=cls.own_recipe, ingredient=cls.ingredients[0], amount=1
+        )
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def recipe_body(self):
+        return {
+            'name': 'Новый рецепт',
+            'text': 'Описание',
+            'cooking_time': 15,
+            'tags': [tag.id for tag in self.tags],
+            'image': image_data(),
+            'ingredients': [
+                {'id': ingredient.id, 'amount': 3}
+                for ingredient in self.ingredients[2:6]
+            ],
+        }
+
+    def capture(self, method, url, data=None, client=None):
+        client = client or self.client
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(client, method)(url, data, format='json')
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertLess(
+            response.status_code, 400,
+            f'{method.upper()} {url}: {response.status_code}'
+        )
+        return [query['sql'] for query in context.captured_queries]
+
+    def assert_budget(self, queries, budget, label):
+        self.assertLessEqual(
+            len(queries), budget,
+            f'{label}: {len(queries)} запросов при бюджете {budget}:\n'
+            + '\n'.join(queries)
+        )
+
+    def assert_constant(self, url, budget):
+        """Сравнивает запросы при странице из одного и из LARGE_PAGE
+        элементов и перечисляет SQL, число которых выросло."""
+        separator = '&' if '?' in url else '?'
+        self.capture('get', f'{url}{separator}limit={SMALL_PAGE}')
+        small = self.capture('get', f'{url}{separator}limit={SMALL_PAGE}')
+        large = self.capture('get', f'{url}{separator}limit={LARGE_PAGE}')
+        grown = Counter(map(signature, large)) - Counter(
+            map(signature, small)
+        )
+        self.assertFalse(
+            grown,
+            f'{url}: {len(small)} запросов при limit={SMALL_PAGE}, '
+            f'{len(large)} при limit={LARGE_PAGE}. Лишние:\n'
+            + '\n'.join(
+                f'{count} x {sql}' for sql, count in grown.items()
+            )
+        )
+        self.assert_budget(large, budget, url)
+
+    def test_every_route_has_budget(self):
+        tested = set()
+        for name in dir(self):
+            method = getattr(self, name)
+            tested.update(getattr(method, 'routes', ()))
+        routes = {pattern.name for pattern in router.urls} - {'api-root'}
+        self.assertFalse(
+            routes - tested - SKIPPED_ROUTES,
+            'Для этих маршрутов нет проверки числа запросов.'
+        )
+
+    def test_recipe_list(self):
+        self.assert_constant('/api/recipes/', 6)
+        self.assert_constant('/api/recipes/?cursor=', 5)
+        self.assert_constant(
+            f'/api/recipes/?is_favorited=1&is_in_shopping_cart=1'
+            f'&tags={self.tags[0].slug}&tags={self.tags[1].slug}',
+            7
+        )
+        self.assert_constant(f'/api/recipes/?author={self.authors[0].id}', 6)
+        self.assert_constant('/api/recipes/?search=рецепт', 6)
+    test_recipe_list.routes = ('recipe-list',)
+
+    def test_recipe_list_anonymous(self):
+        self.client.force_authenticate(None)
+        self.assert_constant('/api/recipes/', 6)
+
+    def test_feed(self):
+        self.assert_constant('/api/recipes/feed/', 7)
+    test_feed.routes = ('recipe-feed',)
+
+    def test_cook(self):
+        invalidate_pantry_index()
+        ingredients = '&'.join(
+            f'ingredients={ingredient.id}'
+            for ingredient in self.ingredients[:3]
+        )
+        for mode in ('all', 'any', 'missing'):
+            self.assert_constant(f'/api/recipes/cook/?{ingredients}'
+                                 f'&mode={mode}', 5)
+    test_cook.routes = ('recipe-cook',)
+
+    def test_user_list(self):
+        self.assert_constant('/api/users/', 3)
+    test_user_list.routes = ('users-list',)
+
+    def test_subscriptions(self):
+        self.assert_constant('/api/users/subscriptions/', 4)
+        self.assert_constant('/api/users/subscriptions/?recipes_limit=1', 4)
+        self.assert_constant('/api/users/subscriptions/?cursor=', 4)
+    test_subscriptions.routes = ('users-subscriptions',)
+
+    def test_catalogs(self):
+        self.assert_constant('/api/tags/', 1)
+        self.assert_constant('/api/ingredients/', 1)
+        self.assert_constant('/api/ingredients/?name=ингр', 1)
+        self.assert_budget(
+            self.capture('get', f'/api/tags/{self.tags[0].id}/'), 1, 'tag'
+        )
+        self.assert_budget(
+            self.capture('get', f'/api/ingredients/{self.ingredients[0].id}/'),
+            1, 'ingredient'
+        )
+    test_catalogs.routes = (
+        'tag-list', 'tag-detail', 'ingredient-list', 'ingredient-detail'
+    )
+
+    def test_recipe_detail(self):
+        url = f'/api/recipes/{self.recipes[0].id}/'
+        self.assert_budget(self.capture('get', url), 5, 'recipe miss')
+        self.assert_budget(self.capture('get', url), 1, 'recipe hit')
+    test_recipe_detail.routes = ('recipe-detail',)
+
+    def test_recipe_create_update_delete(self):
+        self.assert_budget(
+            self.capture('post', '/api/recipes/', self.recipe_body()),
+            13, 'recipe create'
+        )
+        url = f'/api/recipes/{self.own_recipe.id}/'
+        self.assert_budget(
+            self.capture('patch', url, self.recipe_body()),
+            17, 'recipe update'
+        )
+        self.assert_budget(self.capture('delete', url), 10, 'recipe delete')
+    test_recipe_create_update_delete.routes = ('recipe-detail',)
+
+    def test_favorite_and_cart(self):
+        recipe = self.recipes[-1]
+        for route in ('favorite', 'shopping_cart'):
+            url = f'/api/recipes/{recipe.id}/{route}/'
+            self.assert_budget(self.capture('post', url), 6, route)
+            self.assert_budget(self.capture('delete', url), 6, route)
+    test_favorite_and_cart.routes = ('recipe-favorite', 'recipe-shopping-cart')
+
+    def test_batches(self):
+        recipe_ids = [recipe.id for recipe in self.recipes]
+        author_ids = [author.id for author in self.authors]
+        # Подписки дополнительно обновляют ленту подписчика.
+        for url, ids, budget in (
+            ('/api/recipes/favorite/batch/', recipe_ids, 6),
+            ('/api/recipes/shopping_cart/batch/', recipe_ids, 6),
+            ('/api/users/subscribe/batch/', author_ids, 9),
+        ):
+            for method in ('post', 'delete'):
+                small = self.capture(method, url, {'ids': ids[:1]})
+                large = self.capture(
+                    method, url, {'ids': ids[:LARGE_PAGE]}
+                )
+                self.assertEqual(len(small), len(large), url)
+                self.assert_budget(large, budget, url)
+    test_batches.routes = (
+        'recipe-favorite-batch',
+        'recipe-shopping-cart-batch',
+        'users-subscribe-batch',
+    )
+
+    def test_download_shopping_cart(self):
+        for file_format in ('txt', 'csv', 'json'):
+            self.assert_budget(
+                self.capture(
+                    'get',
+                    '/api/recipes/download_shopping_cart/'
+                    f'?file_format={file_format}'
+                ),
+                2, file_format
+            )
+    test_download_shopping_cart.routes = ('recipe-download-shopping-cart',)
+
+    def test_short_link(self):
+        url = f'/api/recipes/{self.recipes[0].id}/get-link/'
+        self.assert_budget(self.capture('get', url), 1, 'get-link')
+    test_short_link.routes = ('recipe-get-short-link',)
+
+    def test_profile(self):
+        self.assert_budget(self.capture('get', '/api/users/me/'), 1, 'me')
+        self.assert_budget(
+            self.capture('get', f'/api/users/{self.authors[0].id}/'),
+            2, 'user detail'
+        )
+        self.assert_budget(
+            self.capture(
+                'put', '/api/users/me/avatar/', {'avatar': image_data()}
+            ),
+            2, 'avatar put'
+        )
+        self.assert_budget(
+            self.capture('delete', '/api/users/me/avatar/'), 2, 'avatar delete'
+        )
+    test_profile.routes = ('users-me', 'users-detail', 'users-avatar')
+
+    def test_subscribe(self):
+        url = f'/api/users/{self.authors[-1].id}/subscribe/'
+        self.assert_budget(self.capture('post', url), 12, 'subscribe')
+        self.assert_budget(self.capture('delete', url), 8, 'unsubscribe')
+    test_subscribe.routes = ('users-subscribe',)
+
+    def test_registration_and_password(self):
+        anonymous = APIClient()
+        self.assert_budget(
+            self.capture('post', '/api/users/', {
+                'email': 'new@example.com',
+                'username': 'newcomer',
+                'first_name': 'Имя',
+                'last_name': 'Фамилия',
+                'password': PASSWORD,
+            }, client=anonymous),
+            5, 'registration'
+        )
+        self.assert_budget(
+            self.capture('post', '/api/auth/token/login/', {
+                'email': self.user.email, 'password': PASSWORD
+            }, client=anonymous),
+            3, 'login'
+        )
+        self.assert_budget(
+            self.capture('post', '/api/users/set_password/', {
+                'current_password': PASSWORD, 'new_password': PASSWORD + '1'
+            }),
+            2, 'set_password'
+        )
+        token_client = APIClient()
+        token_client.credentials(HTTP_AUTHORIZATION=f'Token {self.token}')
+        self.assert_budget(
+            self.capture(
+                'post', '/api/auth/token/logout/', client=token_client
+            ),
+            2, 'logout'
+        )
+    test_registration_and_password.routes = ('users-set-password',)
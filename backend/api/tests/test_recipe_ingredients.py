@@ -0,0 +1,129 @@
+from unittest import mock
+
+from django.db import DatabaseError, connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.tests.utils import (
+    MediaTestCase,
+    create_recipe,
+    create_user,
+    image_data
+)
+from recipes.models import Ingredient, IngredientRecipe, Tag
+
+
+class UpdateIngredientsTests(MediaTestCase):
+    """Обновление рецепта меняет только затронутые строки
+    ингредиентов и откатывается целиком при ошибке."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.tag = Tag.objects.create(name='Ужин', slug='dinner')
+        cls.ingredients = Ingredient.objects.bulk_create([
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(4)
+        ])
+        cls.recipe = create_recipe(cls.author)
+        cls.recipe.tags.set([cls.tag])
+        for ingredient, amount in zip(cls.ingredients[:3], (1, 2, 3)):
+            IngredientRecipe.objects.create(
+                recipe=cls.recipe, ingredient=ingredient, amount=amount
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def patch(self, ingredients):
+        return self.client.patch(
+            f'/api/recipes/{self.recipe.id}/',
+            {
+                'name': 'Новое название',
+                'text': 'Описание',
+                'cooking_time': 10,
+                'tags': [self.tag.id],
+                'image': image_data(),
+                'ingredients': [
+                    {'id': pk, 'amount': amount}
+                    for pk, amount in ingredients
+                ],
+            },
+            format='json'
+        )
+
+    def rows(self):
+        return {
+            row.ingredient_id: (row.pk, row.amount)
+            for row in IngredientRecipe.objects.filter(recipe=self.recipe)
+        }
+
+    def test_diff_keeps_unchanged_rows(self):
+        first, second, third, fourth = (
+            ingredient.id for ingredient in self.ingredients
+        )
+        before = self.rows()
+        response = self.patch([(first, 1), (second, 20), (fourth, 4)])
+        self.assertEqual(response.status_code, 200, response.content)
+        after = self.rows()
+        self.assertEqual(set(after), {first, second, fourth})
+        self.assertEqual(after[first], before[first])
+        self.assertEqual(after[second], (before[second][0], 20))
+        self.assertEqual(after[fourth][1], 4)
+        self.assertEqual(
+            sorted(
+                (item['id'], item['amount'])
+                for item in response.json()['ingredients']
+            ),
+            sorted([(first, 1), (second, 20), (fourth, 4)])
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.ingredients_count, 3)
+
+    def test_counter_is_written_once(self):
+        first, _, _, fourth = (
+            ingredient.id for ingredient in self.ingredients
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.patch([(first, 1), (fourth, 4)])
+        self.assertEqual(response.status_code, 200, response.content)
+        counter_updates = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE')
+            and 'ingredients_count' in query['sql']
+        ]
+        self.assertEqual(len(counter_updates), 1, counter_updates)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.ingredients_count, 2)
+
+    def test_invalid_ingredients_are_rejected(self):
+        first = self.ingredients[0].id
+        missing = max(ingredient.id for ingredient in self.ingredients) + 1
+        before = self.rows()
+        for ingredients in (
+            [],
+            [(first, 1), (first, 2)],
+            [(first, 1), (missing, 1)],
+            [(first, 0)],
+        ):
+            with self.subTest(ingredients=ingredients):
+                response = self.patch(ingredients)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(self.rows(), before)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.name, 'Рецепт')
+
+    def test_failed_update_is_rolled_back(self):
+        first, _, _, fourth = (
+            ingredient.id for ingredient in self.ingredients
+        )
+        before = self.rows()
+        with mock.patch(
+            'api.serializers.change_counter', side_effect=DatabaseError
+        ), self.assertRaises(DatabaseError):
+            self.patch([(first, 10), (fourth, 4)])
+        self.assertEqual(self.rows(), before)
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.name, 'Рецепт')
+        self.assertEqual(self.recipe.ingredients_count, 3)
@@ -0,0 +1,210 @@
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.recipe_rows import (
+    RECIPE_FIELDS,
+    FastJSONRenderer,
+    ingredients_prefetch,
+    serialize_recipes
+)
+from api.serializers import RecipeGetSerializer
+from recipes.models import (
+    Favorite,
+    Ingredient,
+    IngredientRecipe,
+    Recipe,
+    ShoppingCart,
+    Subscription,
+    Tag
+)
+from users.models import CustomUser
+
+IMAGE = 'recipes/images/dish.png'
+AVATAR = 'avatar/author.png'
+
+
+def variants(source, size):
+    return {'source': source, 'sizes': {size: {
+        'webp': f'{source}.{size}.webp', 'jpeg': f'{source}.{size}.jpg'
+    }}}
+
+
+class RecipeRowsParityTests(TestCase):
+    """Быстрый путь списка рецептов должен отдавать ровно то же,
+    что RecipeGetSerializer и JSONRenderer."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = CustomUser.objects.create_user(
+            username='reader', email='reader@example.com', password='x',
+            first_name='Читатель', last_name='Тестов'
+        )
+        cls.author = CustomUser.objects.create_user(
+            username='author', email='author@example.com', password='x',
+            first_name='Анна "Шеф"', last_name='О\'Нил',
+            avatar=AVATAR, avatar_variants=variants(AVATAR, 'avatar')
+        )
+        cls.stale_author = CustomUser.objects.create_user(
+            username='stale', email='stale@example.com', password='x',
+            first_name='Без', last_name='Аватара',
+            avatar_variants=variants('avatar/old.png', 'avatar')
+        )
+        tags = Tag.objects.bulk_create([
+            Tag(name=name, slug=slug)
+            for name, slug in (('Ужин', 'dinner'), ('Завтрак', 'breakfast'))
+        ])
+        ingredients = Ingredient.objects.bulk_create([
+            Ingredient(name=name, measurement_unit=unit)
+            for name, unit in (
+                ('яйца', 'шт'), ('мука', 'г'), ('молоко', 'мл')
+            )
+        ])
+        texts = (
+            'Простой текст',
+            'Кавычки " и \\ обратная косая, эмодзи 🍲',
+            'Разделители \u2028 строк \u2029 и\nперевод строки',
+        )
+        for number, text in enumerate(texts):
+            for author in (cls.author, cls.stale_author):
+                recipe = Recipe.objects.create(
+                    name=f'Рецепт {number}', text=text, author=author,
+                    cooking_time=number + 1, image=IMAGE,
+                    image_variants=(
+                        variants(IMAGE, 'card') if number % 2 else {}
+                    )
+                )
+                recipe.tags.set(tags[:number % 2 + 1])
+                IngredientRecipe.objects.bulk_create([
+                    IngredientRecipe(
+                        recipe=recipe, ingredient=ingredient,
+                        amount=number * 10 + position
+                    )
+                    for position, ingredient in enumerate(
+                        reversed(ingredients[:number + 1])
+                    )
+                ])
+        Recipe.objects.create(
+            name='Без тегов', text='Пусто', author=cls.author,
+            cooking_time=5, image=IMAGE
+        )
+        first = Recipe.objects.order_by('id').first()
+        Favorite.objects.create(user=cls.reader, recipe=first)
+        ShoppingCart.objects.create(user=cls.reader, recipe=first)
+        Subscription.objects.create(user=cls.reader, author=cls.author)
+
+    def make_request(self, user=None):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        if user is not None:
+            request.user = user
+        return request
+
+    def expected(self, request):
+        queryset = Recipe.objects.select_related('author').prefetch_related(
+            ingredients_prefetch(), 'tags'
+        ).with_user_flags(request.user)
+        return RecipeGetSerializer(
+            queryset, many=True, context={'request': request}
+        ).data
+
+    def actual(self, request):
+        rows = list(
+            Recipe.objects.with_user_flags(request.user).values(
+                *RECIPE_FIELDS
+            )
+        )
+        return serialize_recipes(rows, request)
+
+    def test_anonymous_matches_serializer(self):
+        request = self.make_request()
+        self.assertEqual(self.actual(request), self.expected(request))
+
+    def test_authenticated_matches_serializer(self):
+        request = self.make_request(self.reader)
+        actual = self.actual(request)
+        self.assertEqual(actual, self.expected(request))
+        flagged = [
+            recipe for recipe in actual
+            if recipe['is_favorited'] and recipe['is_in_shopping_cart']
+        ]
+        self.assertEqual(len(flagged), 1)
+        self.assertTrue(any(
+            recipe['author']['is_subscribed'] for recipe in actual
+        ))
+
+    def test_rendered_bytes_match(self):
+        request = self.make_request(self.reader)
+        data = {'count': 1, 'next': None, 'results': self.actual(request)}
+        self.assertEqual(
+            FastJSONRenderer().render(data), JSONRenderer().render(data)
+        )
+
+    def test_numeric_keys_match_json_renderer(self):
+        errors = {'ingredients': {0: ['Введите правильное число.']}}
+        self.assertEqual(
+            FastJSONRenderer().render(errors), JSONRenderer().render(errors)
+        )
+
+    def test_unknown_types_fall_back_to_json_renderer(self):
+        data = {'detail': gettext_lazy('Not found.'), 'total': Decimal('1.5')}
+        self.assertEqual(
+            FastJSONRenderer().render(data), JSONRenderer().render(data)
+        )
+
+    def test_indented_output_falls_back_to_json_renderer(self):
+        data = {'results': self.actual(self.make_request())}
+        media_type = 'application/json; indent=2'
+        self.assertEqual(
+            FastJSONRenderer().render(data, media_type),
+            JSONRenderer().render(data, media_type)
+        )
+
+    def test_list_endpoint_matches_serializer(self):
+        client = APIClient()
+        client.force_authenticate(self.reader)
+        response = client.get('/api/recipes/?limit=3&page=2')
+        request = self.make_request(self.reader)
+        self.assertEqual(
+            response.json()['results'], self.expected(request)[3:6]
+        )
+
+    def test_cursor_pages_cover_all_recipes(self):
+        client = APIClient()
+        url = '/api/recipes/?limit=3&cursor='
+        seen = []
+        while url:
+            page = client.get(url).json()
+            seen.extend(recipe['id'] for recipe in page['results'])
+            url = page['next']
+        self.assertEqual(
+            seen, [recipe['id'] for recipe in self.actual(
+                self.make_request()
+            )]
+        )
+
+    def test_cursor_pages_with_equal_dates(self):
+        """Рецепты с одинаковой датой, один из которых удален между
+        запросами, не пропускаются и не повторяются."""
+        Recipe.objects.update(pub_date=Recipe.objects.first().pub_date)
+        expected = list(Recipe.objects.order_by(
+            '-pub_date', '-id'
+        ).values_list('id', flat=True))
+        client = APIClient()
+        first = client.get('/api/recipes/?limit=2&cursor=').json()
+        Recipe.objects.filter(pk=first['results'][0]['id']).delete()
+        seen = [recipe['id'] for recipe in first['results']]
+        url = first['next']
+        while url:
+            page = client.get(url).json()
+            seen.extend(recipe['id'] for recipe in page['results'])
+            url = page['next']
+        self.assertEqual(seen, expected)
+        previous = client.get(page['previous']).json()
+        self.assertEqual(
+            [recipe['id'] for recipe in previous['results']],
+            expected[-len(page['results']) - 2:-len(page['results'])]
+        )
@@ -0,0 +1,109 @@
+import csv
+import json
+from io import StringIO
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.tests.utils import create_recipe, create_user
+from recipes.models import (
+    Ingredient,
+    IngredientRecipe,
+    ShoppingCart
+)
+
+URL = '/api/recipes/download_shopping_cart/'
+
+
+class ShoppingListTests(TestCase):
+    """Список покупок суммирует ингредиенты рецептов из корзины
+    и одинаково выглядит во всех форматах."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.other = map(create_user, ('user', 'other'))
+        flour, milk, salt, sugar = Ingredient.objects.bulk_create([
+            Ingredient(name=name, measurement_unit=unit)
+            for name, unit in (
+                ('мука', 'г'), ('молоко', 'мл'), ('соль, "морская"', 'г'),
+                ('сахар', 'г'),
+            )
+        ])
+        amounts = (
+            ((flour, 200), (milk, 300), (salt, 5)),
+            ((flour, 100), (salt, 2)),
+            ((sugar, 50),),
+        )
+        recipes = []
+        for number, rows in enumerate(amounts):
+            recipe = create_recipe(cls.other, f'Рецепт {number}')
+            IngredientRecipe.objects.bulk_create([
+                IngredientRecipe(
+                    recipe=recipe, ingredient=ingredient, amount=amount
+                )
+                for ingredient, amount in rows
+            ])
+            recipes.append(recipe)
+        ShoppingCart.objects.create(user=cls.user, recipe=recipes[0])
+        ShoppingCart.objects.create(user=cls.user, recipe=recipes[1])
+        ShoppingCart.objects.create(user=cls.other, recipe=recipes[2])
+        cls.expected = [
+            ('молоко', 'мл', 300),
+            ('мука', 'г', 300),
+            ('соль, "морская"', 'г', 7),
+        ]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def download(self, file_format):
+        response = self.client.get(URL, {'file_format': file_format})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response['Content-Disposition'],
+            f'attachment; filename="shopping_list.{file_format}"'
+        )
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_txt(self):
+        response, content = self.download('txt')
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertEqual(content, 'Список покупок:\n' + ''.join(
+            f'{name} ({unit}) - {amount}\n'
+            for name, unit, amount in self.expected
+        ))
+        self.assertEqual(
+            self.client.get(URL).getvalue().decode(), content
+        )
+
+    def test_csv(self):
+        response, content = self.download('csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(StringIO(content)))
+        self.assertEqual(
+            rows[0], ['Ингредиент', 'Единица измерения', 'Количество']
+        )
+        self.assertEqual(
+            rows[1:],
+            [[name, unit, str(amount)] for name, unit, amount in self.expected]
+        )
+
+    def test_json(self):
+        response, content = self.download('json')
+        self.assertEqual(
+            response['Content-Type'], 'application/json; charset=utf-8'
+        )
+        self.assertEqual(json.loads(content), [
+            {'name': name, 'measurement_unit': unit, 'amount': amount}
+            for name, unit, amount in self.expected
+        ])
+
+    def test_empty_cart(self):
+        ShoppingCart.objects.filter(user=self.user).delete()
+        self.assertEqual(json.loads(self.download('json')[1]), [])
+        self.assertEqual(self.download('txt')[1], 'Список покупок:\n')
+
+    def test_unknown_format(self):
+        response = self.client.get(URL, {'file_format': 'pdf'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,99 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from api import short_links
+from api.short_links import MAX_CODE_LENGTH, decode, encode, resolve
+from api.tests.utils import create_recipe, create_user
+from recipes.models import Recipe
+
+
+class ShortLinkCodeTests(TestCase):
+
+    def test_encode_decode_round_trip(self):
+        for recipe_id in (0, 1, 61, 62, 3843, 3844, 2 ** 63 - 1):
+            with self.subTest(recipe_id=recipe_id):
+                code = encode(recipe_id)
+                self.assertLessEqual(len(code), MAX_CODE_LENGTH)
+                self.assertEqual(decode(code), recipe_id)
+        self.assertEqual(encode(61), 'Z')
+        self.assertEqual(encode(62), '10')
+
+    def test_invalid_codes(self):
+        for code in ('', 'abc-d', 'код', 'z' * (MAX_CODE_LENGTH + 1)):
+            with self.subTest(code=code):
+                self.assertIsNone(decode(code))
+
+
+class ShortLinkResolveTests(TestCase):
+    """Найденные рецепты запоминаются в процессе, отрицательный
+    результат — только в общем кеше."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+
+    def setUp(self):
+        cache.clear()
+        short_links._resolved.clear()
+
+    def create_recipe(self):
+        return create_recipe(self.author)
+
+    def test_resolve_uses_cache(self):
+        recipe = self.create_recipe()
+        code = encode(recipe.id)
+        self.assertEqual(resolve(code), recipe.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve(code), recipe.id)
+        self.assertIsNone(resolve('!'))
+
+    def test_found_recipes_are_kept_in_process(self):
+        recipe = self.create_recipe()
+        code = encode(recipe.id)
+        self.assertEqual(resolve(code), recipe.id)
+        cache.clear()
+        with self.assertNumQueries(0), mock.patch.object(
+            cache, 'get', side_effect=AssertionError
+        ):
+            self.assertEqual(resolve(code), recipe.id)
+
+    def test_missing_recipes_are_not_kept_in_process(self):
+        code = encode(self.create_recipe().id + 1)
+        self.assertIsNone(resolve(code))
+        self.assertFalse(short_links._resolved)
+
+    def test_local_cache_is_bounded(self):
+        recipes = [self.create_recipe() for _ in range(3)]
+        with mock.patch.object(short_links, 'LOCAL_CACHE_SIZE', 2):
+            for recipe in recipes:
+                resolve(encode(recipe.id))
+            resolve(encode(recipes[1].id))
+            resolve(encode(recipes[2].id))
+        self.assertEqual(
+            list(short_links._resolved), [recipes[1].id, recipes[2].id]
+        )
+
+    def test_deleted_recipe_is_forgotten_on_commit(self):
+        recipe = self.create_recipe()
+        recipe_id = recipe.id
+        code = encode(recipe_id)
+        self.assertEqual(resolve(code), recipe_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+            self.assertEqual(resolve(code), recipe_id)
+        self.assertIsNone(resolve(code))
+        response = self.client.get(f'/s/{code}')
+        self.assertEqual(response.status_code, 404)
+
+    def test_created_recipe_replaces_negative_result(self):
+        missing = Recipe.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first() or 0
+        code = encode(missing + 1)
+        self.assertIsNone(resolve(code))
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = self.create_recipe()
+        self.assertEqual(recipe.id, missing + 1)
+        self.assertEqual(resolve(code), recipe.id)
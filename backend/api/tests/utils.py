@@ -0,0 +1,60 @@
+import base64
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from recipes.models import Recipe
+from users.models import CustomUser
+
+IMAGE = 'recipes/images/dish.png'
+
+
+def image_data(size=8):
+    """PNG в виде data URI, как его присылает фронтенд."""
+    buffer = BytesIO()
+    Image.new('RGB', (size, size), 'green').save(buffer, 'PNG')
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/png;base64,{encoded}'
+
+
+def create_user(username, password='x', **fields):
+    return CustomUser.objects.create_user(
+        username=username, email=f'{username}@example.com',
+        password=password,
+        **{'first_name': 'Имя', 'last_name': 'Фамилия', **fields}
+    )
+
+
+def create_recipe(author, name='Рецепт', **fields):
+    """Рецепт с уже готовыми копиями изображения, чтобы тесты
+    не зависели от файлов и фоновой обработки."""
+    return Recipe.objects.create(
+        name=name, author=author,
+        **{
+            'text': 'Описание',
+            'cooking_time': 5,
+            'image': IMAGE,
+            'image_variants': {'source': IMAGE, 'sizes': {}},
+            **fields,
+        }
+    )
+
+
+class MediaTestCase(TestCase):
+    """Файлы тестов класса пишутся во временный MEDIA_ROOT, который
+    удаляется после них. Копии изображений строятся сразу после
+    коммита, без фонового пула."""
+
+    @classmethod
+    def setUpClass(cls):
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media_settings = override_settings(
+            MEDIA_ROOT=media_root, IMAGE_VARIANTS_ASYNC=False
+        )
+        media_settings.enable()
+        cls.addClassCleanup(media_settings.disable)
+        super().setUpClass()
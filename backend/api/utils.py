@@ -1,7 +1,12 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from rest_framework.response import Response
 from rest_framework import status
 
+from api.counters import deferred_counters, refresh_counters
+from api.feed import add_authors, rebuild_feeds
 from recipes.models import Recipe, Subscription
 
 
@@ -41,3 +46,114 @@ def delete_object(request, pk, main_model, relation_model):
 
     obj_to_delete.delete()
     return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def create_objects(user, ids, target_model, relation_model, field):
+    """
+    Создает связи пользователя сразу с несколькими объектами:
+    одна проверка существования, один bulk_create и пересчет счетчиков.
+    Возвращает статус для каждого переданного id.
+    """
+    ids = list(dict.fromkeys(ids))
+    invalid = {user.id} if relation_model is Subscription else set()
+    found = set(target_model.objects.filter(id__in=ids).values_list(
+        'id', flat=True
+    )) - invalid
+    existing = set(relation_model.objects.filter(
+        user=user, **{f'{field}_id__in': found}
+    ).values_list(f'{field}_id', flat=True))
+    added = found - existing
+    with transaction.atomic():
+        relation_model.objects.bulk_create(
+            [
+                relation_model(user=user, **{f'{field}_id': pk})
+                for pk in added
+            ],
+            ignore_conflicts=True
+        )
+        refresh_counters(relation_model, added)
+        if relation_model is Subscription and added:
+            add_authors(user.id, added)
+    statuses = {pk: 'added' for pk in added}
+    statuses.update({pk: 'exists' for pk in existing})
+    statuses.update({pk: 'invalid' for pk in invalid})
+    return [
+        {'id': pk, 'status': statuses.get(pk, 'not_found')} for pk in ids
+    ]
+
+
+def delete_objects(user, ids, relation_model, field):
+    """
+    Удаляет связи пользователя с несколькими объектами одним запросом.
+    Счетчики пересчитываются один раз, а не на каждую удаленную связь.
+    """
+    ids = list(dict.fromkeys(ids))
+    with transaction.atomic(), deferred_counters():
+        relations = relation_model.objects.filter(
+            user=user, **{f'{field}_id__in': ids}
+        )
+        removed = set(relations.values_list(f'{field}_id', flat=True))
+        relations.delete()
+        refresh_counters(relation_model, removed)
+        if relation_model is Subscription and removed:
+            rebuild_feeds([user.id])
+    return [
+        {'id': pk, 'status': 'removed' if pk in removed else 'absent'}
+        for pk in ids
+    ]
+
+
+def get_subscribed_author_ids(request):
+    """
+    Возвращает множество id авторов, на которых подписан пользователь.
+    Загружается одним запросом и кешируется на время обработки запроса.
+    """
+    if not hasattr(request, '_subscribed_author_ids'):
+        request._subscribed_author_ids = set(
+            Subscription.objects.filter(
+                user=request.user
+            ).values_list('author_id', flat=True)
+        )
+    return request._subscribed_author_ids
+
+
+async def aload_subscribed_author_ids(request):
+    """Заранее загружает подписки через асинхронный ORM, чтобы
+    сериализаторы в асинхронных view не обращались к базе."""
+    request._subscribed_author_ids = {
+        author_id async for author_id in Subscription.objects.filter(
+            user=request.user
+        ).values_list('author_id', flat=True)
+    }
+
+
+def get_recipes_limit(request):
+    """
+    Возвращает ограничение на количество рецептов автора
+    из параметра `recipes_limit` или None, если ограничения нет.
+    """
+    recipes_limit = request.query_params.get(
+        'recipes_limit', str(settings.REST_FRAMEWORK['PAGE_SIZE'])
+    )
+    if recipes_limit.isdigit():
+        return int(recipes_limit)
+    return None
+
+
+def get_version(key):
+    """Возвращает номер версии данных из общего кеша."""
+    return cache.get(key, 0)
+
+
+def bump_version(key):
+    """
+    Увеличивает номер версии данных в общем кеше,
+    чтобы все процессы перестроили свои копии.
+    """
+    if cache.add(key, 1, timeout=None):
+        return 1
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+        return 1
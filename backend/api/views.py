@@ -1,9 +1,17 @@
-from django.db.models import Sum, Count
+from django.db.models import F, Prefetch
 from django_filters.rest_framework import DjangoFilterBackend
-from django.shortcuts import HttpResponse
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponsePermanentRedirect,
+    StreamingHttpResponse
+)
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.contrib.auth import get_user_model
 from rest_framework import status, viewsets, permissions
 from rest_framework.decorators import action
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from djoser.views import UserViewSet
 
@@ -15,12 +23,43 @@ from recipes.models import (
     Favorite,
     Subscription
 )
-from api.pagination import PageLimitPagination
-from api.utils import create_object, delete_object
+from api.pagination import (
+    PageLimitPagination,
+    RecipePagination,
+    SubscriptionPagination
+)
+from api.utils import (
+    create_object,
+    create_objects,
+    delete_object,
+    delete_objects,
+    get_recipes_limit
+)
+from api.catalog import get_snapshot
+from api.feed import feed_recipe_ids
 from api.filters import RecipeFilter
+from api.images import drop_variants
+from api.metrics import render_metrics
+from api.ingredient_search import (
+    DEFAULT_LIMIT,
+    MAX_LIMIT,
+    get_ingredient_index
+)
+from api.pantry import get_pantry_index
+from api.shopping_list import RENDERERS, get_shopping_list
 from api.permissions import IsOwnerOrReadOnly
+from api.db_router import read_from_primary
+from api.recipe_cache import cache_recipe, get_cached_recipe, personalize
+from api.recipe_rows import (
+    RECIPE_FIELDS,
+    FastJSONRenderer,
+    ingredients_prefetch,
+    serialize_recipes
+)
+from api.short_links import encode, resolve
 from api.serializers import (
     AvatarSerializer,
+    BatchSerializer,
     TagSerializer,
     ProfileSerializer,
     IngredientSerializer,
@@ -28,6 +67,7 @@ from api.serializers import (
     RecipeSerializer,
     RecipeFavoriteSerializer,
     FavoriteSerializer,
+    PantrySerializer,
     ShoppingCartSerializer,
     SubscriptionReadSerializer,
     SubscriptionSerializer
@@ -35,6 +75,44 @@ from api.serializers import (
 
 CustomUser = get_user_model()
 
+SHORT_LINK_MAX_AGE = 60 * 60 * 24
+
+
+def batch_response(request, target_model, relation_model, field):
+    """Добавляет или удаляет связи текущего пользователя
+    со списком объектов из тела запроса."""
+    serializer = BatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    ids = serializer.validated_data['ids']
+    if request.method == 'POST':
+        results = create_objects(
+            request.user, ids, target_model, relation_model, field
+        )
+    else:
+        results = delete_objects(request.user, ids, relation_model, field)
+    return Response({'results': results}, status=status.HTTP_200_OK)
+
+
+def short_link_response(recipe_id):
+    if recipe_id is None:
+        raise Http404('Рецепт не найден.')
+    response = HttpResponsePermanentRedirect(f'/recipes/{recipe_id}')
+    response['Cache-Control'] = f'public, max-age={SHORT_LINK_MAX_AGE}'
+    return response
+
+
+def short_link_redirect(request, code):
+    """Перенаправляет короткую ссылку на страницу рецепта.
+    Ответ не зависит от пользователя и может кешироваться прокси."""
+    return short_link_response(resolve(code))
+
+
+def metrics(request):
+    """Метрики запросов в формате Prometheus. Nginx этот адрес
+    не проксирует: он доступен только внутри сети docker."""
+    content, content_type = render_metrics()
+    return HttpResponse(content, content_type=content_type)
+
 
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
     """Контроллер для работы с тегами,
@@ -44,6 +122,13 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
     permission_classes = [permissions.AllowAny]
 
+    def list(self, request, *args, **kwargs):
+        """Без фильтра отдает заранее сериализованный справочник тегов
+        с поддержкой ETag и сжатия."""
+        if request.query_params.get('name'):
+            return super().list(request, *args, **kwargs)
+        return get_snapshot('tags').as_response(request)
+
     def get_queryset(self):
         """Позволяет выполнять фильтрацию тегов по части названия,
         если передан параметр 'name'.
@@ -63,21 +148,26 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
     permission_classes = [IsOwnerOrReadOnly]
 
-    def get_queryset(self):
-        """Возвращает список ингредиентов с возможностью фильтрации
-        по названию, если указан параметр 'name'.
+    def list(self, request, *args, **kwargs):
+        """Возвращает список ингредиентов. Если указан параметр 'name',
+        ищет по индексу в памяти процесса и возвращает до `limit`
+        наиболее подходящих ингредиентов без обращения к базе,
+        иначе отдает заранее сериализованный справочник.
         """
-        queryset = Ingredient.objects.all()
-        ingredients = self.request.query_params.get('name')
-        if ingredients is not None:
-            queryset = queryset.filter(name__istartswith=ingredients)
-        return queryset
+        name = request.query_params.get('name')
+        if not name:
+            return get_snapshot('ingredients').as_response(request)
+        limit = request.query_params.get('limit', '')
+        limit = (
+            min(int(limit), MAX_LIMIT) if limit.isdigit() else DEFAULT_LIMIT
+        )
+        return Response(get_ingredient_index().search(name, limit))
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
     """Контроллер для взаимодействия с рецептами,
     поддерживает полные CRUD-операции."""
-    pagination_class = PageLimitPagination
+    pagination_class = RecipePagination
     permission_classes = [
         IsOwnerOrReadOnly,
         permissions.IsAuthenticatedOrReadOnly
@@ -86,12 +176,101 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filterset_class = RecipeFilter
 
     def get_queryset(self):
-        """Подготавливает набор данных с предзагрузкой тегов и ингредиентов
-        для оптимизации запросов.
+        """Подготавливает набор данных с предзагрузкой автора, тегов
+        и ингредиентов, а также с признаками избранного и корзины
+        для текущего пользователя. Изменяющим запросам теги
+        и ингредиенты не нужны: ответ на них собирает RecipeSerializer.
+        """
+        queryset = Recipe.objects.select_related('author').with_user_flags(
+            self.request.user
+        )
+        if self.request.method in permissions.SAFE_METHODS:
+            queryset = queryset.prefetch_related(
+                ingredients_prefetch(), 'tags'
+            )
+        return queryset
+
+    def get_renderers(self):
+        """Списки рецептов рендерятся в JSON через orjson."""
+        renderers = super().get_renderers()
+        if self.action not in ('list', 'feed', 'cook'):
+            return renderers
+        return [
+            FastJSONRenderer() if type(renderer) is JSONRenderer else renderer
+            for renderer in renderers
+        ]
+
+    def list(self, request, *args, **kwargs):
+        """Отдает страницу рецептов, собранную из строк values()
+        без моделей и сериализаторов DRF.
         """
-        return Recipe.objects.prefetch_related(
-            'amount_ingredients__ingredient', 'tags'
-        ).all()
+        queryset = self.filter_queryset(
+            Recipe.objects.with_user_flags(request.user)
+        ).values(*RECIPE_FIELDS)
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(serialize_recipes(page, request))
+
+    @action(
+        detail=False,
+        permission_classes=[permissions.IsAuthenticated],
+        pagination_class=PageLimitPagination
+    )
+    def feed(self, request):
+        """Лента рецептов авторов, на которых подписан пользователь.
+        Страница выбирается из заранее собранной ленты."""
+        page = self.paginate_queryset(feed_recipe_ids(request.user))
+        positions = {pk: number for number, pk in enumerate(page)}
+        rows = sorted(
+            Recipe.objects.with_user_flags(request.user).filter(
+                id__in=positions
+            ).values(*RECIPE_FIELDS),
+            key=lambda row: positions[row['id']]
+        )
+        return self.get_paginated_response(serialize_recipes(rows, request))
+
+    @action(
+        detail=False,
+        permission_classes=[permissions.AllowAny],
+        pagination_class=PageLimitPagination
+    )
+    def cook(self, request):
+        """Рецепты, которые можно приготовить из перечисленных
+        ингредиентов, по убыванию доли уже имеющихся ингредиентов."""
+        serializer = PantrySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        page = self.paginate_queryset(get_pantry_index().search(
+            params['ingredients'], params['mode'], params['missing']
+        ))
+        matches = {
+            recipe_id: (position, matched, size)
+            for position, (recipe_id, matched, size) in enumerate(page)
+        }
+        rows = sorted(
+            Recipe.objects.with_user_flags(request.user).filter(
+                id__in=matches
+            ).values(*RECIPE_FIELDS),
+            key=lambda row: matches[row['id']]
+        )
+        recipes = serialize_recipes(rows, request)
+        for recipe in recipes:
+            _, matched, size = matches[recipe['id']]
+            recipe['matched_ingredients'] = matched
+            recipe['missing_ingredients'] = size - matched
+        return self.get_paginated_response(recipes)
+
+    def retrieve(self, request, *args, **kwargs):
+        """Отдает рецепт из кеша, подставляя признаки текущего
+        пользователя. При промахе собирает рецепт из основной базы
+        и кеширует его.
+        """
+        data = get_cached_recipe(kwargs['pk'])
+        if data is not None:
+            return Response(personalize(data, request))
+        with read_from_primary():
+            response = super().retrieve(request, *args, **kwargs)
+        cache_recipe(response.data)
+        return response
 
     def perform_create(self, serializer):
         """Сохраняет рецепт,
@@ -170,6 +349,28 @@ class RecipeViewSet(viewsets.ModelViewSet):
         delete_object(request, pk, Recipe, ShoppingCart)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='favorite/batch',
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def favorite_batch(self, request):
+        """Добавляет в избранное или удаляет из него
+        несколько рецептов за один запрос."""
+        return batch_response(request, Recipe, Favorite, 'recipe')
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='shopping_cart/batch',
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def shopping_cart_batch(self, request):
+        """Добавляет в корзину или удаляет из нее
+        несколько рецептов за один запрос."""
+        return batch_response(request, Recipe, ShoppingCart, 'recipe')
+
     @action(
         detail=False,
         methods=['get'],
@@ -178,27 +379,23 @@ class RecipeViewSet(viewsets.ModelViewSet):
     def download_shopping_cart(self, request):
         """Генерирует файл со списком покупок на основе рецептов,
         добавленных в корзину.
+        Формат задается параметром `file_format`: txt (по умолчанию),
+        csv или json. Файл отдается потоком по мере чтения из базы.
         """
-        ingredient_lst = ShoppingCart.objects.filter(
-            user=request.user
-        ).values_list(
-            'recipe__ingredients__name',
-            'recipe__ingredients__measurement_unit',
-            Sum('recipe__amount_ingredients__amount')
-        )
-
-        shopping_list = ['Список покупок:']
-        ingredient_lst = set(ingredient_lst)
-
-        for ingredient in ingredient_lst:
-            shopping_list.append('{} ({}) - {}'.format(*ingredient))
+        file_format = request.query_params.get('file_format', 'txt')
+        if file_format not in RENDERERS:
+            return Response(
+                {'detail': 'Неподдерживаемый формат файла.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        response = HttpResponse(
-            '\n'.join(shopping_list),
-            content_type='text/plain'
+        render, content_type = RENDERERS[file_format]
+        response = StreamingHttpResponse(
+            render(get_shopping_list(request.user)),
+            content_type=content_type
         )
         response['Content-Disposition'] = (
-            'attachment; filename="shopping_list.txt"'
+            f'attachment; filename="shopping_list.{file_format}"'
         )
         return response
 
@@ -207,10 +404,9 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """
         Возвращает короткую ссылку на рецепт.
         """
-        recipe = self.get_object()
-        short_link = (
-            f'{self.request.build_absolute_uri().rstrip("/")}/'
-            f'{recipe.id}-shortlink'
+        recipe = get_object_or_404(Recipe.objects.only('id'), pk=pk)
+        short_link = request.build_absolute_uri(
+            reverse('short-link', args=[encode(recipe.id)])
         )
 
         return Response(
@@ -273,22 +469,45 @@ class CustomUserViewSet(UserViewSet):
         delete_object(request, id, CustomUser, Subscription)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='subscribe/batch',
+        permission_classes=[permissions.IsAuthenticated])
+    def subscribe_batch(self, request):
+        """Подписывает на нескольких авторов или отписывает от них
+        за один запрос."""
+        return batch_response(request, CustomUser, Subscription, 'author')
+
     @action(
         detail=False,
         permission_classes=[permissions.IsAuthenticated],
+        pagination_class=SubscriptionPagination,
         methods=['get'])
     def subscriptions(self, request):
         """
         Возвращает список всех авторов,
         на которых подписан текущий пользователь,
-        с учетом параметра `limit`.
+        с учетом параметров `limit` и `cursor`.
+        Рецепты всех авторов страницы загружаются одним запросом:
+        срез в Prefetch Django выполняет через оконную функцию
+        ROW_NUMBER() с разбиением по автору.
         """
         user = request.user
 
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'image_variants', 'cooking_time', 'author'
+        )
+        recipes_limit = get_recipes_limit(request)
+        if recipes_limit is not None:
+            recipes = recipes[:recipes_limit]
+
         authors = CustomUser.objects.filter(
             subscribing__user=user
         ).annotate(
-            recipes_count=Count('recipes')
+            subscription_id=F('subscribing__id')
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
         )
 
         page = self.paginate_queryset(authors)
@@ -321,12 +540,15 @@ class CustomUserViewSet(UserViewSet):
 
         if request.method == 'DELETE':
             if user.avatar:
-                user.avatar.delete()
+                user.avatar.delete(save=False)
+                drop_variants(user, 'avatar')
+                user.save(update_fields=('avatar', 'avatar_variants'))
             return Response(status=status.HTTP_204_NO_CONTENT)
 
         serializer = AvatarSerializer(user, data=request.data)
         serializer.is_valid(raise_exception=True)
         file = serializer.validated_data['avatar']
-        user.avatar.save(file.name, content=file)
+        user.avatar.save(file.name, content=file, save=False)
+        user.save(update_fields=('avatar',))
 
         return Response(serializer.data)
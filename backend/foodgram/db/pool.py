@@ -0,0 +1,283 @@
+"""
+Пул соединений с базой для одного процесса.
+
+Django держит отдельное соединение на каждый поток и с CONN_MAX_AGE=0
+закрывает его после каждого запроса. Бэкенды из foodgram.db вместо
+закрытия возвращают соединение в пул, а новое берут из него.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from api.metrics import observe_pool
+
+DEFAULTS = {
+    'SIZE': 5,
+    'MAX_OVERFLOW': 5,
+    'TIMEOUT': 10.0,
+    'RECYCLE': 1800,
+    'PRE_PING': True,
+}
+
+
+class PoolTimeout(Exception):
+    """Все соединения заняты дольше TIMEOUT секунд."""
+
+
+class ConnectionPool:
+    """
+    Пул на SIZE постоянных соединений, сверх которых открывается
+    до MAX_OVERFLOW временных: они закрываются при возврате.
+    Перед выдачей соединение проверяется ping, соединения старше
+    RECYCLE секунд и сломанные заменяются новыми.
+    """
+
+    def __init__(
+        self, connect, ping, size, max_overflow, timeout, recycle,
+        pre_ping=True
+    ):
+        self.connect = connect
+        self.ping = ping
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.idle = deque()
+        self.born = {}
+        self.opened = 0
+        self.checked_out = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.timeouts = 0
+        self.created = 0
+        self.discarded = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        while True:
+            connection = self.reserve()
+            if connection is None:
+                return self.open()
+            if self.is_healthy(connection):
+                return connection
+            self.discard(connection)
+
+    def reserve(self):
+        """Берет свободное соединение или место под новое.
+        None означает, что соединение нужно открыть."""
+        with self.condition:
+            started = None
+            while True:
+                if self.idle:
+                    connection = self.idle.pop()
+                    break
+                if self.opened < self.size + self.max_overflow:
+                    self.opened += 1
+                    connection = None
+                    break
+                if started is None:
+                    started = time.monotonic()
+                    self.waits += 1
+                remaining = self.timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self.timeouts += 1
+                    self.wait_time += time.monotonic() - started
+                    raise PoolTimeout(
+                        f'Нет свободных соединений за {self.timeout} с '
+                        f'(size={self.size}, '
+                        f'max_overflow={self.max_overflow}).'
+                    )
+                self.condition.wait(remaining)
+            if started is not None:
+                self.wait_time += time.monotonic() - started
+            self.checked_out += 1
+            return connection
+
+    def open(self):
+        try:
+            connection = self.connect()
+        except BaseException:
+            with self.condition:
+                self.opened -= 1
+                self.checked_out -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.born[id(connection)] = time.monotonic()
+            self.created += 1
+        return connection
+
+    def is_healthy(self, connection):
+        born = self.born.get(id(connection), 0)
+        if self.recycle and time.monotonic() - born > self.recycle:
+            return False
+        if not self.pre_ping:
+            return True
+        try:
+            self.ping(connection)
+        except Exception:
+            return False
+        return True
+
+    def release(self, connection, broken=False):
+        """Возвращает соединение. Незавершенная транзакция откатывается,
+        лишние сверх SIZE и сломанные соединения закрываются."""
+        if not broken:
+            try:
+                connection.rollback()
+            except Exception:
+                broken = True
+        with self.condition:
+            if broken or len(self.idle) >= self.size:
+                self.checked_out -= 1
+                self.condition.notify()
+            else:
+                self.idle.append(connection)
+                self.checked_out -= 1
+                self.condition.notify()
+                return
+        self.discard(connection, checked_out=False)
+
+    def discard(self, connection, checked_out=True):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self.condition:
+            self.born.pop(id(connection), None)
+            self.opened -= 1
+            self.discarded += 1
+            if checked_out:
+                self.checked_out -= 1
+            self.condition.notify()
+
+    def dispose(self):
+        """Закрывает все свободные соединения."""
+        with self.condition:
+            idle = list(self.idle)
+            self.idle.clear()
+        for connection in idle:
+            self.discard(connection, checked_out=False)
+
+    def stats(self):
+        with self.condition:
+            return {
+                'size': self.size,
+                'max_overflow': self.max_overflow,
+                'opened': self.opened,
+                'idle': len(self.idle),
+                'checked_out': self.checked_out,
+                'waits': self.waits,
+                'wait_time': round(self.wait_time, 6),
+                'timeouts': self.timeouts,
+                'created': self.created,
+                'discarded': self.discarded,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pid = os.getpid()
+
+
+def get_pool(key, connect, ping, options):
+    """Пул процесса для набора параметров соединения. После fork
+    (gunicorn --preload) пулы родителя не наследуются."""
+    global _pid
+    with _pools_lock:
+        if os.getpid() != _pid:
+            _pools.clear()
+            _pid = os.getpid()
+        pool = _pools.get(key)
+        if pool is None:
+            options = {**DEFAULTS, **options}
+            pool = _pools[key] = ConnectionPool(
+                connect, ping,
+                size=options['SIZE'],
+                max_overflow=options['MAX_OVERFLOW'],
+                timeout=options['TIMEOUT'],
+                recycle=options['RECYCLE'],
+                pre_ping=options['PRE_PING'],
+            )
+        return pool
+
+
+def close_pools(alias=None):
+    with _pools_lock:
+        pools = [
+            pool for key, pool in _pools.items()
+            if alias is None or key[0] == alias
+        ]
+    for pool in pools:
+        pool.dispose()
+
+
+def pool_stats():
+    """Статистика пулов текущего процесса по алиасам баз."""
+    with _pools_lock:
+        items = list(_pools.items())
+    stats = {}
+    for (alias, _), pool in items:
+        stats.setdefault(alias, []).append(pool.stats())
+    return stats
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Подмешивается к DatabaseWrapper бэкенда. Настройки пула берутся
+    из ключа POOL в DATABASES; CONN_MAX_AGE должен быть 0, чтобы
+    соединение возвращалось в пул в конце каждого запроса.
+    """
+
+    def get_pool(self, conn_params):
+        key = (
+            self.alias,
+            tuple(sorted((name, repr(value))
+                         for name, value in conn_params.items()))
+        )
+        return get_pool(
+            key,
+            lambda: super(
+                PooledDatabaseWrapperMixin, self
+            ).get_new_connection(conn_params),
+            self.ping,
+            self.settings_dict.get('POOL', {})
+        )
+
+    def get_new_connection(self, conn_params):
+        self.pool = self.get_pool(conn_params)
+        try:
+            return self.pool.acquire()
+        except PoolTimeout as error:
+            raise self.Database.OperationalError(str(error)) from error
+        finally:
+            observe_pool(self.alias, self.pool.stats())
+
+    def ping(self, connection):
+        cursor = connection.cursor()
+        try:
+            cursor.execute('SELECT 1')
+        finally:
+            cursor.close()
+
+    def _close(self):
+        if self.connection is None:
+            return
+        # До закрытия Django уже проверил is_usable, поэтому
+        # errors_occurred здесь означает сломанное соединение.
+        # Закрытое внутри atomic соединение тоже в пул не возвращается.
+        self.pool.release(
+            self.connection,
+            broken=self.errors_occurred or self.in_atomic_block
+        )
+        observe_pool(self.alias, self.pool.stats())
+
+
+class PooledCreationMixin:
+    """Перед удалением тестовой базы закрывает ее соединения в пуле."""
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pools(self.connection.alias)
+        super()._destroy_test_db(test_database_name, verbosity)
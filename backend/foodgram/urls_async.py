@@ -0,0 +1,28 @@
+"""
+Маршруты для ASGI: чтение рецептов, тегов, ингредиентов и короткие
+ссылки обслуживают асинхронные view, остальное — обычные маршруты.
+"""
+from django.urls import path
+
+from api import async_views
+from foodgram.urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/recipes/', async_views.recipe_list, name='recipe-list-async'),
+    path(
+        'api/recipes/<int:pk>/',
+        async_views.recipe_detail,
+        name='recipe-detail-async'
+    ),
+    path('api/tags/', async_views.tag_list, name='tag-list-async'),
+    path(
+        'api/ingredients/',
+        async_views.ingredient_list,
+        name='ingredient-list-async'
+    ),
+    path(
+        's/<str:code>',
+        async_views.short_link_redirect,
+        name='short-link-async'
+    ),
+] + sync_urlpatterns
@@ -32,17 +32,15 @@ class RecipeIngredientInline(admin.TabularInline):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'author', 'pub_date', 'ingredient_count')
+    list_display = (
+        'id', 'name', 'author', 'pub_date',
+        'ingredients_count', 'favorites_count', 'in_cart_count'
+    )
     list_filter = ('author', 'tags', 'pub_date')
     search_fields = ('name', 'author__username', 'tags__name')
     inlines = [RecipeIngredientInline]
     empty_value_display = '-пусто-'
 
-    def ingredient_count(self, obj):
-        """Считает количество ингредиентов в рецепте."""
-        return obj.ingredients.count()
-    ingredient_count.short_description = 'Количество ингредиентов'
-
 
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-17 06:25
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """Оставляет один ингредиент на пару (название, единица измерения)
+    и переносит на него ссылки из рецептов."""
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(keep_id=Min('id'), total=Count('id')).filter(total__gt=1)
+    for group in duplicates:
+        extra_ids = list(Ingredient.objects.filter(
+            name=group['name'],
+            measurement_unit=group['measurement_unit'],
+        ).exclude(id=group['keep_id']).values_list('id', flat=True))
+        for extra_id in extra_ids:
+            for row in IngredientRecipe.objects.filter(ingredient_id=extra_id):
+                if IngredientRecipe.objects.filter(
+                    recipe_id=row.recipe_id, ingredient_id=group['keep_id']
+                ).exists():
+                    row.delete()
+                else:
+                    row.ingredient_id = group['keep_id']
+                    row.save(update_fields=['ingredient'])
+        Ingredient.objects.filter(id__in=extra_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-17 06:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Ограничение добавляется отдельной миграцией: в PostgreSQL ALTER TABLE
+    # нельзя выполнить в одной транзакции с перенесенными ссылками.
+
+    dependencies = [
+        ('recipes', '0005_merge_duplicate_ingredients'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient_measurement_unit'),
+        ),
+    ]
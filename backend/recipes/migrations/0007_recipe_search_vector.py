@@ -0,0 +1,80 @@
+# Generated by Django 4.2.30 on 2026-10-17 06:33
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+import recipes.models
+
+FTS_TABLE = 'recipes_recipe_fts'
+
+POSTGRES_FILL_SQL = """
+    UPDATE recipes_recipe AS recipe SET search_vector =
+        setweight(to_tsvector('russian', recipe.name), 'A')
+        || setweight(to_tsvector('russian', concat_ws(' ',
+            (SELECT string_agg(tag.name, ' ')
+             FROM recipes_recipe_tags AS recipe_tag
+             JOIN recipes_tag AS tag ON tag.id = recipe_tag.tag_id
+             WHERE recipe_tag.recipe_id = recipe.id),
+            (SELECT string_agg(ingredient.name, ' ')
+             FROM recipes_ingredientrecipe AS amount
+             JOIN recipes_ingredient AS ingredient
+                 ON ingredient.id = amount.ingredient_id
+             WHERE amount.recipe_id = recipe.id)
+        )), 'B')
+        || setweight(to_tsvector('russian', recipe.text), 'C')
+"""
+
+SQLITE_FILL_SQL = f"""
+    INSERT INTO {FTS_TABLE} (rowid, name, text, tags, ingredients)
+    SELECT recipe.id, recipe.name, recipe.text,
+        (SELECT group_concat(tag.name, ' ')
+         FROM recipes_recipe_tags AS recipe_tag
+         JOIN recipes_tag AS tag ON tag.id = recipe_tag.tag_id
+         WHERE recipe_tag.recipe_id = recipe.id),
+        (SELECT group_concat(ingredient.name, ' ')
+         FROM recipes_ingredientrecipe AS amount
+         JOIN recipes_ingredient AS ingredient
+             ON ingredient.id = amount.ingredient_id
+         WHERE amount.recipe_id = recipe.id)
+    FROM recipes_recipe AS recipe
+"""
+
+
+def fill_search_index(apps, schema_editor):
+    """Заполняет поисковый вектор в PostgreSQL или создает таблицу FTS5
+    в SQLite для уже существующих рецептов."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(POSTGRES_FILL_SQL)
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+            'name, text, tags, ingredients, '
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(SQLITE_FILL_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=recipes.models.SearchVectorIndex(fields=['search_vector'], name='recipe_search_vector_idx'),
+        ),
+        migrations.RunPython(fill_search_index, drop_search_index),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.30 on 2026-10-17 06:36
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+COUNTERS = (
+    ('recipes.Recipe', 'favorites_count', 'recipes.Favorite', 'recipe'),
+    ('recipes.Recipe', 'in_cart_count', 'recipes.ShoppingCart', 'recipe'),
+    (
+        'recipes.Recipe', 'ingredients_count',
+        'recipes.IngredientRecipe', 'recipe'
+    ),
+    ('users.CustomUser', 'recipes_count', 'recipes.Recipe', 'author'),
+    (
+        'users.CustomUser', 'subscribers_count',
+        'recipes.Subscription', 'author'
+    ),
+)
+
+
+def fill_counters(apps, schema_editor):
+    """Заполняет счетчики рецептов и пользователей по текущим данным."""
+    for owner, field, related, foreign_key in COUNTERS:
+        actual = Coalesce(Subquery(
+            apps.get_model(related).objects.filter(
+                **{foreign_key: OuterRef('pk')}
+            ).order_by().values(foreign_key).annotate(
+                total=Count('pk')
+            ).values('total')
+        ), 0)
+        apps.get_model(owner).objects.update(**{field: actual})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_search_vector'),
+        ('users', '0004_customuser_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_cart_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В корзинах'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredients_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество ингредиентов'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,10 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from colorfield.fields import ColorField
 from django.core.validators import MinValueValidator
 
-from users.models import CustomUser
+from users.models import CounterFieldsMixin, CustomUser
 
 COOKING_TIME_MIN = 1
 COOKING_TIME_MAX = 32000
@@ -25,6 +27,12 @@ class Ingredient(models.Model):
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ('name',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient_measurement_unit'
+            )
+        ]
 
     def __str__(self) -> str:
         return f'{self.name} - {self.measurement_unit}'
@@ -48,7 +56,40 @@ class Tag(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+
+    def with_user_flags(self, user):
+        """Добавляет признаки is_favorited и is_in_shopping_cart
+        для пользователя одним запросом вместо запроса на каждый рецепт.
+        """
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=models.Value(False),
+                is_in_shopping_cart=models.Value(False),
+            )
+        return self.annotate(
+            is_favorited=models.Exists(Favorite.objects.filter(
+                user=user, recipe=models.OuterRef('pk')
+            )),
+            is_in_shopping_cart=models.Exists(ShoppingCart.objects.filter(
+                user=user, recipe=models.OuterRef('pk')
+            )),
+        )
+
+
+class SearchVectorIndex(GinIndex):
+    """GIN-индекс поискового вектора. Вне PostgreSQL создается обычным
+    индексом: там поиск идет по таблице FTS5, а столбец пуст."""
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return models.Index.create_sql(
+                self, model, schema_editor, using=using, **kwargs
+            )
+        return super().create_sql(model, schema_editor, using, **kwargs)
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     name = models.CharField(
         'Название рецепта',
         max_length=MAX_LENGTH)
@@ -58,6 +99,12 @@ class Recipe(models.Model):
         null=False,
         default=None
     )
+    image_variants = models.JSONField(
+        'Уменьшенные копии изображения',
+        default=dict,
+        blank=True,
+        editable=False
+    )
     text = models.TextField('Описание')
     author = models.ForeignKey(
         CustomUser, on_delete=models.CASCADE, verbose_name='Автор рецепта'
@@ -79,12 +126,37 @@ class Recipe(models.Model):
     )
     pub_date = models.DateTimeField('Дата и время публикации',
                                     auto_now_add=True)
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False
+    )
+    favorites_count = models.PositiveIntegerField(
+        'В избранном', default=0, editable=False
+    )
+    in_cart_count = models.PositiveIntegerField(
+        'В корзинах', default=0, editable=False
+    )
+    ingredients_count = models.PositiveIntegerField(
+        'Количество ингредиентов', default=0, editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
+    counter_fields = ('favorites_count', 'in_cart_count', 'ingredients_count')
+    derived_fields = ('image_variants', 'search_vector')
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
         default_related_name = 'recipes'
+        indexes = [
+            models.Index(fields=('-pub_date', '-id'),
+                         name='recipe_pub_date_id_idx'),
+            SearchVectorIndex(fields=('search_vector',),
+                              name='recipe_search_vector_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.name
@@ -200,3 +272,33 @@ class Subscription(models.Model):
 
     def __str__(self) -> str:
         return f'{self.user} подписан на {self.author}'
+
+
+class FeedEntry(models.Model):
+    """Запись в ленте подписчика: рецепт автора, на которого он подписан.
+    Дата публикации копируется, чтобы лента читалась по одному индексу."""
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, verbose_name='Рецепт'
+    )
+    pub_date = models.DateTimeField('Дата и время публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        ordering = ('-pub_date', '-recipe_id')
+        default_related_name = 'feed_entries'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'], name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(fields=('user', '-pub_date', '-recipe'),
+                         name='feed_user_pub_date_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.user} :: {self.recipe}'
@@ -6,7 +6,10 @@ from users.models import CustomUser
 @admin.register(CustomUser)
 class CustomUserAdmin(UserAdmin):
     model = CustomUser
-    list_display = ('id', 'email', 'username', 'first_name', 'last_name')
+    list_display = (
+        'id', 'email', 'username', 'first_name', 'last_name',
+        'recipes_count', 'subscribers_count'
+    )
     search_fields = ('username', 'email')
     list_filter = ('is_active', 'is_staff')
     ordering = ('email',)
@@ -4,7 +4,31 @@ from django.db import models
 from users.validators import validate_username
 
 
-class CustomUser(AbstractUser):
+class CounterFieldsMixin:
+    """
+    Счетчики меняются только атомарными UPDATE из сигналов и bulk-операций,
+    а поля из derived_fields пишут только фоновые задачи через update().
+    Полное сохранение существующего объекта не записывает ни те, ни другие,
+    чтобы не затереть значение в базе устаревшим значением из памяти.
+    """
+    counter_fields = ()
+    derived_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            skipped = (
+                set(self.counter_fields) | set(self.derived_fields)
+                | self.get_deferred_fields()
+            )
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped
+                and field.name not in skipped
+            ]
+        super().save(*args, **kwargs)
+
+
+class CustomUser(CounterFieldsMixin, AbstractUser):
     """Переопределяем модель User с дополнительными полями"""
 
     username = models.CharField(
@@ -42,6 +66,21 @@ class CustomUser(AbstractUser):
         null=True,
         help_text='Необязательное поле. Загрузите изображение профиля.'
     )
+    avatar_variants = models.JSONField(
+        'Уменьшенные копии аватара',
+        default=dict,
+        blank=True,
+        editable=False
+    )
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов', default=0, editable=False
+    )
+    subscribers_count = models.PositiveIntegerField(
+        'Количество подписчиков', default=0, editable=False
+    )
+
+    counter_fields = ('recipes_count', 'subscribers_count')
+    derived_fields = ('avatar_variants',)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = (